@@ -0,0 +1,133 @@
+# app/db/changes.py
+"""
+Change capture for ORM writes.
+
+Every flush of a SQLAlchemy Session is turned into a list of Change records
+(table, op, key, obj, data). Listeners registered with on_flush() run inside
+the flushing transaction, so they can write derived rows atomically with the
+change; listeners registered with on_commit() run once the transaction has
+committed and receive everything flushed in it, which suits caches and
+in-memory indexes that must never see rolled-back data.
+
+Bulk statements (insert()/update() executed directly) bypass the ORM unit of
+work and are not captured; code issuing them should call publish() itself.
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+log = logging.getLogger("changes")
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+_PENDING_KEY = "captured_changes"
+_SAVEPOINTS_KEY = "captured_changes_savepoints"  # nested transaction -> len(pending) when it began
+
+
+@dataclass
+class Change:
+    table: str
+    op: str                 # insert, update, delete
+    key: str                # primary key as a string ("a|b" for composite keys)
+    obj: Any = None         # the mapped instance; only safe to read inside on_flush listeners
+    data: Dict[str, Any] = field(default_factory=dict)  # loaded column values at flush time
+    extra: Dict[str, Any] = field(default_factory=dict)  # derived values flush listeners hand to commit listeners
+
+
+_flush_listeners: List[Callable[[Session, List[Change]], None]] = []
+_commit_listeners: List[Callable[[List[Change]], None]] = []
+
+
+def on_flush(fn: Callable[[Session, List[Change]], None]) -> Callable:
+    """Register fn(session, changes), called inside the transaction after each flush."""
+    if fn not in _flush_listeners:
+        _flush_listeners.append(fn)
+    return fn
+
+
+def on_commit(fn: Callable[[List[Change]], None]) -> Callable:
+    """Register fn(changes), called after a successful commit."""
+    if fn not in _commit_listeners:
+        _commit_listeners.append(fn)
+    return fn
+
+
+def snapshot(obj: Any, op: str) -> Change:
+    """A Change for `obj` carrying its loaded column values, as a flush reports it."""
+    state = inspect(obj)
+    mapper = state.mapper
+    data = {
+        attr.key: state.dict[attr.key]
+        for attr in mapper.column_attrs
+        if attr.key in state.dict
+    }
+    identity = state.identity or mapper.primary_key_from_instance(obj)
+    key = "|".join(str(v) for v in identity) if identity else ""
+    return Change(table=mapper.local_table.name, op=op, key=key, obj=obj, data=data)
+
+
+def publish(session: Session, changes: List[Change]) -> None:
+    """
+    Feed changes made outside the unit of work (e.g. bulk inserts) through the
+    same listeners as a flush.
+    """
+    for fn in _flush_listeners:
+        fn(session, changes)
+    session.info.setdefault(_PENDING_KEY, []).extend(changes)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context) -> None:
+    changes = [snapshot(obj, INSERT) for obj in session.new]
+    changes += [
+        snapshot(obj, UPDATE) for obj in session.dirty
+        if session.is_modified(obj, include_collections=False)
+    ]
+    changes += [snapshot(obj, DELETE) for obj in session.deleted]
+    if changes:
+        publish(session, changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    changes = session.info.pop(_PENDING_KEY, None)
+    if not changes:
+        return
+    for change in changes:
+        change.obj = None  # instances are expired now; listeners get the snapshot only
+    for fn in _commit_listeners:
+        try:
+            fn(changes)
+        except Exception as e:
+            log.exception("Commit listener %s failed: %s", getattr(fn, "__name__", fn), e)
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _after_transaction_create(session: Session, transaction) -> None:
+    # Remember where a savepoint starts, so rolling it back keeps what was flushed before it
+    if transaction.nested:
+        marks = session.info.setdefault(_SAVEPOINTS_KEY, {})
+        marks[transaction] = len(session.info.get(_PENDING_KEY, ()))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _after_transaction_end(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_SAVEPOINTS_KEY, None)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _after_soft_rollback(session: Session, previous_transaction) -> None:
+    # Fires for savepoints too: only drop what was flushed inside the one rolled back
+    if previous_transaction.nested:
+        mark = session.info.get(_SAVEPOINTS_KEY, {}).pop(previous_transaction, None)
+        pending = session.info.get(_PENDING_KEY)
+        if mark is not None and pending:
+            del pending[mark:]
+    elif previous_transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
@@ -10,17 +10,28 @@ from app.modules.pages.router import router as pages_router
 from app.modules.cacher.router import router as cacher_router
 from app.modules.cascade.router import router as cascade_router
 from app.middleware.cacher_middleware import cacher_middleware
+from app.middleware.compression_middleware import CompressionMiddleware
 from app.modules.read_more.router import router as read_more_router
 from app.modules.feeds.router import router as feeds_router
 from app.modules.search.router import router as search_router
+from app.modules.search.memory_index import search_index
+from app.modules.search.service import start_search_cache, stop_search_cache
+from app.modules.search.suggest import suggestion_service
 from app.modules.uploads.router import router as uploads_router
+from app.modules.tags.router import router as tags_router
+from app.modules.exif.router import router as exif_router
+from app.modules.geo.router import router as geo_router
 from app.modules.images.router import router as images_router
 from app.modules.albums.router import router as albums_router
 from app.modules.image_views.router import router as image_views_router
 from app.modules.image_likes.router import router as likes_router
+from app.modules.image_stats.router import router as image_stats_router
+from app.modules.image_views.buffer import view_buffer
+from app.modules.uploads.queue import shutdown_pool as shutdown_derivatives_pool
 from fastapi.middleware.cors import CORSMiddleware
 from app.modules.comments.router import router as comments_router
 from app.modules.gallery.router import router as gallery_router
+from app.modules.transforms.router import router as transforms_router, transform_service
 from app.routes import ai
 
 
@@ -38,6 +49,7 @@ app.include_router(images_router, tags=["Images"])
 app.include_router(albums_router, tags=["Albums"])
 app.include_router(image_views_router, prefix="/image_views", tags=["Image Views"])
 app.include_router(likes_router, prefix="/likes", tags=["Likes"])
+app.include_router(image_stats_router)
 app.include_router(users_router, tags=["Users"])
 app.include_router(sitemap_router)
 app.include_router(pages_router)
@@ -48,9 +60,13 @@ app.include_router(read_more_router)
 app.include_router(feeds_router)
 app.include_router(search_router)
 app.include_router(uploads_router)
+app.include_router(tags_router)
+app.include_router(exif_router)
+app.include_router(geo_router)
 app.include_router(comments_router, prefix="/comments", tags=["Comments"])
 app.include_router(ai.router)
 app.include_router(gallery_router, prefix="", tags=["Gallery"])
+app.include_router(transforms_router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -58,9 +74,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link", "X-Total-Count", "X-Search-Degraded"],
 )
 
 app.middleware("http")(cacher_middleware)
+# Added last so it wraps everything else and compresses the final bodies
+app.add_middleware(CompressionMiddleware)
+
+@app.on_event("startup")
+def start_background_services():
+    view_buffer.start()
+    search_index.start()
+    start_search_cache()
+    suggestion_service.start()
+
+@app.on_event("shutdown")
+def stop_background_services():
+    view_buffer.stop()
+    shutdown_derivatives_pool()
+    transform_service.cache.save()
+    search_index.stop()
+    stop_search_cache()
+    suggestion_service.stop()
 
 @app.get("/")
 def read_root():
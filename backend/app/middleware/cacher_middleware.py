@@ -1,33 +1,120 @@
 from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+import calendar
 import time
-from app.modules.cacher.service import CacherService
+from app.modules.cacher.service import body_etag, cacher_service as service, etag_matches, route_tags
+
+
+def _buffered(status_code, headers, body):
+    """Plain response with the given body, keeping repeated headers (Link, Set-Cookie) intact."""
+    response = Response(content=body, status_code=status_code)
+    response.raw_headers = [
+        (name.lower().encode("latin-1"), value.encode("latin-1"))
+        for name, value in headers
+        if name.lower() != "content-length"
+    ] + [(b"content-length", str(len(body)).encode("latin-1"))]
+    return response
+
+
+def _validators(response, lastmod, etag=None, cache_control=None):
+    if lastmod is not None:
+        response.headers["Last-Modified"] = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(lastmod))
+        response.headers["Expires"] = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(lastmod + 30*24*60*60))
+    # A handler's own Cache-Control (e.g. public max-age on suggestions) wins over the default
+    cache_control = cache_control or response.headers.get("cache-control")
+    if cache_control is None:
+        response.headers["Cache-Control"] = "no-cache, private"
+        response.headers["Pragma"] = "no-cache"
+    else:
+        response.headers["Cache-Control"] = cache_control
+    if etag:
+        response.headers["ETag"] = etag
+    response.headers["Vary"] = "Accept-Encoding, Authorization, Cookie, Save-Data"
+    return response
 
-service = CacherService()
 
 async def cacher_middleware(request: Request, call_next):
     if not service.is_eligible(request):
         return await call_next(request)
-    
+
+    # Per-resource freshness from the shared version store; untagged routes only get ETags
+    tags = route_tags(request.url.path)
+    sequence = service.cache.sequence()
+    versions, lastmod = None, None
+    if tags is not None:
+        versions, lastmod = await run_in_threadpool(service.freshness, tags)
+
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2)
     ims = request.headers.get("if-modified-since")
-    lastmod = service.get_lastmod()
-    if ims:
+    if ims and lastmod is not None and "if-none-match" not in request.headers:
         try:
-            ims_time = int(time.mktime(time.strptime(ims, "%a, %d %b %Y %H:%M:%S %Z")))
+            ims_time = calendar.timegm(time.strptime(ims, "%a, %d %b %Y %H:%M:%S GMT"))
             if ims_time >= lastmod:
-                return Response(status_code=304)
-        except:
+                return _validators(Response(status_code=304), lastmod)
+        except ValueError:
             pass
 
-    if service.validate_etag(request):
-        return Response(status_code=304)
+    if tags is None:
+        return await _render(request, call_next, lastmod)
 
-    response = await call_next(request)
+    key = service.cache_key(request)
 
-    response.headers["Last-Modified"] = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(lastmod))
-    response.headers["Cache-Control"] = "no-cache, private"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(lastmod + 30*24*60*60))
-    response.headers["ETag"] = service.generate_etag(request)
-    response.headers["Vary"] = "Accept-Encoding, Cookie, Save-Data, ETag"
+    async def lookup():
+        # Entries without a body (too large to keep) only help to answer If-None-Match
+        if service.cache.shared is None:
+            cached = service.cache.get(key, versions)
+        else:
+            cached = await run_in_threadpool(service.cache.get, key, versions)
+        if cached is not None and (cached.body is not None or etag_matches(request, cached.etag)):
+            return cached
+        return None
 
-    return response
+    async def render():
+        return await _render(request, call_next, lastmod, key, tags, versions, sequence)
+
+    # A cold response is rendered once; concurrent requests for it, here or in
+    # other workers, wait for it to land in the cache
+    result = await service.flights.do_async("|".join(key), lookup, render)
+    if isinstance(result, Response):
+        return result
+    return _from_cache(request, result, lastmod)
+
+
+def _from_cache(request, cached, lastmod):
+    # The entry matches the current versions of everything it depends on, so its ETag is current
+    if etag_matches(request, cached.etag):
+        cache_control = next((value for name, value in cached.headers if name.lower() == "cache-control"), None)
+        return _validators(Response(status_code=304), lastmod, cached.etag, cache_control)
+    response = _buffered(cached.status_code, cached.headers, cached.content())
+    response.headers["X-Cache"] = "HIT"
+    return _validators(response, lastmod, cached.etag)
+
+
+async def _render(request, call_next, lastmod, key=None, tags=None, versions=None, sequence=None):
+    response = await call_next(request)
+    if response.status_code != 200:
+        return _validators(response, lastmod)
+    if "etag" in response.headers:
+        # Handlers with their own validators (file responses) are not hashed or cached
+        etag = response.headers["etag"]
+        if etag_matches(request, etag):
+            return _validators(Response(status_code=304), lastmod, etag, response.headers.get("cache-control"))
+        return _validators(response, lastmod, etag)
+    if key is None and "content-length" not in response.headers:
+        # Streamed by the handler (StreamingResponse) and not cached: pass it
+        # through unbuffered, so it reaches the client, and the compression
+        # middleware, chunk by chunk
+        return _validators(response, lastmod)
+
+    # Buffer the body (call_next always streams) to hash it, and store it for cached routes
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = response.headers.items()
+    etag = body_etag(body)
+    if key is not None:
+        await run_in_threadpool(service.store, key, tags, versions, sequence, response.status_code, headers, body, etag)
+    if etag_matches(request, etag):
+        return _validators(Response(status_code=304), lastmod, etag, response.headers.get("cache-control"))
+    response = _buffered(response.status_code, headers, body)
+    if key is not None:
+        response.headers["X-Cache"] = "MISS"
+    return _validators(response, lastmod, etag)
@@ -0,0 +1,138 @@
+import os
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from app.modules.cacher.encodings import StreamCompressor, compress, negotiate
+
+# Configuration via environment variables (fallbacks)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # smaller bodies are sent as is
+COMPRESSION_OFFLOAD_SIZE = int(os.getenv("COMPRESSION_OFFLOAD_SIZE", str(64 * 1024)))  # compress in a worker thread from here
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/xml", "application/javascript", "image/svg+xml")
+COMPRESSIBLE_SUFFIXES = ("+json", "+xml")
+
+
+def _compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type.startswith(COMPRESSIBLE_TYPES) or media_type.endswith(COMPRESSIBLE_SUFFIXES)
+
+
+def _add_vary(headers: MutableHeaders) -> None:
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the best coding the client accepts (br, zstd,
+    gzip). Bodies sent in one piece are compressed whole, bodies streamed in
+    chunks (e.g. StreamingResponse) are compressed chunk by chunk without
+    buffering. Large bodies and chunks are compressed in the threadpool so
+    the event loop keeps serving other requests. Responses that already
+    carry a Content-Encoding (precompressed snapshots) pass through.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, offload_size: int = COMPRESSION_OFFLOAD_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _Responder(self, encoding, send).run(scope, receive)
+
+
+class _Responder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.app = middleware.app
+        self.minimum_size = middleware.minimum_size
+        self.offload_size = middleware.offload_size
+        self.encoding = encoding
+        self.send = send
+        self.start = None
+        self.mode = None  # "pass", "buffer" or "stream"
+        self.buffer = b""
+        self.compressor = None
+
+    async def run(self, scope, receive):
+        await self.app(scope, receive, self.on_message)
+
+    async def _compress(self, fn, data: bytes) -> bytes:
+        if len(data) >= self.offload_size:
+            return await run_in_threadpool(fn, data)
+        return fn(data)
+
+    def _encoded_headers(self) -> MutableHeaders:
+        headers = MutableHeaders(raw=list(self.start["headers"]))
+        self.start["headers"] = headers.raw
+        headers["Content-Encoding"] = self.encoding
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # The encoded bytes differ from what the strong ETag was computed over
+            headers["ETag"] = "W/" + etag
+        _add_vary(headers)
+        return headers
+
+    async def on_message(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = MutableHeaders(raw=list(message["headers"]))
+            message["headers"] = headers.raw
+            compressible = _compressible(headers.get("content-type", ""))
+            if compressible:
+                _add_vary(headers)
+            if (
+                not compressible
+                or message["status"] < 200
+                or message["status"] in (204, 304)
+                or "content-encoding" in headers
+            ):
+                self.mode = "pass"
+                await self.send(message)
+            else:
+                self.mode = "buffer"
+            return
+
+        if message["type"] != "http.response.body" or self.mode == "pass":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.mode == "buffer":
+            self.buffer += body
+            if more_body and len(self.buffer) < self.minimum_size:
+                return
+            if not more_body:
+                # Whole body known: send it as is below the threshold, else compress it in one go
+                if len(self.buffer) < self.minimum_size:
+                    await self.send(self.start)
+                    await self.send({"type": "http.response.body", "body": self.buffer})
+                    return
+                data = await self._compress(lambda b: compress(b, self.encoding), self.buffer)
+                headers = self._encoded_headers()
+                headers["Content-Length"] = str(len(data))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": data})
+                return
+            # Streamed body past the threshold: switch to chunked compression
+            headers = self._encoded_headers()
+            del headers["content-length"]
+            await self.send(self.start)
+            self.compressor = StreamCompressor(self.encoding)
+            self.mode = "stream"
+            body, self.buffer = self.buffer, b""
+
+        data = await self._compress(self.compressor.chunk, body) if body else b""
+        if not more_body:
+            data += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
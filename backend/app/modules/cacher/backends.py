@@ -0,0 +1,507 @@
+"""
+Cache backends shared by the cacher middleware, settings lookups and the
+maptcha store.
+
+- LocalBackend: in-process LRU with TTLs; the default for a single worker.
+- MmapBackend: fixed-size hash table in a memory-mapped file, shared by all
+  worker processes on one host and guarded by flock().
+- RedisBackend: shared across hosts (REDIS_URL).
+- TwoTierBackend: a small in-process L1 in front of one of the shared ones.
+
+CACHE_BACKEND selects what `cache_backend` is (local, mmap, redis, tiered);
+`shared_backend` is its cross-process tier, or None when nothing is shared.
+SingleFlight coalesces concurrent computations of a cold key, within a
+worker through an in-process waiter and across workers through a lock entry
+in the shared backend.
+
+Shared backends store values pickled. Redis must only ever be reachable by
+this application; the mmap file is kept private to the app user and its
+entries are authenticated before they are unpickled.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import mmap
+import os
+import pickle
+import stat
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+log = logging.getLogger("cacher")
+
+# Configuration via environment variables (fallbacks)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local")  # local, mmap, redis, tiered
+REDIS_URL = os.getenv("REDIS_URL")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "gallery:")
+CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "10000"))
+CACHE_L1_TTL = float(os.getenv("CACHE_L1_TTL", "5"))  # seconds an L1 copy may lag the shared tier
+CACHE_MMAP_PATH = os.getenv("CACHE_MMAP_PATH", os.path.join(os.getcwd(), "shared_cache", "cache.mmap"))  # directory must be private to the app user
+CACHE_MMAP_SECRET = os.getenv("CACHE_MMAP_SECRET")  # HMAC key for mmap entries; generated next to the file if unset
+CACHE_MMAP_SLOTS = int(os.getenv("CACHE_MMAP_SLOTS", "4096"))
+CACHE_MMAP_SLOT_BYTES = int(os.getenv("CACHE_MMAP_SLOT_BYTES", str(32 * 1024)))
+SINGLE_FLIGHT_LOCK_TTL = float(os.getenv("SINGLE_FLIGHT_LOCK_TTL", "30"))
+SINGLE_FLIGHT_WAIT = float(os.getenv("SINGLE_FLIGHT_WAIT", "10"))  # max time a follower waits for the leader
+SINGLE_FLIGHT_POLL = 0.05
+
+
+def _loads(data: bytes) -> Optional[Any]:
+    """Unpickle a stored value; one that cannot be decoded (e.g. written by another version) is a miss."""
+    try:
+        return pickle.loads(data)
+    except Exception as e:
+        log.warning("Dropping undecodable cache entry: %s", e)
+        return None
+
+
+class CacheBackend:
+    """Key/value store with per-entry TTLs (seconds; None for no expiry)."""
+
+    shared = False  # visible to other worker processes
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set only if the key is absent; True if this call set it."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class LocalBackend(CacheBackend):
+    def __init__(self, max_entries: int = CACHE_LOCAL_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expires_at or None)
+
+    def _live(self, key: str) -> Optional[tuple]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _store(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        self._entries[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+def _private_dir(path: str) -> None:
+    """Create the directory of `path` for this user only, refusing one others can write to."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.stat(directory)
+    if st.st_uid != os.getuid() or st.st_mode & 0o022:
+        raise OSError(f"{directory} must be owned by this user and not writable by others")
+
+
+def _open_private(path: str, flags: int) -> int:
+    """os.open() that never follows a symlink and refuses files owned by another user or shared with others."""
+    fd = os.open(path, flags | os.O_NOFOLLOW, 0o600)
+    st = os.fstat(fd)
+    if not stat.S_ISREG(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        os.close(fd)
+        raise OSError(f"{path} must be a regular file owned by this user and private to it")
+    return fd
+
+
+def _shared_secret(path: str) -> bytes:
+    """
+    HMAC key shared by the workers using the mapping at `path`: CACHE_MMAP_SECRET,
+    or a random key stored next to the mapping by whichever worker starts first.
+    """
+    if CACHE_MMAP_SECRET:
+        return CACHE_MMAP_SECRET.encode()
+    key_path = path + ".key"
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        os.write(fd, os.urandom(32))
+        os.close(fd)
+        os.link(tmp, key_path)  # atomic: the key file appears complete or not at all
+    except FileExistsError:
+        pass
+    finally:
+        os.unlink(tmp)
+    fd = _open_private(key_path, os.O_RDONLY)
+    try:
+        return os.read(fd, 64)
+    finally:
+        os.close(fd)
+
+
+class MmapBackend(CacheBackend):
+    """
+    Open-addressing hash table of fixed-size slots in a shared file mapping.
+    A key hashes to a short probe sequence of slots; when all are taken the
+    one expiring first is overwritten, so the table never grows. Values
+    larger than a slot are not stored.
+
+    The file lives in a directory private to this user. Every slot carries
+    an HMAC of its key, expiry and value, and only verified values are
+    unpickled; torn, foreign or undecodable slots read as misses.
+    """
+
+    shared = True
+    HEADER = struct.Struct("<16sdI32s")  # key digest, expires_at (wall clock, 0 = never), value length, HMAC-SHA256
+    PROBES = 8
+    _EMPTY = bytes(16)
+
+    def __init__(self, path: str = CACHE_MMAP_PATH, slots: int = CACHE_MMAP_SLOTS, slot_size: int = CACHE_MMAP_SLOT_BYTES):
+        import fcntl  # POSIX only
+
+        self._fcntl = fcntl
+        self.slots = slots
+        self.slot_size = slot_size
+        size = slots * slot_size
+        _private_dir(path)
+        self._secret = _shared_secret(path)
+        self._fd = _open_private(path, os.O_RDWR | os.O_CREAT)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        with self._thread_lock:  # flock() does not exclude threads sharing the descriptor
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX if exclusive else self._fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+    def _mac(self, digest: bytes, expires_at: float, value: bytes) -> bytes:
+        return hmac.new(self._secret, digest + struct.pack("<d", expires_at) + value, hashlib.sha256).digest()
+
+    def _probe(self, digest: bytes):
+        start = int.from_bytes(digest[:8], "little") % self.slots
+        return [((start + i) % self.slots) * self.slot_size for i in range(self.PROBES)]
+
+    def _find(self, digest: bytes, now: float) -> Optional[int]:
+        for offset in self._probe(digest):
+            found, expires_at, _, _ = self.HEADER.unpack_from(self._map, offset)
+            if found == digest:
+                return offset if not expires_at or expires_at > now else None
+        return None
+
+    def _write(self, digest: bytes, value: bytes, ttl: Optional[float], now: float) -> None:
+        offsets = self._probe(digest)
+        headers = [self.HEADER.unpack_from(self._map, offset) for offset in offsets]
+        # The key's own slot first, so it is never stored twice, then a free or expired one
+        target = next((o for o, (found, _, _, _) in zip(offsets, headers) if found == digest), None)
+        if target is None:
+            target = next(
+                (o for o, (found, expires_at, _, _) in zip(offsets, headers) if found == self._EMPTY or (expires_at and expires_at <= now)),
+                None,
+            )
+        if target is None:
+            # Evict the entry expiring first (entries without expiry last)
+            target = min(offsets, key=lambda o: self.HEADER.unpack_from(self._map, o)[1] or float("inf"))
+        expires_at = now + ttl if ttl is not None else 0.0
+        start = target + self.HEADER.size
+        self._map[start:start + len(value)] = value
+        self.HEADER.pack_into(self._map, target, digest, expires_at, len(value), self._mac(digest, expires_at, value))
+
+    @staticmethod
+    def _digest(key: str) -> bytes:
+        return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+    def get(self, key: str) -> Optional[Any]:
+        digest = self._digest(key)
+        with self._locked(exclusive=False):
+            offset = self._find(digest, time.time())
+            if offset is None:
+                return None
+            _, expires_at, length, mac = self.HEADER.unpack_from(self._map, offset)
+            if length > self.slot_size - self.HEADER.size:
+                return None
+            start = offset + self.HEADER.size
+            data = self._map[start:start + length]
+        if not hmac.compare_digest(mac, self._mac(digest, expires_at, data)):
+            return None
+        return _loads(data)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.slot_size - self.HEADER.size:
+            self.delete(key)  # never leave an older value behind
+            return
+        with self._locked(exclusive=True):
+            self._write(self._digest(key), data, ttl, time.time())
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.slot_size - self.HEADER.size:
+            return False
+        digest = self._digest(key)
+        with self._locked(exclusive=True):
+            now = time.time()
+            if self._find(digest, now) is not None:
+                return False
+            self._write(digest, data, ttl, now)
+            return True
+
+    def delete(self, key: str) -> None:
+        digest = self._digest(key)
+        with self._locked(exclusive=True):
+            offset = self._find(digest, time.time())
+            if offset is not None:
+                self.HEADER.pack_into(self._map, offset, self._EMPTY, 0.0, 0, bytes(32))
+
+
+class RedisBackend(CacheBackend):
+    shared = True
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = CACHE_KEY_PREFIX):
+        from redis import Redis
+
+        self._redis = Redis.from_url(url)
+        self.prefix = prefix
+
+    @staticmethod
+    def _px(ttl: Optional[float]) -> Optional[int]:
+        return max(1, int(ttl * 1000)) if ttl is not None else None
+
+    def get(self, key: str) -> Optional[Any]:
+        data = self._redis.get(self.prefix + key)
+        return _loads(data) if data is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._redis.set(self.prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), px=self._px(ttl))
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        return bool(self._redis.set(self.prefix + key, pickle.dumps(value), px=self._px(ttl), nx=True))
+
+    def delete(self, key: str) -> None:
+        self._redis.delete(self.prefix + key)
+
+
+class TwoTierBackend(CacheBackend):
+    """
+    In-process L1 in front of a shared L2. L1 copies live at most l1_ttl, so
+    a delete or overwrite made by another worker is seen within that time.
+    add() always goes to L2, where it is atomic across workers.
+    """
+
+    shared = True
+
+    def __init__(self, l1: CacheBackend, l2: CacheBackend, l1_ttl: float = CACHE_L1_TTL):
+        self.l1 = l1
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+
+    def _l1_ttl(self, ttl: Optional[float]) -> float:
+        return min(ttl, self.l1_ttl) if ttl is not None else self.l1_ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.l1.get(key)
+        if value is None:
+            value = self.l2.get(key)
+            if value is not None:
+                self.l1.set(key, value, self.l1_ttl)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.l2.set(key, value, ttl)
+        self.l1.set(key, value, self._l1_ttl(ttl))
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        if not self.l2.add(key, value, ttl):
+            return False
+        self.l1.set(key, value, self._l1_ttl(ttl))
+        return True
+
+    def delete(self, key: str) -> None:
+        self.l2.delete(key)
+        self.l1.delete(key)
+
+
+def _shared(kind: str) -> Optional[CacheBackend]:
+    if kind == "redis" or (kind == "tiered" and REDIS_URL):
+        if not REDIS_URL:
+            log.warning("CACHE_BACKEND=redis but REDIS_URL is not set; using the local cache")
+            return None
+        try:
+            return RedisBackend(REDIS_URL)
+        except ImportError:
+            log.warning("CACHE_BACKEND=%s but redis is not installed; using the local cache", kind)
+            return None
+    if kind in ("mmap", "tiered"):
+        try:
+            return MmapBackend()
+        except (ImportError, OSError) as e:
+            log.warning("Shared memory cache unavailable (%s); using the local cache", e)
+            return None
+    if kind != "local":
+        log.warning("Unknown CACHE_BACKEND %r; using the local cache", kind)
+    return None
+
+
+shared_backend: Optional[CacheBackend] = _shared(CACHE_BACKEND)
+if shared_backend is None:
+    cache_backend: CacheBackend = LocalBackend()
+elif CACHE_BACKEND == "tiered":
+    cache_backend = TwoTierBackend(LocalBackend(), shared_backend)
+else:
+    cache_backend = shared_backend
+
+
+class SingleFlight:
+    """
+    Runs one computation per cold key at a time. Callers pass lookup(),
+    which returns the cached value or None, and compute(), which produces
+    and stores it. The first caller computes; everyone else waits for the
+    value to appear (at most `wait` seconds, then computes as well), both
+    among threads or tasks of this worker and among workers sharing
+    `backend`.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend] = None, lock_ttl: float = SINGLE_FLIGHT_LOCK_TTL, wait: float = SINGLE_FLIGHT_WAIT):
+        self.backend = backend
+        self.lock_ttl = lock_ttl
+        self.wait = wait
+        self._lock = threading.Lock()
+        self._flights: Dict[str, threading.Event] = {}
+        self._async_flights: Dict[str, asyncio.Event] = {}
+        self.coalesced = 0
+
+    def _lock_key(self, key: str) -> str:
+        return f"flight:{key}"
+
+    def do(self, key: str, lookup: Callable[[], Optional[Any]], compute: Callable[[], Any]) -> Any:
+        value = lookup()
+        if value is not None:
+            return value
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = threading.Event()
+        if not leader:
+            flight.wait(self.wait)
+            value = lookup()
+            if value is not None:
+                self.coalesced += 1
+                return value
+            return compute()
+        try:
+            token = uuid.uuid4().hex
+            if self.backend is not None and not self.backend.add(self._lock_key(key), token, self.lock_ttl):
+                deadline = time.monotonic() + self.wait
+                while time.monotonic() < deadline and self.backend.get(self._lock_key(key)) is not None:
+                    value = lookup()
+                    if value is not None:
+                        self.coalesced += 1
+                        return value
+                    time.sleep(SINGLE_FLIGHT_POLL)
+                value = lookup()
+                if value is not None:
+                    return value
+                return compute()
+            try:
+                return compute()
+            finally:
+                if self.backend is not None and self.backend.get(self._lock_key(key)) == token:
+                    self.backend.delete(self._lock_key(key))
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.set()
+
+    async def do_async(self, key: str, lookup: Callable[[], Awaitable[Optional[Any]]], compute: Callable[[], Awaitable[Any]]) -> Any:
+        """do() for coroutines; shared backend calls run in the threadpool."""
+        value = await lookup()
+        if value is not None:
+            return value
+        flight = self._async_flights.get(key)
+        if flight is not None:
+            try:
+                await asyncio.wait_for(flight.wait(), self.wait)
+            except asyncio.TimeoutError:
+                pass
+            value = await lookup()
+            if value is not None:
+                self.coalesced += 1
+                return value
+            return await compute()
+        flight = self._async_flights[key] = asyncio.Event()
+        try:
+            token = uuid.uuid4().hex
+            lock_key = self._lock_key(key)
+            if self.backend is not None and not await run_in_threadpool(self.backend.add, lock_key, token, self.lock_ttl):
+                deadline = time.monotonic() + self.wait
+                while time.monotonic() < deadline and await run_in_threadpool(self.backend.get, lock_key) is not None:
+                    value = await lookup()
+                    if value is not None:
+                        self.coalesced += 1
+                        return value
+                    await asyncio.sleep(SINGLE_FLIGHT_POLL)
+                value = await lookup()
+                if value is not None:
+                    return value
+                return await compute()
+            try:
+                return await compute()
+            finally:
+                if self.backend is not None and await run_in_threadpool(self.backend.get, lock_key) == token:
+                    await run_in_threadpool(self.backend.delete, lock_key)
+        finally:
+            self._async_flights.pop(key, None)
+            flight.set()
+
+
+def cached(key: str, compute: Callable[[], Any], ttl: Optional[float] = None, flight: Optional["SingleFlight"] = None) -> Any:
+    """
+    cache_backend.get(key), computing and storing the value once across
+    workers on a miss. compute() must not return None (wrap "no value").
+    """
+    flight = flight or single_flight
+
+    def fill():
+        value = compute()
+        cache_backend.set(key, value, ttl)
+        return value
+
+    return flight.do(key, lambda: cache_backend.get(key), fill)
+
+
+single_flight = SingleFlight(shared_backend)
@@ -0,0 +1,101 @@
+"""
+Content codings for response compression: negotiation from Accept-Encoding,
+one-shot compression and streaming compressors. gzip is always available;
+brotli and zstd are used when the `brotli` / `zstandard` packages are
+installed.
+"""
+import os
+import zlib
+from typing import Iterable, Optional
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+# Configuration via environment variables (fallbacks)
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))  # on the fly; snapshots use the maximum
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+
+# Server preference when the client accepts several with the same q-value
+AVAILABLE = tuple(
+    encoding for encoding, present in (("br", brotli), ("zstd", zstandard), ("gzip", True)) if present
+)
+
+
+def negotiate(accept_encoding: Optional[str], available: Iterable[str] = AVAILABLE) -> Optional[str]:
+    """Best coding from `available` for an Accept-Encoding header, or None for identity."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in available:
+        if coding in weights:
+            q = weights[coding]
+        elif coding == "gzip" and "x-gzip" in weights:
+            q = weights["x-gzip"]
+        else:
+            q = wildcard
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, encoding: str, best: bool = False) -> bytes:
+    """Compress a whole body. best=True trades time for size (precompressed files)."""
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if best else BROTLI_QUALITY)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=19 if best else ZSTD_LEVEL).compress(body)
+    return gzip_compress(body, 9 if best else GZIP_LEVEL)
+
+
+def gzip_compress(body: bytes, level: int = GZIP_LEVEL) -> bytes:
+    # wbits=31 writes a gzip header and trailer; no file name or mtime, so output is deterministic
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+class StreamCompressor:
+    """
+    Incremental compressor. Every chunk is flushed at a block boundary so a
+    client can decode what it has received so far.
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        if self.encoding == "zstd":
+            return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
@@ -1,4 +1,20 @@
 from pydantic import BaseModel
+from sqlalchemy import BigInteger, Column, DateTime, String, func
+
+from app.db.database import Base
 
 class CacherSettings(BaseModel):
     cache_lastmod: int
+
+
+class CacheVersion(Base):
+    """
+    Shared freshness state for cached responses: one row per dependency tag
+    (image:<id>, album:<id>, gallery, feeds, ...), bumped in the transaction
+    of every write that touches it, so all workers agree on what is current.
+    """
+    __tablename__ = "cache_versions"
+
+    tag = Column(String(128), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -1,16 +1,16 @@
-from fastapi import APIRouter
-from .service import CacherService
-from app.modules.cacher import service
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from app.db.database import get_db
+from .service import cacher_service as service_instance
 
 router = APIRouter(prefix="/cache", tags=["Cacher"])
-service_instance = CacherService()
 
 @router.post("/regenerate")
-def regenerate_cache():
+def regenerate_cache(db: Session = Depends(get_db)):
     """
     Manual trigger for cache regeneration
     """
-    service_instance.update_lastmod()
+    service_instance.regenerate(db)
     return {"detail": "Cache regenerated"}
 
 @router.post("/exclude")
@@ -20,3 +20,10 @@ def exclude_cache():
     """
     service_instance.excluded = True
     return {"detail": "Cache excluded", "excluded": service_instance.excluded}
+
+@router.get("/stats")
+def cache_stats():
+    """
+    Response cache size, hit rate and coalesced renders
+    """
+    return {**service_instance.cache.stats(), "coalesced": service_instance.flights.coalesced}
@@ -1,11 +1,281 @@
+import hashlib
+import os
+import re
+import threading
 import time
+import uuid
+import zlib
+from collections import OrderedDict, deque
+from datetime import timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
 from fastapi import Request
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Session
+
+from app.db import changes
+from app.modules.cacher.backends import CacheBackend, SingleFlight, shared_backend
+from app.modules.cacher.versions import Version, bump_versions, bump_versions_committed, version_store
+from app.modules.images.models import Image
+
+# Routes that manage their own validators (immutable ETags, static files)
+EXCLUDED_PREFIXES = ("/img/", "/static/")
+
+# Configuration via environment variables (fallbacks)
+CACHER_MAX_ENTRIES = int(os.getenv("CACHER_MAX_ENTRIES", "5000"))
+CACHER_MAX_BYTES = int(os.getenv("CACHER_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHER_MAX_ENTRY_BYTES = int(os.getenv("CACHER_MAX_ENTRY_BYTES", str(2 * 1024 * 1024)))
+# Upper bound on the life of an entry. Writes invalidate precisely, including
+# the image_stats counters; routes served only from Supabase (/likes/count) are not cached.
+CACHER_TTL = float(os.getenv("CACHER_TTL", "300"))
+CACHER_COMPRESS = os.getenv("CACHER_COMPRESS", "1") == "1"
+CACHER_COMPRESS_MIN_BYTES = 1024
+CACHER_COMPRESS_LEVEL = 6
+
+_UUID = r"(?P<id>[0-9a-fA-F-]{32,36})"
+
+# Every cached route depends on this tag; bumping it (POST /cache/regenerate) invalidates all of them
+GLOBAL_TAG = "all"
+
+# Cached routes and the entities their responses depend on. Routes not listed
+# here are never cached, since nothing would invalidate them.
+ROUTE_TAGS: List[Tuple["re.Pattern", Tuple[str, ...]]] = [
+    (re.compile(r"^/images/?$"), ("images",)),
+    (re.compile(rf"^/images/{_UUID}$"), ("image:{id}",)),
+    (re.compile(r"^/albums/?$"), ("albums",)),
+    (re.compile(rf"^/albums/{_UUID}$"), ("album:{id}",)),
+    (re.compile(rf"^/comments/images/{_UUID}$"), ("image:{id}",)),
+    (re.compile(rf"^/comments/albums/{_UUID}$"), ("album:{id}",)),
+    (re.compile(r"^/gallery/?$"), ("gallery",)),
+    (re.compile(r"^/feeds/"), ("feeds",)),
+    (re.compile(r"^/sitemap/"), ("sitemap",)),
+    (re.compile(r"^/pages/?"), ("pages",)),
+    (re.compile(r"^/users/?$"), ("users",)),
+    (re.compile(rf"^/users/{_UUID}$"), ("user:{id}",)),
+]
+
+# Headers that describe the cached body itself rather than the response
+_SKIPPED_HEADERS = {"content-length", "transfer-encoding"}
+
+
+def route_tags(path: str) -> Optional[Tuple[str, ...]]:
+    """Dependency tags of a cacheable route, or None when the route is not cached."""
+    for pattern, templates in ROUTE_TAGS:
+        match = pattern.match(path)
+        if match:
+            ids = {name: value.lower() for name, value in match.groupdict().items()}
+            return tuple(template.format(**ids) for template in templates) + (GLOBAL_TAG,)
+    return None
+
+
+def change_tags(table: str, key: str, values: Dict[str, Any]) -> Set[str]:
+    """Tags invalidated by a write to one row, given its column values."""
+    def ref(prefix: str, column: str) -> List[str]:
+        value = values.get(column)
+        return [f"{prefix}:{str(value).lower()}"] if value else []
+
+    key = key.lower()
+    if table == "images":
+        return {"images", f"image:{key}", "gallery", "feeds", "sitemap", *ref("album", "album_id")}
+    if table == "albums":
+        return {"albums", f"album:{key}", "feeds", "sitemap"}
+    if table == "comments":
+        return {"gallery", *ref("image", "image_id"), *ref("album", "album_id")}
+    if table == "likes":
+        return {"gallery", *ref("image", "image_id")}
+    if table == "image_stats":
+        # Like, view and comment counters, keyed by image id
+        return {"gallery", f"image:{key}"}
+    if table == "uploads":
+        # /images renders srcset from the upload's renditions
+        return {"gallery", "sitemap", "images", *ref("image", "image_id")}
+    if table == "pages":
+        return {"pages", "sitemap"}
+    if table == "users":
+        return {"users", f"user:{key}"}
+    return set()
+
+
+def is_collection_tag(tag: str) -> bool:
+    """Tags of whole collections (gallery, images, feeds...) rather than of one entity."""
+    return ":" not in tag
+
+
+def body_etag(body: bytes) -> str:
+    """Strong ETag from a fast hash of the serialized body."""
+    return '"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison against If-None-Match, as RFC 9110 requires for GET."""
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    if inm.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any(
+        (candidate[2:] if candidate.startswith("W/") else candidate) == opaque
+        for candidate in (part.strip() for part in inm.split(","))
+    )
+
+
+class CachedResponse(NamedTuple):
+    status_code: int
+    headers: List[Tuple[str, str]]
+    body: Optional[bytes]   # None when only the validator is kept (body too large)
+    compressed: bool
+    etag: str
+
+    @property
+    def size(self) -> int:
+        return len(self.body or b"") + 256
+
+    def content(self) -> bytes:
+        return zlib.decompress(self.body) if self.compressed else self.body
+
+
+class ResponseCache:
+    """
+    Bounded LRU of GET response bodies and their ETags. Every entry carries
+    the tags of the entities it was built from and their versions at render
+    time. invalidate(tags) drops exactly the entries that depend on them when
+    this process commits a write; writes from other workers are caught by
+    the version check in get(). Either way a cached ETag is the ETag the
+    handler would produce now, and If-None-Match can be answered without
+    running it.
+
+    With a shared backend the LRU is the first tier: misses fall through to
+    entries rendered by other workers, which are used only when their
+    versions are still current.
+    """
+
+    def __init__(self, max_entries: int = CACHER_MAX_ENTRIES, max_bytes: int = CACHER_MAX_BYTES, ttl: float = CACHER_TTL, shared: Optional[CacheBackend] = shared_backend):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.shared = shared
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, Tuple[CachedResponse, Tuple[str, ...], Tuple[int, ...], float]]" = OrderedDict()
+        self._by_tag: Dict[str, Set[Tuple]] = {}
+        self._total_bytes = 0
+        # Recent invalidations, so a response rendered before a write is not stored after it
+        self._sequence = 0
+        self._recent: "deque[Tuple[int, Set[str]]]" = deque(maxlen=1024)
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _shared_key(key: Tuple) -> str:
+        return "response:" + hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+    def sequence(self) -> int:
+        """Invalidation counter; take it before rendering and pass it to put()."""
+        with self._lock:
+            return self._sequence
+
+    def get(self, key: Tuple, versions: Tuple[int, ...]) -> Optional[CachedResponse]:
+        """The cached response if it was rendered under `versions`. May block on the shared backend."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[2] == versions and entry[3] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._remove(key)
+        if self.shared is not None:
+            shared = self.shared.get(self._shared_key(key))
+            if shared is not None and shared[2] == versions:
+                response, tags, _ = shared
+                with self._lock:
+                    self._insert(key, response, tags, versions)
+                    self.shared_hits += 1
+                return response
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: Tuple, response: CachedResponse, tags: Tuple[str, ...], versions: Tuple[int, ...], sequence: int) -> None:
+        size = response.size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if sequence != self._sequence:
+                if not self._recent or self._recent[0][0] > sequence + 1:
+                    return  # too many invalidations since to tell
+                if any(seq > sequence and not invalidated.isdisjoint(tags) for seq, invalidated in self._recent):
+                    return
+            self._insert(key, response, tags, versions)
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), (response, tags, versions), self.ttl)
+
+    def _insert(self, key: Tuple, response: CachedResponse, tags: Tuple[str, ...], versions: Tuple[int, ...]) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (response, tags, versions, time.monotonic() + self.ttl)
+        self._total_bytes += response.size
+        for tag in tags:
+            self._by_tag.setdefault(tag, set()).add(key)
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: Tuple) -> None:
+        response, tags, _, _ = self._entries.pop(key)
+        self._total_bytes -= response.size
+        for tag in tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """Drop every entry depending on one of the tags. Returns the number dropped."""
+        tags = set(tags)
+        with self._lock:
+            self._sequence += 1
+            self._recent.append((self._sequence, tags))
+            keys = set()
+            for tag in tags:
+                keys |= self._by_tag.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sequence += 1
+            self._recent.clear()
+            self._entries.clear()
+            self._by_tag.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "tags": len(self._by_tag),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
 
 class CacherService:
     def __init__(self):
-        self.lastmod = int(time.time())
         self.excluded = False
-        self.modified = False
+        self.cache = ResponseCache()
+        self.versions = version_store
+        # One render per cold response across threads and workers
+        self.flights = SingleFlight(shared_backend)
 
     # Eligibility check (like PHP eligible())
     def is_eligible(self, request: Request) -> bool:
@@ -13,21 +283,122 @@ class CacherService:
             return False
         if request.method != "GET":
             return False
+        if request.url.path.startswith(EXCLUDED_PREFIXES):
+            return False
         return True
 
-    def get_lastmod(self) -> int:
-        return self.lastmod
+    def freshness(self, tags: Tuple[str, ...]) -> Tuple[Tuple[int, ...], Optional[int]]:
+        """
+        Versions of the tags (0 for tags never written) and the resource's
+        Last-Modified as a Unix timestamp (None if none of them was written).
+        Reads the shared version store, so call it off the event loop.
+        """
+        current: Dict[str, Version] = self.versions.get(tags)
+        versions = tuple(current[tag][0] if tag in current else 0 for tag in tags)
+        stamps = [
+            updated_at if updated_at.tzinfo else updated_at.replace(tzinfo=timezone.utc)
+            for _, updated_at in current.values()
+        ]
+        return versions, int(max(stamps).timestamp()) if stamps else None
+
+    def regenerate(self, db: Session) -> None:
+        """Invalidate every cached response, in all workers."""
+        bump_versions(db.connection(), [GLOBAL_TAG])
+        db.commit()
+        self.versions.forget([GLOBAL_TAG])
+        self.cache.clear()
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """Drop the cached responses depending on the tags (after this process committed a write to them)."""
+        tags = set(tags)
+        self.versions.forget(tags)
+        return self.cache.invalidate(tags)
+
+    # Response cache
+    def cache_key(self, request: Request) -> Tuple[str, str, str]:
+        """Route, normalized query and auth scope (a digest of the credentials, never the credentials)."""
+        query = "&".join(sorted(request.url.query.split("&"))) if request.url.query else ""
+        credentials = request.headers.get("authorization")
+        scope = hashlib.sha256(credentials.encode()).hexdigest()[:32] if credentials else "public"
+        return request.url.path, query, scope
+
+    def store(self, key: Tuple, tags: Tuple[str, ...], versions: Tuple[int, ...], sequence: int, status_code: int, headers: Iterable[Tuple[str, str]], body: bytes, etag: str) -> None:
+        if status_code != 200:
+            return
+        headers = list(headers)
+        # Per-client cookies and content codings are not part of the cache key
+        if any(name.lower() in ("set-cookie", "content-encoding") for name, _ in headers):
+            return
+        kept = [(name, value) for name, value in headers if name.lower() not in _SKIPPED_HEADERS]
+        compressed = False
+        if len(body) > CACHER_MAX_ENTRY_BYTES:
+            body = None
+        elif CACHER_COMPRESS and len(body) >= CACHER_COMPRESS_MIN_BYTES:
+            body, compressed = zlib.compress(body, CACHER_COMPRESS_LEVEL), True
+        self.cache.put(key, CachedResponse(status_code, kept, body, compressed, etag), tags, versions, sequence)
+
+
+cacher_service = CacherService()
+
+
+def _linked_images(session: Session, upload_ids: List[str]) -> Dict[str, str]:
+    """{upload id: image id} for the images built on the given uploads."""
+    ids = []
+    for upload_id in upload_ids:
+        try:
+            ids.append(uuid.UUID(upload_id))
+        except ValueError:
+            continue
+    if not ids:
+        return {}
+    rows = session.connection().execute(select(Image.upload_id, Image.id).where(Image.upload_id.in_(ids)))
+    return {str(upload_id).lower(): str(image_id) for upload_id, image_id in rows}
+
 
-    def update_lastmod(self):
-        self.lastmod = int(time.time())
-        self.modified = True
+@changes.on_flush
+def tag_changes(session: Session, captured: List[changes.Change]) -> None:
+    """
+    Work out the cache tags of each write while the instances can still be
+    read, including the image or album a row pointed to before an update.
+    Entity tags are bumped in the same transaction; collection tags are
+    shared by every writer, so they are bumped after commit instead of
+    holding their rows locked for the length of each write transaction.
+    """
+    written = set()
+    images = _linked_images(session, [change.key for change in captured if change.table == "uploads"])
+    for change in captured:
+        values = dict(change.data)
+        if change.table == "uploads":
+            values["image_id"] = images.get(change.key.lower())
+        if change.obj is not None:
+            state = inspect(change.obj)
+            values = {**state.dict, **values}
+            tags = change_tags(change.table, change.key, values)
+            if change.op == changes.UPDATE:
+                for column in ("album_id", "image_id"):
+                    if column in state.mapper.attrs:
+                        for previous in state.attrs[column].history.deleted or ():
+                            tags |= change_tags(change.table, change.key, {column: previous})
+        else:
+            tags = change_tags(change.table, change.key, values)
+        if tags:
+            change.extra["cache_tags"] = tags
+            written |= tags
+    entity_tags = [tag for tag in written if not is_collection_tag(tag)]
+    if entity_tags:
+        bump_versions(session.connection(), entity_tags)
 
-    # ETag generation
-    def generate_etag(self, request: Request) -> str:
-        # Simple example; in PHP it used visitor + route
-        return f'W/"{self.lastmod}"'
 
-    # ETag validation
-    def validate_etag(self, request: Request) -> bool:
-        inm = request.headers.get("if-none-match")
-        return inm == self.generate_etag(request)
+@changes.on_commit
+def invalidate_responses(captured: List[changes.Change]) -> None:
+    tags = set()
+    for change in captured:
+        tags |= change.extra.get("cache_tags") or change_tags(change.table, change.key, change.data)
+    if not tags:
+        return
+    try:
+        collection_tags = [tag for tag in tags if is_collection_tag(tag)]
+        if collection_tags:
+            bump_versions_committed(collection_tags)
+    finally:
+        cacher_service.invalidate(tags)
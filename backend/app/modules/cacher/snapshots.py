@@ -0,0 +1,105 @@
+"""
+Precompressed on-disk snapshots of generated documents (sitemap, feeds).
+
+A snapshot is written once per version of the tags it depends on, next to
+.br and .gz siblings compressed at the highest levels, and served as a file
+in the coding the client prefers, so neither rendering nor compression runs
+again until one of its tags is bumped by a write. File names carry the tag
+versions, so a body and its siblings always belong to the same render; the
+body is written last and marks the set complete. Rendering a stale snapshot
+goes through single-flight, once across threads and workers.
+"""
+import glob
+import os
+import tempfile
+import time
+from typing import Callable, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+from app.modules.cacher.backends import single_flight
+from app.modules.cacher.encodings import brotli, compress, negotiate
+from app.modules.cacher.service import GLOBAL_TAG, cacher_service
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(os.getcwd(), "snapshots"))
+# Superseded versions are kept this long, so responses already serving them can finish
+SNAPSHOT_KEEP_SECONDS = 60
+
+# Content coding -> file suffix of the precompressed sibling
+PRECOMPRESSED = {"br": ".br", "gzip": ".gz"} if brotli is not None else {"gzip": ".gz"}
+
+
+def _write(path: str, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".temp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class Snapshot:
+    def __init__(self, name: str, media_type: str, tags: Tuple[str, ...]):
+        self.name = name
+        self.media_type = media_type
+        self.tags = tags + (GLOBAL_TAG,)
+
+    def versions(self) -> Tuple[int, ...]:
+        return cacher_service.freshness(self.tags)[0]
+
+    def path(self, versions: Tuple[int, ...]) -> str:
+        return os.path.join(SNAPSHOT_DIR, f"{self.name}.v{'-'.join(str(v) for v in versions)}")
+
+    def serve(self, request: Request, versions: Tuple[int, ...]) -> Optional[Response]:
+        """The snapshot in the client's preferred coding, or None if it is not saved for these versions."""
+        path = self.path(versions)
+        if not os.path.isfile(path):
+            return None
+        siblings = [coding for coding, suffix in PRECOMPRESSED.items() if os.path.isfile(path + suffix)]
+        coding = negotiate(request.headers.get("accept-encoding"), siblings)
+        headers = {"Vary": "Accept-Encoding"}
+        if coding:
+            path += PRECOMPRESSED[coding]
+            headers["Content-Encoding"] = coding
+        return FileResponse(path, media_type=self.media_type, headers=headers)
+
+    def save(self, body: bytes, versions: Tuple[int, ...]) -> None:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        path = self.path(versions)
+        for coding, suffix in PRECOMPRESSED.items():
+            _write(path + suffix, compress(body, coding, best=True))
+        _write(path, body)
+        self._prune(path)
+
+    def _prune(self, current: str) -> None:
+        cutoff = time.time() - SNAPSHOT_KEEP_SECONDS
+        for path in glob.glob(glob.escape(os.path.join(SNAPSHOT_DIR, self.name)) + ".v*"):
+            if path == current or path.startswith(current + "."):
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def respond(self, request: Request, render: Callable[[], bytes]) -> Response:
+        """
+        Serve the snapshot, rendering and saving it first when it is stale.
+        Blocking: call from sync handlers, which run in the threadpool.
+        """
+        versions = self.versions()  # before rendering, so a concurrent write leaves it stale
+
+        def build():
+            body = render()
+            try:
+                self.save(body, versions)
+            except OSError:
+                return Response(content=body, media_type=self.media_type)
+            return self.serve(request, versions) or Response(content=body, media_type=self.media_type)
+
+        key = f"snapshot:{self.name}:{'-'.join(str(v) for v in versions)}"
+        return single_flight.do(key, lambda: self.serve(request, versions), build)
@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+
+from app.db.database import SessionLocal, engine
+from app.modules.cacher.models import CacheVersion
+
+# Configuration via environment variables (fallbacks)
+# How long a worker trusts versions it has read; bounds staleness after writes in other workers
+CACHER_VERSION_TTL = float(os.getenv("CACHER_VERSION_TTL", "2"))
+CACHER_VERSION_MEMO_SIZE = int(os.getenv("CACHER_VERSION_MEMO_SIZE", "20000"))
+
+Version = Tuple[int, datetime]
+
+_versions = CacheVersion.__table__
+
+
+def bump_versions(conn: Connection, tags: Iterable[str]) -> None:
+    """Increment the version of each tag inside the caller's transaction, creating missing rows."""
+    now = datetime.now(timezone.utc)
+    rows = [{"tag": tag, "version": 1, "updated_at": now} for tag in sorted(set(tags))]  # fixed order avoids deadlocks
+    if not rows:
+        return
+    if conn.dialect.name in ("postgresql", "sqlite"):
+        insert = pg_insert if conn.dialect.name == "postgresql" else sqlite_insert
+        stmt = insert(_versions).values(rows)
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=["tag"],
+            set_={"version": _versions.c.version + 1, "updated_at": stmt.excluded.updated_at},
+        ))
+        return
+    for row in rows:
+        result = conn.execute(
+            update(_versions)
+            .where(_versions.c.tag == row["tag"])
+            .values(version=_versions.c.version + 1, updated_at=now)
+        )
+        if not result.rowcount:
+            conn.execute(_versions.insert().values(**row))
+
+
+def bump_versions_committed(tags: Iterable[str]) -> None:
+    """bump_versions in a short transaction of its own, for tags shared by every writer."""
+    with engine.begin() as conn:
+        bump_versions(conn, tags)
+
+
+class VersionStore:
+    """
+    Per-process view of cache_versions. Reads are memoized for a short TTL;
+    tags written by this process are forgotten on commit, so only writes made
+    by other workers can be seen late, by at most CACHER_VERSION_TTL.
+    """
+
+    def __init__(self, ttl: float = CACHER_VERSION_TTL, max_size: int = CACHER_VERSION_MEMO_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._memo: "OrderedDict[str, Tuple[Optional[Version], float]]" = OrderedDict()
+
+    def get(self, tags: Iterable[str]) -> Dict[str, Version]:
+        """{tag: (version, updated_at)} for the tags that have been written at least once."""
+        tags = list(tags)
+        now = time.monotonic()
+        with self._lock:
+            missing = [tag for tag in tags if tag not in self._memo or self._memo[tag][1] <= now]
+        found: Dict[str, Version] = {}
+        if missing:
+            db = SessionLocal()
+            try:
+                found = {
+                    tag: (version, updated_at)
+                    for tag, version, updated_at in db.execute(
+                        select(_versions.c.tag, _versions.c.version, _versions.c.updated_at)
+                        .where(_versions.c.tag.in_(missing))
+                    )
+                }
+            finally:
+                db.close()
+            with self._lock:
+                for tag in missing:
+                    self._memo[tag] = (found.get(tag), now + self.ttl)
+                    self._memo.move_to_end(tag)
+                while len(self._memo) > self.max_size:
+                    self._memo.popitem(last=False)
+        versions = {}
+        with self._lock:
+            for tag in tags:
+                entry = self._memo.get(tag)
+                version = entry[0] if entry is not None else found.get(tag)
+                if version is not None:
+                    versions[tag] = version
+        return versions
+
+    def forget(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for tag in tags:
+                self._memo.pop(tag, None)
+
+
+version_store = VersionStore()
@@ -1,24 +1,37 @@
 import json
+import os
 from app.db.supabase_client import supabase
+from app.modules.cacher.backends import cache_backend, cached, shared_backend
 from app.modules.cascade import schemas
 from postgrest.exceptions import APIError
 
+SETTINGS_CACHE_KEY = "settings:cascade"
+SETTINGS_CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", "300"))
+
 class CascadeService:
     def __init__(self):
         self.table = "module_cascade"
 
     def get_settings(self) -> schemas.CascadeSettings:
+        # Shared across workers; a cold key is fetched from Supabase once.
+        # Without a shared cache a worker could not see another's update, so read through.
         try:
-            res = (
-                supabase.table(self.table)
-                .select("*")
-                .eq("setting_name", "ajax_scroll_auto")
-                .maybe_single()
-                .execute()
-            )
+            if shared_backend is None:
+                return self._load_settings()
+            data = cached(SETTINGS_CACHE_KEY, lambda: self._load_settings().model_dump(), SETTINGS_CACHE_TTL)
         except APIError:
-            # Default if network/API error occurs
+            # Default if network/API error occurs (not cached)
             return schemas.CascadeSettings(ajax_scroll_auto=True)
+        return schemas.CascadeSettings(**data)
+
+    def _load_settings(self) -> schemas.CascadeSettings:
+        res = (
+            supabase.table(self.table)
+            .select("*")
+            .eq("setting_name", "ajax_scroll_auto")
+            .maybe_single()
+            .execute()
+        )
 
         if res and res.data:
             # Parse JSON string safely
@@ -43,6 +56,8 @@ class CascadeService:
             .execute()
         )
 
+        cache_backend.delete(SETTINGS_CACHE_KEY)
+
         # Supabase may return string, so parse it safely
         setting_value = res.data[0].get('setting_value')
         if isinstance(setting_value, str):
@@ -7,6 +7,7 @@ from app.modules.comments import models as comment_models
 from app.modules.comments import schemas as comment_schemas
 from app.modules.albums.models import Album # Added Album model import
 from app.modules.images.models import Image # Added Image model import
+from app.modules.image_stats import service as stats_service
 
 class CommentService:
     """
@@ -55,6 +56,8 @@ class CommentService:
             raise ValueError("Parent (album or image) not found.")
             
         db.add(new_comment)
+        if new_comment.image_id:
+            stats_service.apply_delta(db, new_comment.image_id, comments=1)
         db.commit()
         db.refresh(new_comment)
         return new_comment
@@ -74,4 +77,6 @@ class CommentService:
         comment = self.get_comment(db, comment_id)
         if comment:
             db.delete(comment)
+            if comment.image_id:
+                stats_service.apply_delta(db, comment.image_id, comments=-1)
             db.commit()
@@ -0,0 +1,79 @@
+# app/modules/exif/router.py
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.db.database import get_db
+from app.modules.exif import schemas, service
+from app.modules.uploads import schemas as upload_schemas
+from app.modules.uploads.router import deserialize_upload
+
+router = APIRouter(prefix="/exif", tags=["EXIF"])
+
+
+def exif_filters(
+    camera_make: Optional[str] = Query(None, max_length=64),
+    camera_model: Optional[str] = Query(None, max_length=128),
+    lens_model: Optional[str] = Query(None, max_length=128),
+    iso_min: Optional[int] = Query(None, ge=0),
+    iso_max: Optional[int] = Query(None, ge=0),
+    focal_min: Optional[float] = Query(None, ge=0, description="Focal length in mm"),
+    focal_max: Optional[float] = Query(None, ge=0, description="Focal length in mm"),
+    taken_from: Optional[datetime] = Query(None, description="Taken at or after"),
+    taken_to: Optional[datetime] = Query(None, description="Taken before"),
+) -> dict:
+    return {
+        "camera_make": camera_make,
+        "camera_model": camera_model,
+        "lens_model": lens_model,
+        "iso_min": iso_min,
+        "iso_max": iso_max,
+        "focal_min": focal_min,
+        "focal_max": focal_max,
+        "taken_from": taken_from,
+        "taken_to": taken_to,
+    }
+
+
+@router.get("/uploads", response_model=List[upload_schemas.UploadSummaryOut])
+def search_uploads(
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=500),
+    filters: dict = Depends(exif_filters),
+    db: Session = Depends(get_db),
+):
+    """Uploads filtered by camera, lens, ISO, focal length and date taken"""
+    items = service.search_uploads(db, skip=skip, limit=limit, **filters)
+    return [deserialize_upload(item, upload_schemas.UploadSummaryOut) for item in items]
+
+
+@router.get("/cameras", response_model=List[schemas.CameraFacet])
+def camera_facets(
+    limit: int = Query(50, ge=1, le=500),
+    filters: dict = Depends(exif_filters),
+    db: Session = Depends(get_db),
+):
+    """Upload counts per camera, within the other filters"""
+    return service.camera_facets(db, limit=limit, **filters)
+
+
+@router.get("/lenses", response_model=List[schemas.LensFacet])
+def lens_facets(
+    limit: int = Query(50, ge=1, le=500),
+    filters: dict = Depends(exif_filters),
+    db: Session = Depends(get_db),
+):
+    """Upload counts per lens, within the other filters"""
+    return service.lens_facets(db, limit=limit, **filters)
+
+
+@router.get("/taken", response_model=List[schemas.DateFacet])
+def date_facets(
+    period: str = Query("month", regex="^(year|month)$"),
+    filters: dict = Depends(exif_filters),
+    db: Session = Depends(get_db),
+):
+    """Upload counts per year or month taken, within the other filters"""
+    return service.date_facets(db, period=period, **filters)
@@ -0,0 +1,20 @@
+# app/modules/exif/schemas.py
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class CameraFacet(BaseModel):
+    camera_make: Optional[str] = None
+    camera_model: Optional[str] = None
+    count: int
+
+
+class LensFacet(BaseModel):
+    lens_model: str
+    count: int
+
+
+class DateFacet(BaseModel):
+    period: str  # "2024" or "2024-05"
+    count: int
@@ -0,0 +1,88 @@
+# app/modules/exif/service.py
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Query, Session
+
+from app.modules.uploads.models import Upload
+
+
+def _filtered(
+    q: Query,
+    camera_make: Optional[str] = None,
+    camera_model: Optional[str] = None,
+    lens_model: Optional[str] = None,
+    iso_min: Optional[int] = None,
+    iso_max: Optional[int] = None,
+    focal_min: Optional[float] = None,
+    focal_max: Optional[float] = None,
+    taken_from: Optional[datetime] = None,
+    taken_to: Optional[datetime] = None,
+) -> Query:
+    """
+    Apply the EXIF filters shared by the facet and search queries (all optional,
+    ANDed). Only public uploads are listed or counted, as in the geo lookups.
+    """
+    q = q.filter(Upload.privacy == "public")
+    if camera_make:
+        q = q.filter(Upload.camera_make == camera_make)
+    if camera_model:
+        q = q.filter(Upload.camera_model == camera_model)
+    if lens_model:
+        q = q.filter(Upload.lens_model == lens_model)
+    if iso_min is not None:
+        q = q.filter(Upload.iso >= iso_min)
+    if iso_max is not None:
+        q = q.filter(Upload.iso <= iso_max)
+    if focal_min is not None:
+        q = q.filter(Upload.focal_length >= focal_min)
+    if focal_max is not None:
+        q = q.filter(Upload.focal_length <= focal_max)
+    if taken_from is not None:
+        q = q.filter(Upload.taken_at >= taken_from)
+    if taken_to is not None:
+        q = q.filter(Upload.taken_at < taken_to)
+    return q
+
+
+def camera_facets(db: Session, limit: int = 50, **filters: Any) -> List[Dict[str, Any]]:
+    """Upload counts per camera (make, model), most used first."""
+    count = func.count().label("count")
+    q = db.query(Upload.camera_make, Upload.camera_model, count).filter(Upload.camera_model.isnot(None))
+    rows = (
+        _filtered(q, **filters)
+        .group_by(Upload.camera_make, Upload.camera_model)
+        .order_by(count.desc(), Upload.camera_make, Upload.camera_model)
+        .limit(limit)
+        .all()
+    )
+    return [{"camera_make": make, "camera_model": model, "count": n} for make, model, n in rows]
+
+
+def lens_facets(db: Session, limit: int = 50, **filters: Any) -> List[Dict[str, Any]]:
+    """Upload counts per lens, most used first."""
+    count = func.count().label("count")
+    q = db.query(Upload.lens_model, count).filter(Upload.lens_model.isnot(None))
+    rows = _filtered(q, **filters).group_by(Upload.lens_model).order_by(count.desc(), Upload.lens_model).limit(limit).all()
+    return [{"lens_model": lens, "count": n} for lens, n in rows]
+
+
+def _period(db: Session, period: str):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(func.date_trunc(period, Upload.taken_at), "YYYY" if period == "year" else "YYYY-MM")
+    return func.strftime("%Y" if period == "year" else "%Y-%m", Upload.taken_at)
+
+
+def date_facets(db: Session, period: str = "month", **filters: Any) -> List[Dict[str, Any]]:
+    """Upload counts per year or month taken, oldest first."""
+    bucket = _period(db, period).label("period")
+    q = db.query(bucket, func.count()).filter(Upload.taken_at.isnot(None))
+    rows = _filtered(q, **filters).group_by(bucket).order_by(bucket).all()
+    return [{"period": p, "count": n} for p, n in rows]
+
+
+def search_uploads(db: Session, skip: int = 0, limit: int = 100, **filters: Any) -> List[Upload]:
+    """Uploads matching the EXIF filters, most recently taken first."""
+    q = _filtered(db.query(Upload), **filters)
+    return q.order_by(Upload.taken_at.desc().nullslast(), Upload.id.desc()).offset(skip).limit(limit).all()
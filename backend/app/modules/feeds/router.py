@@ -1,23 +1,32 @@
 # router.py
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from app.db.database import get_db
+from app.modules.cacher.snapshots import Snapshot
 from . import service
 
 router = APIRouter(prefix="/feeds", tags=["feeds"])
 
+# Rendered once per change to the feeds' content, stored with .br/.gz siblings
+SNAPSHOTS = {
+    ("images", "rss"): Snapshot("feed-images.rss", "application/rss+xml", ("feeds",)),
+    ("images", "atom"): Snapshot("feed-images.atom", "application/atom+xml", ("feeds",)),
+    ("albums", "rss"): Snapshot("feed-albums.rss", "application/rss+xml", ("feeds",)),
+    ("albums", "atom"): Snapshot("feed-albums.atom", "application/atom+xml", ("feeds",)),
+}
+
 @router.get("/images/rss")
-def rss_images_feed(db: Session = Depends(get_db)):
-    return service.generate_rss(db)
+def rss_images_feed(request: Request, db: Session = Depends(get_db)):
+    return SNAPSHOTS["images", "rss"].respond(request, lambda: service.generate_rss(db).body)
 
 @router.get("/images/atom")
-def atom_images_feed(db: Session = Depends(get_db)):
-    return service.generate_atom(db)
+def atom_images_feed(request: Request, db: Session = Depends(get_db)):
+    return SNAPSHOTS["images", "atom"].respond(request, lambda: service.generate_atom(db).body)
 
 @router.get("/albums/rss")
-def rss_albums_feed(db: Session = Depends(get_db)):
-    return service.generate_rss(db, content_type="albums")
+def rss_albums_feed(request: Request, db: Session = Depends(get_db)):
+    return SNAPSHOTS["albums", "rss"].respond(request, lambda: service.generate_rss(db, content_type="albums").body)
 
 @router.get("/albums/atom")
-def atom_albums_feed(db: Session = Depends(get_db)):
-    return service.generate_atom(db, content_type="albums")
+def atom_albums_feed(request: Request, db: Session = Depends(get_db)):
+    return SNAPSHOTS["albums", "atom"].respond(request, lambda: service.generate_atom(db, content_type="albums").body)
@@ -1,59 +1,41 @@
-import json
-from fastapi import APIRouter, Depends, Request
-from sqlalchemy.orm import Session, joinedload
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
 from app.db.database import get_db
-from app.modules.images import models as image_models
-from app.modules.comments import models as comment_models
+from app.modules.gallery import service
 
 router = APIRouter(prefix="/gallery")
 
 @router.get("/")
-def get_gallery(request: Request, db: Session = Depends(get_db)):
+def get_gallery(
+    request: Request,
+    limit: int = Query(service.GALLERY_PAGE_SIZE, ge=1, le=service.GALLERY_MAX_PAGE_SIZE, description="Images per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    comments: int = Query(service.GALLERY_COMMENT_PREVIEWS, ge=0, le=20, description="Comment previews per image"),
+    db: Session = Depends(get_db),
+):
     """
-    Fetch all images with their likes, views, and comments.
+    Fetch one page of images (newest first) with like, view and comment counts
+    and the latest few comments per image.
     Returns full URLs for images so the frontend can display them directly.
+    The cursor for the next page is sent in the X-Next-Cursor header.
     """
-    images = (
-        db.query(image_models.Image)
-        .options(
-            joinedload(image_models.Image.likes),
-            joinedload(image_models.Image.views),
-            joinedload(image_models.Image.comments).joinedload(comment_models.Comment.user),
-        )
-        .all()
-    )
-
     base_url = str(request.base_url)  # e.g., http://localhost:8000/
 
-    response = []
-    for img in images:
-        # ✅ Force SQLAlchemy to reload latest state from DB
-        db.refresh(img)
-
-        full_url = f"{base_url}static/uploads/{img.filename}"  # Match your StaticFiles mount
-
-        # ✅ Always fresh counts
-        likes_count = len(img.likes) if img.likes else 0
-        views_count = len(img.views) if img.views else 0
-
-        # Comments with safe user names
-        comment_list = [
-            {
-                "id": comment.id,
-                "text": comment.content,
-                "user": comment.user.username if comment.user else "Anonymous",
-            }
-            for comment in img.comments
-        ]
+    try:
+        items, next_cursor = service.get_gallery_page(
+            db, base_url, limit=limit, cursor=cursor, comment_previews=comments
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-        response.append({
-            "id": img.id,
-            "url": full_url,
-            "title": img.title,
-            "album_id": img.album_id,
-            "likes": likes_count,
-            "views": views_count,
-            "comments": comment_list,
-        })
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
 
-    return response
+    # A page is bounded by GALLERY_MAX_PAGE_SIZE and built from batched queries, so it
+    # is serialized in one go (the cacher buffers and stores the whole body anyway)
+    return JSONResponse(content=jsonable_encoder(items), headers=headers)
@@ -0,0 +1,180 @@
+# app/modules/gallery/service.py
+import base64
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from app.modules.images import models as image_models
+from app.modules.image_stats import service as stats_service
+from app.modules.image_likes import models as likes_models
+from app.modules.image_views import models as views_models
+from app.modules.comments import models as comment_models
+from app.modules.users import models as user_models
+from app.modules.uploads import models as upload_models
+
+# Page sizes (override with env vars)
+GALLERY_PAGE_SIZE = int(os.getenv("GALLERY_PAGE_SIZE", "24"))
+GALLERY_MAX_PAGE_SIZE = int(os.getenv("GALLERY_MAX_PAGE_SIZE", "100"))
+GALLERY_COMMENT_PREVIEWS = int(os.getenv("GALLERY_COMMENT_PREVIEWS", "3"))
+
+
+def encode_cursor(created_at: datetime, image_id: UUID) -> str:
+    """
+    Build an opaque keyset cursor from the (created_at, id) of the last row of a page.
+    """
+    raw = f"{created_at.isoformat()}|{image_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """
+    Parse a cursor produced by encode_cursor. Raises ValueError if it is malformed.
+    """
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        created_at, image_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(image_id)
+    except Exception as e:
+        raise ValueError(f"Invalid gallery cursor: {cursor}") from e
+
+
+def _grouped_counts(db: Session, column, image_ids: List[UUID]) -> Dict[UUID, int]:
+    """
+    Count rows per image with a single GROUP BY restricted to the ids on the page.
+    """
+    rows = (
+        db.query(column, func.count())
+        .filter(column.in_(image_ids))
+        .group_by(column)
+        .all()
+    )
+    return {image_id: count for image_id, count in rows}
+
+
+def _comment_previews(db: Session, image_ids: List[UUID], per_image: int) -> Dict[UUID, List[dict]]:
+    """
+    Return the newest `per_image` comments for each image, using a window function
+    so only the preview rows leave the database.
+    """
+    if per_image <= 0:
+        return {}
+
+    Comment = comment_models.Comment
+    rank = (
+        func.row_number()
+        .over(
+            partition_by=Comment.image_id,
+            order_by=(Comment.created_at.desc(), Comment.id.desc()),
+        )
+        .label("rank")
+    )
+    ranked = (
+        db.query(
+            Comment.id.label("id"),
+            Comment.image_id.label("image_id"),
+            Comment.content.label("content"),
+            Comment.user_id.label("user_id"),
+            rank,
+        )
+        .filter(Comment.image_id.in_(image_ids))
+        .subquery()
+    )
+    rows = (
+        db.query(ranked.c.id, ranked.c.image_id, ranked.c.content, user_models.User.username)
+        .outerjoin(user_models.User, user_models.User.id == ranked.c.user_id)
+        .filter(ranked.c.rank <= per_image)
+        .order_by(ranked.c.image_id, ranked.c.rank)
+        .all()
+    )
+
+    previews: Dict[UUID, List[dict]] = {}
+    for comment_id, image_id, content, username in rows:
+        previews.setdefault(image_id, []).append({
+            "id": comment_id,
+            "text": content,
+            "user": username or "Anonymous",
+        })
+    return previews
+
+
+def get_gallery_page(
+    db: Session,
+    base_url: str,
+    limit: int = GALLERY_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    comment_previews: int = GALLERY_COMMENT_PREVIEWS,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Fetch one page of the gallery, newest first, keyed on (created_at, id).
+
+    Only the columns the gallery renders are selected. Like, view and comment
+    counts are read from image_stats (grouped aggregates for images it does not
+    cover yet), and each image carries at most `comment_previews` comments.
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    Image = image_models.Image
+    limit = max(1, min(limit, GALLERY_MAX_PAGE_SIZE))
+
+    Upload = upload_models.Upload
+    q = (
+        db.query(Image.id, Image.created_at, Image.filename, Image.title, Image.album_id, Upload.renditions)
+        .outerjoin(Upload, Upload.id == Image.upload_id)
+    )
+    if cursor:
+        after_created_at, after_id = decode_cursor(cursor)
+        q = q.filter(
+            or_(
+                Image.created_at < after_created_at,
+                and_(Image.created_at == after_created_at, Image.id < after_id),
+            )
+        )
+    # Fetch one extra row to learn whether another page exists
+    rows = q.order_by(Image.created_at.desc(), Image.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    if not rows:
+        return [], None
+
+    image_ids = [row.id for row in rows]
+    stats = stats_service.get_stats_map(db, image_ids)
+
+    # Images not yet covered by image_stats fall back to grouped aggregates
+    missing = [image_id for image_id in image_ids if image_id not in stats]
+    if missing:
+        likes = _grouped_counts(db, likes_models.ImageLike.image_id, missing)
+        views = _grouped_counts(db, views_models.ImageView.image_id, missing)
+        comment_counts = _grouped_counts(db, comment_models.Comment.image_id, missing)
+        for image_id in missing:
+            stats[image_id] = {
+                "likes": likes.get(image_id, 0),
+                "views": views.get(image_id, 0),
+                "comments": comment_counts.get(image_id, 0),
+            }
+
+    previews = _comment_previews(db, image_ids, comment_previews)
+
+    items = [
+        {
+            "id": row.id,
+            "url": f"{base_url}static/uploads/{row.filename}",  # Match your StaticFiles mount
+            "srcset": upload_models.build_srcset(row.renditions),
+            "title": row.title,
+            "album_id": row.album_id,
+            "created_at": row.created_at,
+            "likes": stats[row.id]["likes"],
+            "views": stats[row.id]["views"],
+            "comments_count": stats[row.id]["comments"],
+            "comments": previews.get(row.id, []),
+        }
+        for row in rows
+    ]
+    return items, next_cursor
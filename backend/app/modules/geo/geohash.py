@@ -0,0 +1,92 @@
+# app/modules/geo/geohash.py
+"""
+Geohash encoding and bounding-box covers.
+
+A geohash interleaves longitude and latitude bits into a base-32 string, so
+every prefix is a rectangular cell and nearby points share prefixes. With a
+B-tree index on the geohash column, "points in this cell" is an index range
+scan (LIKE 'prefix%'), which is how bounding-box queries and map clustering
+work without PostGIS.
+"""
+import math
+from typing import List, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+MAX_PRECISION = 12
+
+
+def encode(lat: float, lon: float, precision: int = MAX_PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # even bits refine longitude
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = value * 2 + 1
+                lon_lo = mid
+            else:
+                value *= 2
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = value * 2 + 1
+                lat_lo = mid
+            else:
+                value *= 2
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(height in degrees latitude, width in degrees longitude) of a cell."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def _grid(south: float, west: float, north: float, east: float, precision: int) -> Tuple[int, int, int, int]:
+    height, width = cell_size(precision)
+    row0 = math.floor((south + 90) / height)
+    row1 = math.floor((min(north, 90 - 1e-9) + 90) / height)
+    col0 = math.floor((west + 180) / width)
+    col1 = math.floor((min(east, 180 - 1e-9) + 180) / width)
+    return row0, row1, col0, col1
+
+
+def cover(south: float, west: float, north: float, east: float, max_precision: int = MAX_PRECISION, max_cells: int = 64) -> List[str]:
+    """
+    Geohash prefixes whose cells together cover the box (west <= east), using
+    the finest precision up to max_precision that needs at most max_cells.
+    """
+    precision = max(1, min(max_precision, MAX_PRECISION))
+    while precision > 1:
+        row0, row1, col0, col1 = _grid(south, west, north, east, precision)
+        if (row1 - row0 + 1) * (col1 - col0 + 1) <= max_cells:
+            break
+        precision -= 1
+    height, width = cell_size(precision)
+    row0, row1, col0, col1 = _grid(south, west, north, east, precision)
+    return sorted({
+        encode(-90 + (row + 0.5) * height, -180 + (col + 0.5) * width, precision)
+        for row in range(row0, row1 + 1)
+        for col in range(col0, col1 + 1)
+    })
+
+
+def precision_for_zoom(zoom: int, cells_per_tile: int = 8) -> int:
+    """
+    Geohash precision whose cells are about 1/cells_per_tile of a web map
+    tile's width at this zoom level.
+    """
+    lon_bits = zoom + max(0, cells_per_tile.bit_length() - 1)
+    return max(1, min(MAX_PRECISION, math.ceil(2 * lon_bits / 5)))
@@ -0,0 +1,61 @@
+# app/modules/geo/router.py
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response, status
+from sqlalchemy.orm import Session
+
+from app.db.database import get_db
+from app.modules.geo import schemas, service
+from app.modules.uploads import schemas as upload_schemas
+from app.modules.uploads.router import deserialize_upload
+
+router = APIRouter(prefix="/geo", tags=["Geo"])
+
+CLUSTERS_MAX_AGE = 60  # seconds
+
+
+@router.get("/uploads", response_model=List[upload_schemas.UploadSummaryOut])
+def uploads_in_bbox(
+    south: float = Query(..., ge=-90, le=90),
+    west: float = Query(..., ge=-180, le=180),
+    north: float = Query(..., ge=-90, le=90),
+    east: float = Query(..., ge=-180, le=180, description="May be less than west to cross the antimeridian"),
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    """Public uploads taken inside a bounding box"""
+    if south > north:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="south must not be greater than north")
+    items = service.in_bbox(db, south, west, north, east, skip=skip, limit=limit)
+    return [deserialize_upload(item, upload_schemas.UploadSummaryOut) for item in items]
+
+
+@router.get("/near", response_model=List[schemas.NearbyUpload])
+def uploads_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(1000, gt=0, le=500_000, description="Meters"),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    """Public uploads taken within a radius of a point, nearest first"""
+    return [
+        {"upload": deserialize_upload(upload, upload_schemas.UploadSummaryOut), "distance_m": distance}
+        for upload, distance in service.near(db, lat, lon, radius, limit=limit)
+    ]
+
+
+@router.get("/clusters/{z}/{x}/{y}", response_model=List[schemas.ClusterMarker])
+def tile_clusters(
+    response: Response,
+    z: int = Path(..., ge=0, le=20),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    db: Session = Depends(get_db),
+):
+    """Clustered markers for one web map tile (z/x/y, as in slippy map URLs)"""
+    if x >= 2 ** z or y >= 2 ** z:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tile out of range")
+    response.headers["Cache-Control"] = f"public, max-age={CLUSTERS_MAX_AGE}"
+    return service.clusters(db, z, x, y)
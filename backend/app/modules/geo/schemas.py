@@ -0,0 +1,19 @@
+# app/modules/geo/schemas.py
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.modules.uploads.schemas import UploadSummaryOut
+
+
+class NearbyUpload(BaseModel):
+    upload: UploadSummaryOut
+    distance_m: float
+
+
+class ClusterMarker(BaseModel):
+    geohash: str
+    count: int
+    lat: float
+    lon: float
+    upload_id: Optional[str] = None  # one upload in the cluster, e.g. for its thumbnail
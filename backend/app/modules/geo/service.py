@@ -0,0 +1,147 @@
+# app/modules/geo/service.py
+import math
+import os
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import and_, func, or_, text
+from sqlalchemy.orm import Session
+
+from app.modules.geo import geohash
+from app.modules.uploads.models import Upload
+
+# Configuration via environment variables (fallbacks)
+GEO_MAX_CANDIDATES = int(os.getenv("GEO_MAX_CANDIDATES", "5000"))  # radius search without PostGIS
+GEO_COVER_CELLS = 32  # geohash prefixes per bounding box
+EARTH_RADIUS_M = 6371008.8
+
+# Must match the expression of the GiST index created by migrate_geo.py
+POINT = func.geography(func.ST_SetSRID(func.ST_MakePoint(Upload.gps_lon, Upload.gps_lat), 4326))
+
+_postgis: Dict[str, bool] = {}
+
+
+def postgis_available(db: Session) -> bool:
+    """Whether the PostGIS extension is installed (checked once per database)."""
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return False
+    key = str(bind.url)
+    if key not in _postgis:
+        _postgis[key] = db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'postgis'")).first() is not None
+    return _postgis[key]
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in meters."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def tile_bbox(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) of a web map (slippy) tile."""
+    n = 2 ** z
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y + 1), x / n * 360 - 180, lat(y), (x + 1) / n * 360 - 180
+
+
+def _boxes(south: float, west: float, north: float, east: float) -> List[Tuple[float, float, float, float]]:
+    """Split a box crossing the antimeridian (west > east) in two."""
+    if west <= east:
+        return [(south, west, north, east)]
+    return [(south, west, north, 180.0), (south, -180.0, north, east)]
+
+
+def _box_filter(db: Session, south: float, west: float, north: float, east: float, precision: int = geohash.MAX_PRECISION):
+    """
+    Index-backed condition for points inside the box: the PostGIS GiST index
+    when available, otherwise a cover of geohash prefixes on the geohash
+    index. Both are refined with the exact coordinate ranges.
+    """
+    postgis = postgis_available(db)
+    conditions = []
+    for s, w, n, e in _boxes(south, west, north, east):
+        if postgis:
+            candidates = POINT.op("&&")(func.geography(func.ST_MakeEnvelope(w, s, e, n, 4326)))
+        else:
+            candidates = or_(*[
+                Upload.geohash.like(f"{prefix}%")
+                for prefix in geohash.cover(s, w, n, e, max_precision=precision, max_cells=GEO_COVER_CELLS)
+            ])
+        conditions.append(and_(
+            candidates,
+            Upload.gps_lat.between(s, n),
+            Upload.gps_lon.between(w, e),
+        ))
+    return and_(Upload.privacy == "public", or_(*conditions))
+
+
+def in_bbox(db: Session, south: float, west: float, north: float, east: float, skip: int = 0, limit: int = 100) -> List[Upload]:
+    """Public uploads taken inside the box, most recently taken first."""
+    return (
+        db.query(Upload)
+        .filter(_box_filter(db, south, west, north, east))
+        .order_by(Upload.taken_at.desc().nullslast(), Upload.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+
+def near(db: Session, lat: float, lon: float, radius_m: float, limit: int = 100) -> List[Tuple[Upload, float]]:
+    """Public uploads within radius_m meters of a point, nearest first, with their distance."""
+    if postgis_available(db):
+        center = func.geography(func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326))
+        distance = func.ST_Distance(POINT, center).label("distance")
+        rows = (
+            db.query(Upload, distance)
+            .filter(Upload.privacy == "public", func.ST_DWithin(POINT, center, radius_m))
+            .order_by(distance)
+            .limit(limit)
+            .all()
+        )
+        return [(upload, float(d)) for upload, d in rows]
+
+    # Bounding box of the circle on the geohash index, then exact distances here
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    south, north = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    coslat = math.cos(math.radians(max(abs(south), abs(north))))
+    if coslat < 1e-6 or dlat / coslat >= 180:
+        west, east = -180.0, 180.0
+    else:
+        dlon = dlat / coslat
+        west, east = (lon - dlon + 540) % 360 - 180, (lon + dlon + 540) % 360 - 180
+    candidates = db.query(Upload).filter(_box_filter(db, south, west, north, east)).limit(GEO_MAX_CANDIDATES).all()
+    found = [(upload, haversine(lat, lon, upload.gps_lat, upload.gps_lon)) for upload in candidates]
+    return sorted((item for item in found if item[1] <= radius_m), key=lambda item: item[1])[:limit]
+
+
+def clusters(db: Session, z: int, x: int, y: int) -> List[Dict[str, Any]]:
+    """
+    Aggregated markers for one map tile: public uploads grouped by geohash
+    cell, sized to roughly an eighth of the tile at this zoom, with their
+    count, mean position and one sample upload id.
+    """
+    south, west, north, east = tile_bbox(z, x, y)
+    precision = geohash.precision_for_zoom(z)
+    cell = func.substr(Upload.geohash, 1, precision).label("cell")
+    rows = (
+        db.query(
+            cell,
+            func.count().label("count"),
+            func.avg(Upload.gps_lat),
+            func.avg(Upload.gps_lon),
+            func.min(Upload.id),
+        )
+        .filter(_box_filter(db, south, west, north, east, precision=precision))
+        .group_by(cell)
+        .all()
+    )
+    return [
+        {"geohash": c, "count": n, "lat": float(lat), "lon": float(lon), "upload_id": sample}
+        for c, n, lat, lon, sample in rows
+    ]
@@ -6,6 +6,7 @@ from postgrest.exceptions import APIError
 
 from app.db.supabase_client import supabase
 from app.modules.images import schemas as image_schemas
+from app.modules.image_stats import service as stats_service
 
 
 class LikesService:
@@ -30,7 +31,8 @@ class LikesService:
             )
             if not insert_res.data:
                 raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to add like")
-            
+
+            stats_service.bump(image_id, likes=1)
             return {"message": "Image liked", "like": insert_res.data[0]}
 
         except APIError as e:
@@ -47,7 +49,10 @@ class LikesService:
                 .eq("user_id", str(user_id))
                 .execute()
             )
-            return bool(res.data and len(res.data) > 0)
+            deleted = bool(res.data and len(res.data) > 0)
+            if deleted:
+                stats_service.bump(image_id, likes=-len(res.data))
+            return deleted
         except APIError as e:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"API Error: {e.message}")
         except Exception as e:
@@ -55,14 +60,20 @@ class LikesService:
 
     def get_likes_count(self, image_id: UUID) -> int:
         try:
+            # O(1) lookup in the image_stats counter table
+            count = stats_service.read_stat(image_id, "likes")
+            if count is not None:
+                return count
+
+            # No counter row yet: let Postgres count instead of shipping every id
             res = (
                 supabase.table("likes")
-                .select("id")
+                .select("id", count="exact")
                 .eq("image_id", str(image_id))
+                .limit(1)
                 .execute()
             )
-            count = len(res.data) if res.data else 0
-            return count
+            return res.count or 0
         except APIError as e:
             print(f"Error getting likes count from Supabase: {e}")
             return 0
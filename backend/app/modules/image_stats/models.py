@@ -0,0 +1,22 @@
+# app/modules/image_stats/models.py
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+
+from app.db.database import Base
+
+
+class ImageStats(Base):
+    """
+    Denormalized per-image counters, maintained incrementally by the like, view
+    and comment write paths and rebuilt by reconcile_image_stats().
+    """
+    __tablename__ = "image_stats"
+
+    image_id = Column(UUID(as_uuid=True), ForeignKey("images.id", ondelete="CASCADE"), primary_key=True)
+    likes_count = Column(Integer, nullable=False, default=0, server_default="0")
+    views_count = Column(Integer, nullable=False, default=0, server_default="0")
+    comments_count = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    image = relationship("Image", back_populates="stats")
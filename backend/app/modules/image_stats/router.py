@@ -0,0 +1,29 @@
+# app/modules/image_stats/router.py
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from uuid import UUID
+
+from app.db.database import get_db
+from app.auth.dependencies import get_current_user
+from app.modules.image_stats import schemas, service
+from app.modules.users.schemas import User as UserSchema
+
+router = APIRouter(prefix="/image_stats", tags=["Image Stats"])
+
+
+@router.get("/{image_id}", response_model=schemas.ImageStatsOut)
+def get_image_stats(image_id: UUID, db: Session = Depends(get_db)):
+    """Get like, view and comment counts for an image"""
+    return schemas.ImageStatsOut(image_id=image_id, **service.get_stats(db, image_id))
+
+
+@router.post("/reconcile")
+def reconcile_image_stats(
+    user: UserSchema = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Rebuild all counters from the likes, views and comments tables (admin only)"""
+    if not user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    rows = service.reconcile_image_stats(db)
+    return {"detail": "Image stats reconciled", "rows": rows}
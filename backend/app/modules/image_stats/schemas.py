@@ -0,0 +1,10 @@
+# app/modules/image_stats/schemas.py
+from pydantic import BaseModel
+from uuid import UUID
+
+
+class ImageStatsOut(BaseModel):
+    image_id: UUID
+    likes: int = 0
+    views: int = 0
+    comments: int = 0
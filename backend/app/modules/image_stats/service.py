@@ -0,0 +1,195 @@
+# app/modules/image_stats/service.py
+import logging
+from typing import Dict, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db import changes
+from app.db.database import SessionLocal
+from app.modules.image_stats.models import ImageStats
+from app.modules.images import models as image_models
+from app.modules.image_likes import models as likes_models
+from app.modules.image_views import models as views_models
+from app.modules.comments import models as comment_models
+
+log = logging.getLogger("image_stats")
+
+_COLUMNS = {
+    "likes": "likes_count",
+    "views": "views_count",
+    "comments": "comments_count",
+}
+
+
+def _uuid(value) -> UUID:
+    return value if isinstance(value, UUID) else UUID(str(value))
+
+
+def _as_dict(stats: ImageStats) -> Dict[str, int]:
+    return {
+        "likes": stats.likes_count,
+        "views": stats.views_count,
+        "comments": stats.comments_count,
+    }
+
+
+def count_from_sources(db: Session, image_id: UUID) -> Dict[str, int]:
+    """
+    Count likes, views and comments for one image straight from the source tables.
+    """
+    return {
+        "likes": db.query(func.count(likes_models.ImageLike.id)).filter(likes_models.ImageLike.image_id == image_id).scalar() or 0,
+        "views": db.query(func.count(views_models.ImageView.id)).filter(views_models.ImageView.image_id == image_id).scalar() or 0,
+        "comments": db.query(func.count(comment_models.Comment.id)).filter(comment_models.Comment.image_id == image_id).scalar() or 0,
+    }
+
+
+def apply_delta(db: Session, image_id: UUID, likes: int = 0, views: int = 0, comments: int = 0) -> None:
+    """
+    Increment (or decrement) the counters of one image inside the caller's transaction.
+
+    Call this after the source row has been added/deleted in the same session.
+    If the image has no counter row yet, one is seeded from the source tables,
+    which already include the pending change, so the delta is not applied twice.
+    The counter UPDATE bypasses the unit of work, so it is reported to change
+    capture, which invalidates the cached responses showing the counts on commit.
+    """
+    deltas = {"likes": likes, "views": views, "comments": comments}
+    values = {
+        _COLUMNS[name]: getattr(ImageStats, _COLUMNS[name]) + delta
+        for name, delta in deltas.items()
+        if delta
+    }
+    if not values:
+        return
+
+    image_id = _uuid(image_id)
+    db.flush()
+    changes.publish(db, [changes.Change(
+        table=ImageStats.__tablename__, op=changes.UPDATE, key=str(image_id), data={"image_id": image_id},
+    )])
+    result = db.execute(
+        update(ImageStats)
+        .where(ImageStats.image_id == image_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        return
+
+    counts = count_from_sources(db, image_id)
+    try:
+        with db.begin_nested():
+            db.add(ImageStats(
+                image_id=image_id,
+                likes_count=counts["likes"],
+                views_count=counts["views"],
+                comments_count=counts["comments"],
+            ))
+    except IntegrityError:
+        # A concurrent writer seeded the row first (or the image is gone); its
+        # seed cannot see our uncommitted change, so apply the delta on top.
+        db.execute(
+            update(ImageStats)
+            .where(ImageStats.image_id == image_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def bump(image_id: UUID, likes: int = 0, views: int = 0, comments: int = 0) -> None:
+    """
+    apply_delta() in its own session, for write paths that do not go through
+    SQLAlchemy (e.g. the Supabase-backed likes). Failures are logged, not raised:
+    the source write has already happened and reconcile_image_stats() repairs drift.
+    """
+    db = SessionLocal()
+    try:
+        apply_delta(db, image_id, likes=likes, views=views, comments=comments)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        log.exception("Failed to update image_stats for %s: %s", image_id, e)
+    finally:
+        db.close()
+
+
+def get_stats(db: Session, image_id: UUID) -> Dict[str, int]:
+    """
+    Return the counters for one image. Falls back to counting the source tables
+    for images that have no counter row yet.
+    """
+    stats = db.get(ImageStats, image_id)
+    if stats is not None:
+        return _as_dict(stats)
+    return count_from_sources(db, image_id)
+
+
+def get_stats_map(db: Session, image_ids: Iterable[UUID]) -> Dict[UUID, Dict[str, int]]:
+    """
+    Return counters for many images in one primary-key lookup.
+    Images without a counter row are missing from the result.
+    """
+    image_ids = list(image_ids)
+    if not image_ids:
+        return {}
+    rows = db.query(ImageStats).filter(ImageStats.image_id.in_(image_ids)).all()
+    return {row.image_id: _as_dict(row) for row in rows}
+
+
+def read_stat(image_id: UUID, name: str) -> Optional[int]:
+    """
+    Read a single counter in its own session. Returns None if the image has no
+    counter row yet.
+    """
+    db = SessionLocal()
+    try:
+        stats = db.get(ImageStats, _uuid(image_id))
+        return getattr(stats, _COLUMNS[name]) if stats is not None else None
+    finally:
+        db.close()
+
+
+def reconcile_image_stats(db: Session) -> int:
+    """
+    Rebuild image_stats from the likes, image_views and comments tables.
+    Every image gets a row, so read paths never need to fall back to counting.
+    Returns the number of rows written.
+    """
+    Image = image_models.Image
+
+    def grouped(column):
+        return select(column.label("image_id"), func.count().label("n")).group_by(column).subquery()
+
+    likes = grouped(likes_models.ImageLike.image_id)
+    views = grouped(views_models.ImageView.image_id)
+    comments = grouped(comment_models.Comment.image_id)
+
+    source = (
+        select(
+            Image.id,
+            func.coalesce(likes.c.n, 0),
+            func.coalesce(views.c.n, 0),
+            func.coalesce(comments.c.n, 0),
+        )
+        .outerjoin(likes, likes.c.image_id == Image.id)
+        .outerjoin(views, views.c.image_id == Image.id)
+        .outerjoin(comments, comments.c.image_id == Image.id)
+    )
+
+    try:
+        db.execute(delete(ImageStats))
+        result = db.execute(
+            insert(ImageStats).from_select(
+                ["image_id", "likes_count", "views_count", "comments_count"], source
+            )
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    log.info("Reconciled image_stats: %s rows", result.rowcount)
+    return result.rowcount
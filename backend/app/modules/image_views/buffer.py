@@ -0,0 +1,223 @@
+# app/modules/image_views/buffer.py
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+from uuid import UUID
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.modules.image_views import models
+from app.modules.images import models as image_models
+from app.modules.image_stats import service as stats_service
+
+log = logging.getLogger("image_views")
+
+# Configuration via environment variables (fallbacks)
+VIEW_BUFFER_MAX_PENDING = int(os.getenv("VIEW_BUFFER_MAX_PENDING", "20000"))
+VIEW_BUFFER_BATCH_SIZE = int(os.getenv("VIEW_BUFFER_BATCH_SIZE", "500"))
+VIEW_BUFFER_FLUSH_INTERVAL = float(os.getenv("VIEW_BUFFER_FLUSH_INTERVAL", "2.0"))  # seconds
+VIEW_DEDUPE_WINDOW = float(os.getenv("VIEW_DEDUPE_WINDOW", "30"))  # seconds
+VIEW_DEDUPE_MAX_KEYS = int(os.getenv("VIEW_DEDUPE_MAX_KEYS", "100000"))
+
+
+class ViewIngestBuffer:
+    """
+    In-process buffer for image view events.
+
+    Requests only append to memory; a background thread writes the events in
+    bulk INSERT batches when `batch_size` events are pending or every
+    `flush_interval` seconds, and updates image_stats in the same transaction.
+    Repeated views of the same image by the same viewer within `dedupe_window`
+    seconds are coalesced into the first event. Memory is bounded by
+    `max_pending` events and `max_dedupe_keys` dedupe entries; when the buffer
+    is full, submit() returns None so callers can push back on the client.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_pending: int = VIEW_BUFFER_MAX_PENDING,
+        batch_size: int = VIEW_BUFFER_BATCH_SIZE,
+        flush_interval: float = VIEW_BUFFER_FLUSH_INTERVAL,
+        dedupe_window: float = VIEW_DEDUPE_WINDOW,
+        max_dedupe_keys: int = VIEW_DEDUPE_MAX_KEYS,
+    ):
+        self.session_factory = session_factory
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dedupe_window = dedupe_window
+        self.max_dedupe_keys = max_dedupe_keys
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pending: deque = deque()
+        self._recent: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (expires_at, event)
+
+        self.accepted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+
+    # ------------------ lifecycle ------------------
+    def start(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="view-ingest", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the flusher thread and write everything still pending."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                log.exception("View buffer flush failed: %s", e)
+
+    # ------------------ ingestion ------------------
+    def _prune_recent(self, now: float) -> None:
+        while self._recent:
+            key, (expires_at, _) = next(iter(self._recent.items()))
+            if expires_at > now and len(self._recent) <= self.max_dedupe_keys:
+                break
+            self._recent.popitem(last=False)
+
+    def submit(self, image_id: UUID, user_id: Optional[UUID] = None, viewer_key: Optional[str] = None) -> Optional[dict]:
+        """
+        Queue a view without touching the database.
+
+        Returns the event (or the earlier event it was coalesced into), or None
+        if the buffer is full. Once stop() has begun there is no flusher thread
+        left, so events are written synchronously instead.
+        """
+        stopping = self._stopping.is_set()
+        if not self._thread and not stopping:
+            self.start()
+
+        image_id = image_id if isinstance(image_id, UUID) else UUID(str(image_id))
+        if user_id is not None and not isinstance(user_id, UUID):
+            user_id = UUID(str(user_id))
+
+        now = time.monotonic()
+        viewer = user_id or viewer_key
+        key = (str(viewer), str(image_id)) if viewer else None
+
+        with self._lock:
+            self._prune_recent(now)
+            if key and key in self._recent:
+                self.deduplicated += 1
+                return self._recent[key][1]
+
+            if len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                self._wakeup.set()
+                return None
+
+            event = {
+                "id": uuid.uuid4(),
+                "image_id": image_id,
+                "user_id": user_id,
+                "viewed_at": datetime.now(timezone.utc),
+            }
+            self._pending.append(event)
+            if key:
+                self._recent[key] = (now + self.dedupe_window, event)
+            self.accepted += 1
+            pending = len(self._pending)
+
+        if stopping:
+            self.flush()
+        elif pending >= self.batch_size:
+            self._wakeup.set()
+        return event
+
+    # ------------------ flushing ------------------
+    def _drain(self) -> List[dict]:
+        with self._lock:
+            batch = list(self._pending)
+            self._pending.clear()
+        return batch
+
+    def _write_batch(self, db: Session, rows: List[dict]) -> None:
+        db.execute(insert(models.ImageView), rows)
+        for image_id, count in Counter(row["image_id"] for row in rows).items():
+            stats_service.apply_delta(db, image_id, views=count)
+        db.commit()
+
+    def flush(self) -> int:
+        """Write all pending events. Returns the number of rows inserted."""
+        with self._flush_lock:
+            events = self._drain()
+            if not events:
+                return 0
+
+            written = 0
+            db = self.session_factory()
+            try:
+                for start in range(0, len(events), self.batch_size):
+                    rows = events[start:start + self.batch_size]
+                    try:
+                        self._write_batch(db, rows)
+                    except IntegrityError:
+                        # Most likely a view of an image deleted in the meantime:
+                        # keep the rows whose image still exists and retry once.
+                        db.rollback()
+                        image_ids = {row["image_id"] for row in rows}
+                        existing = set(db.execute(
+                            select(image_models.Image.id).where(image_models.Image.id.in_(image_ids))
+                        ).scalars())
+                        valid = [row for row in rows if row["image_id"] in existing]
+                        self.failed += len(rows) - len(valid)
+                        if valid:
+                            self._write_batch(db, valid)
+                        rows = valid
+                    written += len(rows)
+            except Exception as e:
+                db.rollback()
+                self.failed += len(events) - written
+                log.exception("Dropped %s view events: %s", len(events) - written, e)
+            finally:
+                db.close()
+
+            self.written += written
+            return written
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "accepted": self.accepted,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "written": self.written,
+            "failed": self.failed,
+        }
+
+
+# A single buffer per process, started on first use and flushed on app shutdown
+view_buffer = ViewIngestBuffer()
@@ -7,27 +7,29 @@ import uuid
 
 from app.db.database import get_db
 from app.modules.image_views import schemas, service
-from app.modules.images import models as image_models # Import the Image model
 from app.auth.dependencies import get_current_user
 from app.modules.users.schemas import User as UserSchema
 
 router = APIRouter(prefix="/image_views", tags=["Image Views"])
 
-@router.post("/", response_model=schemas.ImageView)
+@router.post("/", response_model=schemas.ImageView, status_code=status.HTTP_202_ACCEPTED)
 def create_view(
     view: schemas.ImageViewCreate, 
     user: UserSchema = Depends(get_current_user), # Get the current user
-    db: Session = Depends(get_db)
 ):
-    # Check if the image exists before creating a view
-    image = db.query(image_models.Image).filter(image_models.Image.id == view.image_id).first()
-    if not image:
+    # Views are buffered and written in batches; unknown images are dropped at flush time
+    event = service.create_image_view(image_id=view.image_id, user_id=user.id)
+    if event is None:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Image not found"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="View tracking is busy, retry later",
+            headers={"Retry-After": "1"},
         )
-    # Pass image_id and user_id to the service
-    return service.create_image_view(db=db, image_id=view.image_id, user_id=user.id)
+    return event
+
+@router.get("/buffer/stats")
+def view_buffer_stats():
+    return service.view_buffer.stats()
 
 @router.get("/", response_model=List[schemas.ImageView])
 def read_views(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
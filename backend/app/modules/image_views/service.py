@@ -1,18 +1,18 @@
 # app/modules/image_views/service.py
 from sqlalchemy.orm import Session
 from app.modules.image_views import models, schemas
+from app.modules.image_stats import service as stats_service
+from app.modules.image_views.buffer import view_buffer
 from uuid import UUID
 from typing import Optional, List
 
-def create_image_view(db: Session, image_id: UUID, user_id: UUID) -> models.ImageView:
+def create_image_view(image_id: UUID, user_id: Optional[UUID] = None, viewer_key: Optional[str] = None) -> Optional[dict]:
     """
-    Creates a new image view record for the current user.
+    Queues an image view for the current user in the view ingestion buffer.
+    No database round-trip happens here; the view is written in the next batch.
+    Returns None if the buffer is full.
     """
-    db_view = models.ImageView(image_id=image_id, user_id=user_id)
-    db.add(db_view)
-    db.commit()
-    db.refresh(db_view)
-    return db_view
+    return view_buffer.submit(image_id, user_id=user_id, viewer_key=viewer_key)
 
 def get_image_views(db: Session, skip: int = 0, limit: int = 100) -> list[models.ImageView]:
     """
@@ -33,6 +33,7 @@ def delete_image_view(db: Session, view_id: UUID) -> bool:
     view = db.query(models.ImageView).filter(models.ImageView.id == view_id).first()
     if view:
         db.delete(view)
+        stats_service.apply_delta(db, view.image_id, views=-1)
         db.commit()
         return True
     return False
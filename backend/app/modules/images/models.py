@@ -6,6 +6,7 @@ from app.db.database import Base
 from sqlalchemy.sql import func
 from app.modules.rights.models import Rights
 from app.modules.comments.models import Comment
+from app.modules.image_stats.models import ImageStats
 import enum
 from sqlalchemy.dialects.postgresql import UUID
 
@@ -24,6 +25,7 @@ class Image(Base):
     privacy = Column(Enum(PrivacyLevel), default=PrivacyLevel.PUBLIC)
     license = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     author_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     description = Column(Text, nullable=True)
     filename = Column(String, nullable=False)
@@ -41,3 +43,9 @@ class Image(Base):
     likes = relationship("ImageLike", back_populates="image", cascade="all, delete-orphan")
     rights = relationship("Rights", back_populates="image")
     views = relationship("ImageView", back_populates="image")
+    stats = relationship("ImageStats", back_populates="image", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+
+    @property
+    def srcset(self) -> dict:
+        """Responsive renditions of the underlying upload, per format."""
+        return self.upload.srcset if self.upload else {}
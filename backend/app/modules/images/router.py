@@ -7,7 +7,7 @@ from uuid import UUID
 from app.db.database import get_db
 from app.modules.images import schemas, service
 from app.modules.users import schemas as user_schemas
-from app.auth.dependencies import get_current_user
+from app.auth.dependencies import get_current_user, get_optional_user_id
 from app.modules.images.service import ImageService
 from app.modules.users.schemas import User as UserSchema
 
@@ -74,9 +74,11 @@ def like_image(image_id: UUID, user: user_schemas.User = Depends(get_current_use
     return {"message": "Image liked"}
 
 # ------------------ Record a view ------------------
-@router.post("/{image_id}/view")
-def view_image(image_id: UUID, db: Session = Depends(get_db)):
-    image_service.record_view(db, image_id)
+@router.post("/{image_id}/view", status_code=status.HTTP_202_ACCEPTED)
+def view_image(image_id: UUID, user_id: Optional[str] = Depends(get_optional_user_id)):
+    # Only signed-in viewers are deduplicated: client addresses are shared behind proxies and NAT
+    viewer_key = f"user:{user_id}" if user_id else None
+    image_service.record_view(image_id, viewer_key=viewer_key)
     return {"message": f"View recorded for image '{image_id}'"}
 
 @router.delete("/admin/{image_id}", status_code=status.HTTP_204_NO_CONTENT)
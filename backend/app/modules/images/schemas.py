@@ -2,7 +2,7 @@
 from pydantic import BaseModel
 from uuid import UUID
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 
 class ImageBase(BaseModel):
     title: str
@@ -23,6 +23,7 @@ class ImageResponse(BaseModel):
     album_id: Optional[UUID] = None
     filename: str
     mime_type: str
+    srcset: Optional[Dict[str, str]] = None  # per format, e.g. {"webp": "url 160w, url 320w"}
 
     class Config:
         orm_mode = True
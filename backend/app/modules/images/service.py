@@ -5,8 +5,9 @@ from typing import Optional, List
 
 from app.modules.images import models, schemas
 from app.modules.image_likes import models as likes_models
-from app.modules.image_views import models as image_views_models
 from app.modules.uploads import models as uploads_models
+from app.modules.image_stats import service as stats_service
+from app.modules.image_views.buffer import view_buffer
 
 
 class ImageService:
@@ -61,7 +62,14 @@ class ImageService:
     def list_images(
         self, db: Session, skip: int = 0, limit: int = 100
     ) -> List[models.Image]:
-        return db.query(models.Image).filter(models.Image.id != None).offset(skip).limit(limit).all()
+        return (
+            db.query(models.Image)
+            .options(joinedload(models.Image.upload))  # srcset comes from the upload
+            .filter(models.Image.id != None)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
 
     def delete_image(self, db: Session, image_id: UUID, user):
         image = self.get_image(db, image_id)
@@ -90,14 +98,17 @@ class ImageService:
             )
         like = likes_models.ImageLike(image_id=image_id, user_id=user_id)
         db.add(like)
+        stats_service.apply_delta(db, image_id, likes=1)
         db.commit()
         db.refresh(like)
 
-    def record_view(self, db: Session, image_id: UUID):
-        image = self.get_image(db, image_id)
-        if not image:
-            raise HTTPException(status_code=404, detail="Image not found")
-        view = image_views_models.ImageView(image_id=image_id, user_id=None)
-        db.add(view)
-        db.commit()
-        db.refresh(view)
+    def record_view(self, image_id: UUID, viewer_key: Optional[str] = None):
+        # Buffered: no DB round-trip in the request, see image_views.buffer
+        event = view_buffer.submit(image_id, user_id=None, viewer_key=viewer_key)
+        if event is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="View tracking is busy, retry later",
+                headers={"Retry-After": "1"},
+            )
+        return event
@@ -1,3 +1,4 @@
+import os
 import time
 import hashlib
 import random
@@ -5,9 +6,14 @@ from sqlalchemy.orm import Session
 from app.modules.users import schemas
 from app.modules.users.models import User as UserModel
 import bcrypt
+from app.modules.cacher.backends import cache_backend
 
+# Challenges live in the shared cache backend so any worker can verify them
+MAPTCHA_TTL = int(os.getenv("MAPTCHA_TTL", "600"))  # seconds
 
-MAPTCHA_STORE = {}
+
+def _store_key(challenge: str) -> str:
+    return f"maptcha:{challenge}"
 
 def generate_challenge():
     """Generate a simple math captcha."""
@@ -16,7 +22,7 @@ def generate_challenge():
     requested = int(time.time())
     challenge = hashlib.sha256(f"{a}{b}{requested}".encode()).hexdigest()
 
-    MAPTCHA_STORE[challenge] = {"answer": answer, "requested": requested}
+    cache_backend.set(_store_key(challenge), {"answer": answer, "requested": requested}, MAPTCHA_TTL)
 
     return {
         "label": f"How much is {a} + {b}?",
@@ -26,7 +32,7 @@ def generate_challenge():
 
 def verify_maptcha(maptcha_response: int, maptcha_requested: int, maptcha_challenge: str) -> bool:
     """Verify captcha input."""
-    data = MAPTCHA_STORE.get(maptcha_challenge)
+    data = cache_backend.get(_store_key(maptcha_challenge))
     if not data:
         return False
     if data["requested"] != maptcha_requested:
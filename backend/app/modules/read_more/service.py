@@ -1,12 +1,37 @@
+import os
 import re
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from typing import Optional
+from typing import List, Optional
+from app.db import changes
+from app.modules.cacher.backends import cache_backend, cached, shared_backend
 from app.modules.read_more import models, schemas
 
+SETTINGS_CACHE_KEY = "settings:read_more"
+SETTINGS_CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", "300"))
 
-def get_settings(db: Session) -> Optional[models.ReadMoreSettings]:
-    return db.query(models.ReadMoreSettings).first()
+
+def get_settings(db: Session) -> Optional[schemas.ReadMoreSettings]:
+    """
+    The settings row. With a shared cache it is loaded once across workers
+    when cold; without one it is read every time, since a per-worker copy
+    would not see writes made in other workers.
+    """
+    def load():
+        row = db.query(models.ReadMoreSettings).first()
+        return {"settings": schemas.ReadMoreSettings.model_validate(row).model_dump() if row else None}
+
+    if shared_backend is None:
+        data = load()["settings"]
+    else:
+        data = cached(SETTINGS_CACHE_KEY, load, SETTINGS_CACHE_TTL)["settings"]
+    return schemas.ReadMoreSettings(**data) if data else None
+
+
+@changes.on_commit
+def invalidate_settings(captured: List[changes.Change]) -> None:
+    if any(change.table == models.ReadMoreSettings.__tablename__ for change in captured):
+        cache_backend.delete(SETTINGS_CACHE_KEY)
 
 
 def create_settings(db: Session, settings: schemas.ReadMoreSettingsCreate) -> models.ReadMoreSettings:
@@ -0,0 +1,212 @@
+# app/modules/search/cache.py
+"""
+Search result cache and query popularity tracking.
+
+Result pages are cached in a thread-safe LRU bounded by entry count, an
+estimate of their memory use and a TTL. Invalidation is by generation: every
+content type has a counter that is bumped when a commit touches one of its
+tables (via change capture), and a cached page remembers the counters it was
+computed under, so a page is stale as soon as any content type it covers has
+been written to.
+
+Query frequencies are kept in a Space-Saving sketch: a fixed number of
+counters that tracks the heavy hitters of an unbounded stream of queries
+with bounded overestimation. It feeds /search/popular and decides which
+queries are re-run to warm the cache after an invalidation.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from app.db import changes
+from app.modules.search import documents
+
+log = logging.getLogger("search")
+
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "60"))  # seconds
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2000"))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+SEARCH_POPULAR_CAPACITY = int(os.getenv("SEARCH_POPULAR_CAPACITY", "500"))  # counters in the sketch
+SEARCH_POPULAR_FILE = os.getenv("SEARCH_POPULAR_FILE", os.path.join(os.getcwd(), "search_popular.json"))
+
+CONTENT_TYPES = tuple(content_type for content_type, _, _ in documents.SOURCES.values())
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used for cache keys and popularity."""
+    return " ".join(query.lower().split())
+
+
+def _estimate_size(results: List[Any]) -> int:
+    """Rough memory footprint of a result page: string payload plus per-object overhead."""
+    size = 256
+    for result in results:
+        size += 512
+        for value in vars(result).values():
+            if isinstance(value, str):
+                size += len(value)
+    return size
+
+
+class SearchResultCache:
+    """LRU + TTL cache of search pages, invalidated by per-content-type generations."""
+
+    def __init__(self, max_entries: int = SEARCH_CACHE_MAX_ENTRIES, max_bytes: int = SEARCH_CACHE_MAX_BYTES, ttl: float = SEARCH_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Tuple[int, ...], float, int]]" = OrderedDict()
+        self._generations: Dict[str, int] = {content_type: 0 for content_type in CONTENT_TYPES}
+        self._total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _covered(content_type: Optional[str]) -> Tuple[str, ...]:
+        return (content_type,) if content_type else CONTENT_TYPES
+
+    def generation(self, content_type: Optional[str]) -> Tuple[int, ...]:
+        """
+        Current generations of the content types a search covers. Take this
+        before running the search and pass it to put(), so a write that lands
+        while the search runs still invalidates its result.
+        """
+        with self._lock:
+            return tuple(self._generations.get(t, 0) for t in self._covered(content_type))
+
+    def get(self, key: Hashable, content_type: Optional[str]) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, generation, expires_at, size = entry
+                current = tuple(self._generations.get(t, 0) for t in self._covered(content_type))
+                if generation == current and expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self._total_bytes -= size
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any, generation: Tuple[int, ...], results: List[Any]) -> None:
+        size = _estimate_size(results)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[3]
+            self._entries[key] = (value, generation, time.monotonic() + self.ttl, size)
+            self._total_bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= evicted[3]
+                self.evictions += 1
+
+    def invalidate(self, content_types: List[str]) -> None:
+        """Bump the generation of each content type; stale pages are dropped lazily."""
+        with self._lock:
+            for content_type in content_types:
+                self._generations[content_type] = self._generations.get(content_type, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class QuerySketch:
+    """
+    Space-Saving top-k counter (Metwally et al.). At most `capacity` queries
+    are tracked; an unseen query replaces the least frequent one and inherits
+    its count, which is remembered as the error bound. Any query seen more
+    than N / capacity times is guaranteed to be tracked.
+    """
+
+    def __init__(self, capacity: int = SEARCH_POPULAR_CAPACITY):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._counts: Dict[Tuple[str, str], List[int]] = {}  # (content type or "", query) -> [count, error]
+        self.observed = 0
+
+    def record(self, query: str, content_type: Optional[str] = None) -> None:
+        key = (content_type or "", query)
+        with self._lock:
+            self.observed += 1
+            counter = self._counts.get(key)
+            if counter is not None:
+                counter[0] += 1
+                return
+            if len(self._counts) < self.capacity:
+                self._counts[key] = [1, 0]
+                return
+            victim = min(self._counts, key=lambda k: self._counts[k][0])
+            floor = self._counts.pop(victim)[0]
+            self._counts[key] = [floor + 1, floor]
+
+    def top(self, limit: int = 10, content_type: Optional[str] = None) -> List[Tuple[str, int]]:
+        """Most frequent queries as (query, estimated count), for one content type or overall."""
+        with self._lock:
+            totals: Dict[str, int] = {}
+            for (searched_type, query), (count, _) in self._counts.items():
+                if content_type is None or searched_type == content_type:
+                    totals[query] = totals.get(query, 0) + count
+        return sorted(totals.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def save(self, path: str = SEARCH_POPULAR_FILE) -> None:
+        with self._lock:
+            items = [[content_type, query, count, error] for (content_type, query), (count, error) in self._counts.items()]
+            observed = self.observed
+        tmp = path + ".temp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"observed": observed, "counters": items}, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            log.warning("Failed to save popular searches: %s", e)
+
+    def load(self, path: str = SEARCH_POPULAR_FILE) -> None:
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self.observed = data.get("observed", 0)
+            counters = sorted(data.get("counters", []), key=lambda c: -c[2])[: self.capacity]
+            self._counts = {(c[0], c[1]): [c[2], c[3]] for c in counters}
+
+
+result_cache = SearchResultCache()
+popular_queries = QuerySketch()
+
+
+@changes.on_commit
+def invalidate_search_cache(captured: List[changes.Change]) -> None:
+    """Bump the generation of every content type a committed transaction wrote to."""
+    touched = {
+        documents.SOURCES[change.table][0]
+        for change in captured
+        if change.table in documents.SOURCES
+    }
+    if touched:
+        result_cache.invalidate(sorted(touched))
@@ -0,0 +1,195 @@
+# app/modules/search/documents.py
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, inspect, insert, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.db import changes
+from app.modules.search import models
+
+log = logging.getLogger("search")
+
+REINDEX_BATCH_SIZE = 1000
+
+
+def _loaded(obj: Any, name: str) -> Any:
+    """Attribute value if already loaded, without triggering a lazy load/refresh."""
+    return inspect(obj).dict.get(name)
+
+
+def _join(*parts: Optional[str]) -> str:
+    return " ".join(str(p) for p in parts if p)
+
+
+def _tags_text(tags_field: Any) -> str:
+    from app.modules.search.service import _parse_tags_field  # avoid import cycle
+    return " ".join(_parse_tags_field(tags_field))
+
+
+def _album(obj) -> Dict[str, Any]:
+    return {
+        "title": obj.title,
+        "body": obj.description,
+        "tags": "",
+        "url": f"/albums/{obj.id}",
+        "thumbnail_url": None,
+        "created_at": _loaded(obj, "created_at"),
+    }
+
+
+def _image(obj) -> Dict[str, Any]:
+    return {
+        "title": obj.title or obj.filename,
+        "body": _join(obj.description, obj.caption),
+        "tags": "",
+        "url": f"/images/{obj.id}",
+        "thumbnail_url": None,
+        "created_at": _loaded(obj, "created_at"),
+    }
+
+
+def _upload(obj) -> Dict[str, Any]:
+    return {
+        "title": obj.filename,
+        "body": obj.description,
+        "tags": _tags_text(obj.tags),
+        "url": obj.url,
+        "thumbnail_url": obj.thumbnail_url,
+        "created_at": _loaded(obj, "uploaded_at"),
+    }
+
+
+def _comment(obj) -> Dict[str, Any]:
+    return {
+        "title": "Comment",
+        "body": obj.content,
+        "tags": "",
+        "url": f"/comments/{obj.id}",
+        "thumbnail_url": None,
+        "created_at": _loaded(obj, "created_at"),
+    }
+
+
+def _user(obj) -> Dict[str, Any]:
+    # Email is deliberately not indexed
+    return {
+        "title": obj.username,
+        "body": "",
+        "tags": "",
+        "url": f"/users/{obj.id}",
+        "thumbnail_url": None,
+        "created_at": _loaded(obj, "created_at"),
+    }
+
+
+def _page(obj) -> Dict[str, Any]:
+    return {
+        "title": obj.title,
+        "body": obj.content,
+        "tags": "",
+        "url": f"/pages/{obj.id}",
+        "thumbnail_url": None,
+        "created_at": _loaded(obj, "created_at"),
+    }
+
+
+# table name -> (content type, model path, document builder)
+SOURCES: Dict[str, Tuple[str, str, Callable[[Any], Dict[str, Any]]]] = {
+    "albums": ("album", "app.modules.albums.models.Album", _album),
+    "images": ("image", "app.modules.images.models.Image", _image),
+    "uploads": ("upload", "app.modules.uploads.models.Upload", _upload),
+    "comments": ("comment", "app.modules.comments.models.Comment", _comment),
+    "users": ("user", "app.modules.users.models.User", _user),
+    "pages": ("page", "app.modules.pages.models.Page", _page),
+}
+
+
+def build_document(table: str, obj: Any) -> Optional[Dict[str, Any]]:
+    """Search document row for a source instance, or None if the table is not searchable."""
+    source = SOURCES.get(table)
+    if source is None:
+        return None
+    content_type, _, builder = source
+    doc = builder(obj)
+    doc["content_type"] = content_type
+    doc["content_id"] = str(obj.id)
+    return doc
+
+
+def _is_postgres(session: Session) -> bool:
+    return session.get_bind().dialect.name == "postgresql"
+
+
+def upsert_documents(session: Session, docs: List[Dict[str, Any]]) -> None:
+    table = models.SearchDocument.__table__
+    for doc in docs:
+        values = dict(doc)
+        if values.get("created_at") is None:
+            values.pop("created_at", None)  # not loaded yet: let the server default apply
+        stmt = pg_insert(table).values(**values)
+        update = {k: stmt.excluded[k] for k in ("title", "body", "tags", "url", "thumbnail_url")}
+        stmt = stmt.on_conflict_do_update(index_elements=["content_type", "content_id"], set_=update)
+        session.connection().execute(stmt)
+
+
+def delete_documents(session: Session, keys: List[Tuple[str, str]]) -> None:
+    table = models.SearchDocument.__table__
+    session.connection().execute(
+        delete(table).where(tuple_(table.c.content_type, table.c.content_id).in_(keys))
+    )
+
+
+@changes.on_flush
+def sync_search_documents(session: Session, captured: List[changes.Change]) -> None:
+    """
+    Mirror every ORM write to a searchable table into search_documents, inside
+    the same transaction, so the index never drifts from the source rows.
+    The built document is also left on change.extra["search_document"] for
+    commit listeners (the in-memory index).
+    """
+    captured = [c for c in captured if c.table in SOURCES]
+    upserts, deletes = [], []
+    for change in captured:
+        if change.op == changes.DELETE:
+            deletes.append((SOURCES[change.table][0], change.key))
+        else:
+            doc = build_document(change.table, change.obj)
+            change.extra["search_document"] = doc
+            upserts.append(doc)
+    if not captured or not _is_postgres(session):
+        return
+    if deletes:
+        delete_documents(session, deletes)
+    if upserts:
+        upsert_documents(session, upserts)
+
+
+def iter_all_documents(db: Session) -> Iterator[Dict[str, Any]]:
+    """Build the document for every row of every searchable table."""
+    from app.modules.search.service import try_import_model  # avoid import cycle
+    for table, (_, model_path, _) in SOURCES.items():
+        model = try_import_model([model_path])
+        if model is None:
+            continue
+        for obj in db.query(model).yield_per(REINDEX_BATCH_SIZE):
+            yield build_document(table, obj)
+
+
+def reindex_all(db: Session) -> int:
+    """Rebuild search_documents from scratch. Returns the number of documents."""
+    db.execute(delete(models.SearchDocument))
+    count = 0
+    batch: List[Dict[str, Any]] = []
+    for doc in iter_all_documents(db):
+        batch.append(doc)
+        if len(batch) >= REINDEX_BATCH_SIZE:
+            db.execute(insert(models.SearchDocument), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        db.execute(insert(models.SearchDocument), batch)
+        count += len(batch)
+    db.commit()
+    return count
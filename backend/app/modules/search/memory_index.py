@@ -0,0 +1,445 @@
+# app/modules/search/memory_index.py
+import heapq
+import logging
+import math
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.db import changes
+from app.db.database import SessionLocal, engine
+from app.modules.search import documents
+
+log = logging.getLogger("search")
+
+# Configuration via environment variables (fallbacks)
+# The index only sees writes committed by its own process until the next rebuild,
+# while Postgres search_documents are updated in each write's transaction. So
+# unless set to 1 (or 0), it is only used when the database is not Postgres.
+_MEMORY_INDEX = os.getenv("SEARCH_MEMORY_INDEX", "")
+SEARCH_MEMORY_INDEX = _MEMORY_INDEX == "1" or (_MEMORY_INDEX != "0" and engine.dialect.name != "postgresql")
+SEARCH_INDEX_SNAPSHOT = os.getenv("SEARCH_INDEX_SNAPSHOT", os.path.join(os.getcwd(), "search_index.pickle"))
+# Full rebuild period in seconds, to pick up writes made by other processes (0 = never)
+SEARCH_INDEX_REFRESH_INTERVAL = float(os.getenv("SEARCH_INDEX_REFRESH_INTERVAL", "300"))
+
+# Fuzzy matching: minimum trigram similarity (pg_trgm's default is 0.3)
+SEARCH_FUZZY_THRESHOLD = float(os.getenv("SEARCH_FUZZY_THRESHOLD", "0.3"))
+SEARCH_FUZZY_MAX_EXPANSIONS = 8  # vocabulary terms considered per query token
+
+SNAPSHOT_VERSION = 2
+BM25_K1 = 1.2
+BM25_B = 0.75
+FIELD_WEIGHTS = {"title": 3.0, "tags": 2.0, "body": 1.0}
+COMPACT_RATIO = 0.25  # compact postings once this share of docnos are tombstones
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def trigrams(term: str) -> Set[str]:
+    """Trigrams of a word padded like pg_trgm does ("  cat " -> "  c", " ca", "cat", "at ")."""
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Postings:
+    """
+    Posting list for one term: docnos delta-encoded in an unsigned int array
+    with the (field-weighted) term frequency in a parallel float array.
+    Docnos only ever grow, so appends keep the deltas positive.
+    """
+    __slots__ = ("deltas", "tfs", "last")
+
+    def __init__(self):
+        self.deltas = array("I")
+        self.tfs = array("f")
+        self.last = 0
+
+    def append(self, docno: int, tf: float) -> None:
+        self.deltas.append(docno - self.last)
+        self.tfs.append(tf)
+        self.last = docno
+
+    def __iter__(self):
+        docno = 0
+        for delta, tf in zip(self.deltas, self.tfs):
+            docno += delta
+            yield docno, tf
+
+    def __len__(self):
+        return len(self.deltas)
+
+
+class TrieNode:
+    __slots__ = ("children", "df")
+
+    def __init__(self):
+        self.children: Dict[str, "TrieNode"] = {}
+        self.df = 0  # live documents containing the term ending here
+
+
+class InvertedIndex:
+    """
+    In-memory BM25 index over search documents (see search/documents.py).
+
+    Documents get increasing internal docnos (1-based); an update tombstones the
+    old docno and appends the new version, and tombstones are compacted away
+    once they pass COMPACT_RATIO. A character trie over the vocabulary, with
+    live document frequencies, serves prefix completions, and a trigram map
+    over the same vocabulary serves typo-tolerant matching.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._replay: Optional[List[Tuple[List[dict], List[Tuple[str, str]]]]] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.postings: Dict[str, Postings] = {}
+        self.docs: List[Optional[dict]] = [None]        # docno -> stored fields (None = tombstone)
+        self.doc_terms: List[Optional[Dict[str, float]]] = [None]
+        self.doc_len = array("f", [0.0])
+        self.keys: Dict[Tuple[str, str], int] = {}      # (type, id) -> docno
+        self.trie = TrieNode()
+        self.trigrams: Dict[str, Set[str]] = {}         # trigram -> vocabulary terms containing it
+        self.total_len = 0.0
+        self.live = 0
+        self.ready = False
+        self.built_at: Optional[float] = None
+
+    # ------------------ trie ------------------
+    def _trie_add(self, term: str, delta: int) -> None:
+        node = self.trie
+        for ch in term:
+            node = node.children.setdefault(ch, TrieNode())
+        node.df += delta
+
+    def _trie_find(self, prefix: str) -> Optional[TrieNode]:
+        node = self.trie
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    # ------------------ writes ------------------
+    def _remove(self, key: Tuple[str, str]) -> None:
+        docno = self.keys.pop(key, None)
+        if docno is None:
+            return
+        for term in self.doc_terms[docno]:
+            self._trie_add(term, -1)
+        self.total_len -= self.doc_len[docno]
+        self.docs[docno] = None
+        self.doc_terms[docno] = None
+        self.live -= 1
+
+    def _add(self, doc: dict) -> None:
+        key = (doc["content_type"], str(doc["content_id"]))
+        self._remove(key)
+
+        terms: Dict[str, float] = {}
+        for field_name, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(doc.get(field_name)):
+                terms[token] = terms.get(token, 0.0) + weight
+
+        docno = len(self.docs)
+        self.docs.append({
+            "content_type": doc["content_type"],
+            "content_id": str(doc["content_id"]),
+            "title": doc.get("title"),
+            "body": (doc.get("body") or "")[:500],
+            "tags": doc.get("tags") or "",
+            "url": doc.get("url"),
+            "thumbnail_url": doc.get("thumbnail_url"),
+            "created_at": doc.get("created_at") or datetime.now(timezone.utc),
+        })
+        self.doc_terms.append(terms)
+        length = sum(terms.values())
+        self.doc_len.append(length)
+        self.total_len += length
+        self.keys[key] = docno
+        self.live += 1
+
+        for term, tf in terms.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = Postings()
+                for gram in trigrams(term):
+                    self.trigrams.setdefault(gram, set()).add(term)
+            postings.append(docno, tf)
+            self._trie_add(term, 1)
+
+    def _compact(self) -> None:
+        live_docs = [doc for doc in self.docs[1:] if doc is not None]
+        built_at = self.built_at
+        self._reset()
+        for doc in live_docs:
+            self._add(doc)
+        self.ready = True
+        self.built_at = built_at
+
+    def apply(self, upserts: Iterable[dict], deletes: Iterable[Tuple[str, str]]) -> None:
+        upserts, deletes = list(upserts), list(deletes)
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((upserts, deletes))
+            for key in deletes:
+                self._remove(key)
+            for doc in upserts:
+                self._add(doc)
+            tombstones = len(self.docs) - 1 - self.live
+            if tombstones > 1000 and tombstones > COMPACT_RATIO * (len(self.docs) - 1):
+                self._compact()
+
+    def rebuild(self, docs: Iterable[dict]) -> None:
+        """
+        Build a fresh index off to the side and swap it in. Writes applied
+        while it was building are replayed onto it before the swap.
+        """
+        with self._lock:
+            self._replay = []
+        try:
+            fresh = InvertedIndex()
+            for doc in docs:
+                fresh._add(doc)
+            with self._lock:
+                for upserts, deletes in self._replay:
+                    fresh.apply(upserts, deletes)
+                fresh.ready = True
+                fresh.built_at = time.time()
+                self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k not in ("_lock", "_replay")})
+        finally:
+            with self._lock:
+                self._replay = None
+
+    # ------------------ reads ------------------
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        content_type: Optional[str] = None,
+        sort: str = "relevance",
+    ) -> Tuple[List[Tuple[float, dict]], int]:
+        """
+        BM25 over all query terms (OR semantics). Returns ([(score, doc)], total
+        matches), ordered by `sort`: relevance, newest or oldest.
+        """
+        with self._lock:
+            return self._score({term: 1.0 for term in tokenize(query)}, limit, offset, content_type, sort)
+
+    def fuzzy_search(
+        self,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        content_type: Optional[str] = None,
+        sort: str = "relevance",
+        threshold: float = SEARCH_FUZZY_THRESHOLD,
+    ) -> Tuple[List[Tuple[float, dict]], int]:
+        """
+        Typo-tolerant search: every query token is expanded to the vocabulary
+        terms whose trigram similarity is at least `threshold`, and each
+        expansion contributes its BM25 score scaled by that similarity.
+        """
+        with self._lock:
+            weights: Dict[str, float] = {}
+            for token in tokenize(query):
+                for term, similarity in self._expand(token, threshold):
+                    weights[term] = max(weights.get(term, 0.0), similarity)
+            return self._score(weights, limit, offset, content_type, sort)
+
+    def _expand(self, token: str, threshold: float) -> List[Tuple[str, float]]:
+        grams = trigrams(token)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for term in self.trigrams.get(gram, ()):
+                shared[term] = shared.get(term, 0) + 1
+        candidates = []
+        for term, common in shared.items():
+            # Same measure as pg_trgm's similarity(): shared / union of trigram sets
+            similarity = common / (len(grams) + len(trigrams(term)) - common)
+            if similarity >= threshold:
+                node = self._trie_find(term)
+                if node is not None and node.df > 0:
+                    candidates.append((similarity, term))
+        return [(term, similarity) for similarity, term in heapq.nlargest(SEARCH_FUZZY_MAX_EXPANSIONS, candidates)]
+
+    def _score(
+        self,
+        weights: Dict[str, float],
+        limit: int,
+        offset: int,
+        content_type: Optional[str],
+        sort: str,
+    ) -> Tuple[List[Tuple[float, dict]], int]:
+        if not weights or not self.live:
+            return [], 0
+        avgdl = self.total_len / self.live
+        scores: Dict[int, float] = {}
+        for term, weight in weights.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            node = self._trie_find(term)
+            df = node.df if node else 0
+            if df <= 0:
+                continue
+            idf = math.log(1 + (self.live - df + 0.5) / (df + 0.5))
+            for docno, tf in postings:
+                doc = self.docs[docno]
+                if doc is None or (content_type and doc["content_type"] != content_type):
+                    continue
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[docno] / avgdl)
+                scores[docno] = scores.get(docno, 0.0) + weight * idf * tf * (BM25_K1 + 1) / norm
+        if sort == "newest":
+            top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: self.docs[item[0]]["created_at"].timestamp())
+        elif sort == "oldest":
+            top = heapq.nsmallest(offset + limit, scores.items(), key=lambda item: self.docs[item[0]]["created_at"].timestamp())
+        else:
+            top = heapq.nlargest(
+                offset + limit,
+                scores.items(),
+                key=lambda item: (item[1], self.docs[item[0]]["created_at"].timestamp()),
+            )
+        return [(score, self.docs[docno]) for docno, score in top[offset:]], len(scores)
+
+    def complete(self, prefix: str, limit: int = 5) -> List[Tuple[str, int]]:
+        """Vocabulary terms starting with prefix, by live document frequency."""
+        prefix = prefix.lower()
+        with self._lock:
+            node = self._trie_find(prefix)
+            if node is None:
+                return []
+            found: List[Tuple[int, str]] = []
+            stack = [(node, prefix)]
+            while stack:
+                current, term = stack.pop()
+                if current.df > 0:
+                    found.append((current.df, term))
+                for ch, child in current.children.items():
+                    stack.append((child, term + ch))
+        return [(term, df) for df, term in heapq.nlargest(limit, found)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "documents": self.live,
+                "tombstones": len(self.docs) - 1 - self.live,
+                "terms": len(self.postings),
+                "trigrams": len(self.trigrams),
+                "postings": sum(len(p) for p in self.postings.values()),
+                "built_at": self.built_at,
+            }
+
+    # ------------------ snapshots ------------------
+    def save(self, path: str = SEARCH_INDEX_SNAPSHOT) -> None:
+        with self._lock:
+            if not self.ready:
+                return
+            state = {k: v for k, v in self.__dict__.items() if k not in ("_lock", "_replay")}
+            # Every worker saves on shutdown; each writes its own temp file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".temp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump((SNAPSHOT_VERSION, state), f, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+        os.replace(tmp_path, path)
+
+    def load(self, path: str = SEARCH_INDEX_SNAPSHOT) -> bool:
+        try:
+            with open(path, "rb") as f:
+                version, state = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            log.warning("Ignoring unreadable search index snapshot %s: %s", path, e)
+            return False
+        if version != SNAPSHOT_VERSION:
+            return False
+        with self._lock:
+            self.__dict__.update(state)
+        return True
+
+
+class SearchIndexService:
+    """
+    Owns the process-wide index: warm start from the snapshot, background
+    rebuilds from the database, and incremental updates from committed writes.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self.index = InvertedIndex()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return SEARCH_MEMORY_INDEX and self.index.ready
+
+    def rebuild(self) -> None:
+        db = self.session_factory()
+        try:
+            self.index.rebuild(documents.iter_all_documents(db))
+            log.info("Search index rebuilt: %s documents", self.index.live)
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.rebuild()
+            except Exception as e:
+                log.exception("Search index rebuild failed: %s", e)
+            if SEARCH_INDEX_REFRESH_INTERVAL <= 0 or self._stopping.wait(SEARCH_INDEX_REFRESH_INTERVAL):
+                return
+
+    def start(self) -> None:
+        """Load the snapshot (if any) and rebuild in the background."""
+        if not SEARCH_MEMORY_INDEX or (self._thread and self._thread.is_alive()):
+            return
+        if self.index.load():
+            log.info("Search index warm-started from snapshot: %s documents", self.index.live)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="search-index", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if SEARCH_MEMORY_INDEX:
+            try:
+                self.index.save()
+            except Exception as e:
+                log.warning("Failed to save search index snapshot: %s", e)
+
+    def on_commit(self, captured: List[changes.Change]) -> None:
+        upserts, deletes = [], []
+        for change in captured:
+            if change.table not in documents.SOURCES:
+                continue
+            if change.op == changes.DELETE:
+                deletes.append((documents.SOURCES[change.table][0], change.key))
+            elif "search_document" in change.extra:
+                upserts.append(change.extra["search_document"])
+        if upserts or deletes:
+            self.index.apply(upserts, deletes)
+
+
+search_index = SearchIndexService()
+changes.on_commit(search_index.on_commit)
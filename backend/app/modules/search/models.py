@@ -0,0 +1,41 @@
+# app/modules/search/models.py
+from sqlalchemy import Column, Computed, DateTime, Index, String, Text, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from app.db.database import Base
+
+# Title outranks tags, tags outrank body text (ts_rank weights A > B > C)
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(tags, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'C')"
+)
+
+
+class SearchDocument(Base):
+    """
+    One row per searchable album, image, upload, comment, user and page,
+    kept in sync with the source tables by the change-capture listener in
+    search/documents.py. `tsv` is a generated, GIN-indexed tsvector.
+    """
+    __tablename__ = "search_documents"
+
+    content_type = Column(String(16), primary_key=True)   # album, image, upload, comment, user, page
+    content_id = Column(String(36), primary_key=True)
+    title = Column(Text, nullable=True)
+    body = Column(Text, nullable=True)
+    tags = Column(Text, nullable=True)                    # space-separated
+    url = Column(String, nullable=True)
+    thumbnail_url = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    tsv = Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True))
+
+    __table_args__ = (
+        Index("ix_search_documents_tsv", "tsv", postgresql_using="gin"),
+        Index("ix_search_documents_type_created", "content_type", "created_at"),
+        # pg_trgm indexes for fuzzy matching (<% word_similarity operator)
+        Index("ix_search_documents_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        Index("ix_search_documents_tags_trgm", "tags", postgresql_using="gin", postgresql_ops={"tags": "gin_trgm_ops"}),
+        Index("ix_search_documents_body_trgm", "body", postgresql_using="gin", postgresql_ops={"body": "gin_trgm_ops"}),
+    )
@@ -1,5 +1,5 @@
 # app/modules/search/router.py
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi import APIRouter, Depends, Query, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from app.db.database import get_db
 from . import service, schemas
@@ -11,11 +11,29 @@ log = logging.getLogger("search")
 
 router = APIRouter(prefix="/search", tags=["search"])
 
+SORT_REGEX = "^(" + "|".join(service.SORT_ORDERS) + ")$"
+SUGGESTIONS_MAX_AGE = 30  # seconds
+
+
+def _set_page_headers(response: Response, page: service.SearchPage):
+    """
+    Expose the total number of matches (when known) for pagination, and the
+    content types missing from a partial result.
+    """
+    if page.total is not None:
+        response.headers["X-Total-Count"] = str(page.total)
+    if page.degraded:
+        response.headers["X-Search-Degraded"] = ",".join(page.degraded)
+
 @router.get("/", response_model=List[schemas.SearchResult])
 def search(
+    response: Response,
     q: str = Query(..., min_length=1, max_length=500, description="Search query"),
     limit: int = Query(20, ge=1, le=100, description="Max number of results"),
+    offset: int = Query(0, ge=0, le=1000, description="Number of results to skip"),
     content_type: Optional[str] = Query(None, regex="^(album|image|upload|comment|user|page)$", description="Filter by content type"),
+    fuzzy: bool = Query(False, description="Typo-tolerant matching, ranked by trigram similarity"),
+    sort: str = Query("relevance", regex=SORT_REGEX, description="relevance, newest or oldest"),
     db: Session = Depends(get_db),
 ):
     """
@@ -32,9 +50,15 @@ def search(
     **Parameters:**
     - **q**: Search query (1-500 characters)
     - **limit**: Maximum number of results (1-100, default: 20)
+    - **offset**: Results to skip, for pagination (default: 0)
     - **content_type**: Optional filter by content type
+    - **fuzzy**: Tolerate typos (trigram similarity) instead of exact word matching
+    - **sort**: relevance (default), newest or oldest
     
-    **Returns:** List of search results with metadata
+    **Returns:** List of search results with metadata. The total number of
+    matches is sent in the X-Total-Count header. If some content types were
+    too slow to answer, the results are partial and X-Search-Degraded lists
+    the missing types.
     """
     try:
         # Validate and clean query
@@ -48,11 +72,12 @@ def search(
         # Log search for analytics (optional)
         log.info(f"Search query: '{query}', type: {content_type}, limit: {limit}")
         
-        # Search with or without type filter
-        if content_type:
-            results = service.search_by_type(db, query, content_type, limit)
-        else:
-            results = service.search_content(db, query, limit)
+        # Search with or without type filter (pushed down into the query)
+        page = service.search_page(
+            db, query, content_type=content_type, limit=limit, offset=offset, fuzzy=fuzzy, sort=sort
+        )
+        _set_page_headers(response, page)
+        results = page.results
         
         log.info(f"Search successful: returned {len(results)} results")
         return results
@@ -155,6 +180,7 @@ def debug_search(
 
 @router.get("/suggestions")
 def get_search_suggestions(
+    response: Response,
     q: str = Query(..., min_length=1, max_length=100, description="Partial search query"),
     limit: int = Query(5, ge=1, le=20, description="Max number of suggestions"),
     db: Session = Depends(get_db),
@@ -166,29 +192,33 @@ def get_search_suggestions(
     - **q**: Partial search query
     - **limit**: Maximum number of suggestions (1-20, default: 5)
     
-    **Returns:** List of suggested search terms
+    **Returns:** List of suggested search terms. When `complete` is true the
+    list holds every match for `q`, so longer queries starting with `q` can
+    be filtered client-side without another request.
     """
     try:
         query = q.strip()
         if not query:
-            return {"suggestions": []}
+            return {"suggestions": [], "query": q, "complete": False}
         
-        # This would need to be implemented in your service
-        suggestions = service.get_search_suggestions(db, query, limit) if hasattr(service, 'get_search_suggestions') else []
+        suggestions, complete = service.suggest(db, query, limit)
+        # Repeated keystrokes for the same prefix can be answered by the browser
+        response.headers["Cache-Control"] = f"public, max-age={SUGGESTIONS_MAX_AGE}"
         
-        return {"suggestions": suggestions}
+        return {"suggestions": suggestions, "query": query, "complete": complete}
         
     except Exception as e:
         log.exception(f"Search suggestions failed for query '{q}': {e}")
-        return {"suggestions": []}  # Graceful fallback
+        return {"suggestions": [], "query": q, "complete": False}  # Graceful fallback
 
 @router.get("/popular")
 def get_popular_searches(
     limit: int = Query(10, ge=1, le=50, description="Max number of popular searches"),
     content_type: Optional[str] = Query(None, regex="^(album|image|upload|comment|user|page)$", description="Filter by content type"),
+    db: Session = Depends(get_db),
 ):
     """
-    Get popular search terms (if you track search analytics).
+    Get the most frequently searched queries.
     
     **Parameters:**
     - **limit**: Maximum number of popular searches (1-50, default: 10)
@@ -197,9 +227,7 @@ def get_popular_searches(
     **Returns:** List of popular search terms
     """
     try:
-        # This would need analytics/tracking implementation
-        # For now, return empty or mock data
-        return {"popular_searches": []}
+        return {"popular_searches": service.get_popular_searches(db, limit=limit, content_type=content_type)}
         
     except Exception as e:
         log.exception(f"Popular searches failed: {e}")
@@ -226,14 +254,10 @@ def get_search_stats(db: Session = Depends(get_db)):
             "error_details": str(e)
         }
 
-# Type-specific search endpoints (alternative to using query parameter)
-@router.get("/albums", response_model=List[schemas.SearchResult])
-def search_albums(
-    q: str = Query(..., min_length=1, max_length=500, description="Search query"),
-    limit: int = Query(20, ge=1, le=100, description="Max number of results"),
-    db: Session = Depends(get_db),
-):
-    """Search only in albums."""
+# Type-specific search endpoints (alternative to using query parameter).
+# Each one queries a single table / document type.
+def _search_one_type(response: Response, db: Session, q: str, content_type: str, limit: int, offset: int, fuzzy: bool, sort: str):
+    label = content_type.capitalize()
     try:
         query = q.strip()
         if not query:
@@ -241,162 +265,99 @@ def search_albums(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Search query cannot be empty"
             )
-        
-        log.info(f"Album-specific search: '{query}'")
-        results = service.search_by_type(db, query, "album", limit)
-        log.info(f"Album search successful: {len(results)} results")
+
+        log.info(f"{label}-specific search: '{query}'")
+        page = service.search_page(
+            db, query, content_type=content_type, limit=limit, offset=offset, fuzzy=fuzzy, sort=sort
+        )
+        _set_page_headers(response, page)
+        results = page.results
+        log.info(f"{label} search successful: {len(results)} results")
         return results
-        
+
     except HTTPException:
         raise
     except Exception as e:
-        log.exception(f"Album search failed for query '{q}': {e}")
+        log.exception(f"{label} search failed for query '{q}': {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Album search service temporarily unavailable"
+            detail=f"{label} search service temporarily unavailable"
         )
 
+@router.get("/albums", response_model=List[schemas.SearchResult])
+def search_albums(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=500, description="Search query"),
+    limit: int = Query(20, ge=1, le=100, description="Max number of results"),
+    offset: int = Query(0, ge=0, le=1000, description="Number of results to skip"),
+    fuzzy: bool = Query(False, description="Typo-tolerant matching"),
+    sort: str = Query("relevance", regex=SORT_REGEX, description="relevance, newest or oldest"),
+    db: Session = Depends(get_db),
+):
+    """Search only in albums."""
+    return _search_one_type(response, db, q, "album", limit, offset, fuzzy, sort)
+
 @router.get("/images", response_model=List[schemas.SearchResult])
 def search_images(
+    response: Response,
     q: str = Query(..., min_length=1, max_length=500, description="Search query"),
     limit: int = Query(20, ge=1, le=100, description="Max number of results"),
+    offset: int = Query(0, ge=0, le=1000, description="Number of results to skip"),
+    fuzzy: bool = Query(False, description="Typo-tolerant matching"),
+    sort: str = Query("relevance", regex=SORT_REGEX, description="relevance, newest or oldest"),
     db: Session = Depends(get_db),
 ):
     """Search only in images."""
-    try:
-        query = q.strip()
-        if not query:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Search query cannot be empty"
-            )
-        
-        log.info(f"Image-specific search: '{query}'")
-        results = service.search_by_type(db, query, "image", limit)
-        log.info(f"Image search successful: {len(results)} results")
-        return results
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        log.exception(f"Image search failed for query '{q}': {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Image search service temporarily unavailable"
-        )
+    return _search_one_type(response, db, q, "image", limit, offset, fuzzy, sort)
 
 @router.get("/uploads", response_model=List[schemas.SearchResult])
 def search_uploads(
+    response: Response,
     q: str = Query(..., min_length=1, max_length=500, description="Search query"),
     limit: int = Query(20, ge=1, le=100, description="Max number of results"),
+    offset: int = Query(0, ge=0, le=1000, description="Number of results to skip"),
+    fuzzy: bool = Query(False, description="Typo-tolerant matching"),
+    sort: str = Query("relevance", regex=SORT_REGEX, description="relevance, newest or oldest"),
     db: Session = Depends(get_db),
 ):
     """Search only in uploads."""
-    try:
-        query = q.strip()
-        if not query:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Search query cannot be empty"
-            )
-        
-        log.info(f"Upload-specific search: '{query}'")
-        results = service.search_by_type(db, query, "upload", limit)
-        log.info(f"Upload search successful: {len(results)} results")
-        return results
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        log.exception(f"Upload search failed for query '{q}': {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Upload search service temporarily unavailable"
-        )
+    return _search_one_type(response, db, q, "upload", limit, offset, fuzzy, sort)
 
 @router.get("/comments", response_model=List[schemas.SearchResult])
 def search_comments(
+    response: Response,
     q: str = Query(..., min_length=1, max_length=500, description="Search query"),
     limit: int = Query(20, ge=1, le=100, description="Max number of results"),
+    offset: int = Query(0, ge=0, le=1000, description="Number of results to skip"),
+    fuzzy: bool = Query(False, description="Typo-tolerant matching"),
+    sort: str = Query("relevance", regex=SORT_REGEX, description="relevance, newest or oldest"),
     db: Session = Depends(get_db),
 ):
     """Search only in comments."""
-    try:
-        query = q.strip()
-        if not query:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Search query cannot be empty"
-            )
-        
-        log.info(f"Comment-specific search: '{query}'")
-        results = service.search_by_type(db, query, "comment", limit)
-        log.info(f"Comment search successful: {len(results)} results")
-        return results
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        log.exception(f"Comment search failed for query '{q}': {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Comment search service temporarily unavailable"
-        )
+    return _search_one_type(response, db, q, "comment", limit, offset, fuzzy, sort)
 
 @router.get("/users", response_model=List[schemas.SearchResult])
 def search_users(
+    response: Response,
     q: str = Query(..., min_length=1, max_length=500, description="Search query"),
     limit: int = Query(20, ge=1, le=100, description="Max number of results"),
+    offset: int = Query(0, ge=0, le=1000, description="Number of results to skip"),
+    fuzzy: bool = Query(False, description="Typo-tolerant matching"),
+    sort: str = Query("relevance", regex=SORT_REGEX, description="relevance, newest or oldest"),
     db: Session = Depends(get_db),
 ):
     """Search only in users."""
-    try:
-        query = q.strip()
-        if not query:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Search query cannot be empty"
-            )
-        
-        log.info(f"User-specific search: '{query}'")
-        results = service.search_by_type(db, query, "user", limit)
-        log.info(f"User search successful: {len(results)} results")
-        return results
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        log.exception(f"User search failed for query '{q}': {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="User search service temporarily unavailable"
-        )
+    return _search_one_type(response, db, q, "user", limit, offset, fuzzy, sort)
 
 @router.get("/pages", response_model=List[schemas.SearchResult])
 def search_pages(
+    response: Response,
     q: str = Query(..., min_length=1, max_length=500, description="Search query"),
     limit: int = Query(20, ge=1, le=100, description="Max number of results"),
+    offset: int = Query(0, ge=0, le=1000, description="Number of results to skip"),
+    fuzzy: bool = Query(False, description="Typo-tolerant matching"),
+    sort: str = Query("relevance", regex=SORT_REGEX, description="relevance, newest or oldest"),
     db: Session = Depends(get_db),
 ):
     """Search only in pages."""
-    try:
-        query = q.strip()
-        if not query:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Search query cannot be empty"
-            )
-        
-        log.info(f"Page-specific search: '{query}'")
-        results = service.search_by_type(db, query, "page", limit)
-        log.info(f"Page search successful: {len(results)} results")
-        return results
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        log.exception(f"Page search failed for query '{q}': {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Page search service temporarily unavailable"
-        )
+    return _search_one_type(response, db, q, "page", limit, offset, fuzzy, sort)
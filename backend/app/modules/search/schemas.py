@@ -143,6 +143,7 @@ class SearchSuggestion(BaseModel):
 class SearchSuggestionsResponse(BaseModel):
     suggestions: List[SearchSuggestion] = Field(description="Search suggestions")
     query: str = Field(description="Original partial query")
+    complete: bool = Field(False, description="True when these are all the matches for the query")
 
 class SearchStats(BaseModel):
     total_searchable_content: int = Field(ge=0, description="Total searchable items")
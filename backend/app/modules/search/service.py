@@ -1,15 +1,47 @@
 # app/modules/search/service.py - Minimal working version
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, text, func
+from sqlalchemy import or_, and_, text, func, literal
 from datetime import datetime, timezone
 import importlib
-from typing import List, Any, Optional
+from typing import Dict, List, Any, NamedTuple, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import heapq
+import itertools
 from . import schemas
+from . import documents  # noqa: F401 - registers the search_documents change listener
+from .models import SearchDocument
+from .memory_index import search_index
+from .cache import normalize_query, popular_queries, result_cache
+from .suggest import suggestion_service
 import logging
 import json
+import os
+import threading
+import time
+
+from app.db import changes
+from app.db.database import SessionLocal
 
 log = logging.getLogger("search")
 
+# Set SEARCH_FULLTEXT=0 to force the per-model ILIKE search on Postgres
+SEARCH_FULLTEXT = os.getenv("SEARCH_FULLTEXT", "1") != "0"
+SEARCH_TS_CONFIG = "english"
+
+# ILIKE fan-out: per-model queries run concurrently on their own connections
+SEARCH_FANOUT_WORKERS = int(os.getenv("SEARCH_FANOUT_WORKERS", "6"))
+SEARCH_SOURCE_TIMEOUT = float(os.getenv("SEARCH_SOURCE_TIMEOUT", "2.0"))  # seconds, from when the query starts
+SEARCH_QUEUE_TIMEOUT = float(os.getenv("SEARCH_QUEUE_TIMEOUT", "2.0"))  # seconds a source may wait for a free worker
+
+_fanout_pool = ThreadPoolExecutor(max_workers=SEARCH_FANOUT_WORKERS, thread_name_prefix="search")
+
+# After writes invalidate the result cache, re-run the most popular queries
+SEARCH_CACHE_WARM_QUERIES = int(os.getenv("SEARCH_CACHE_WARM_QUERIES", "20"))
+SEARCH_CACHE_WARM_DELAY = float(os.getenv("SEARCH_CACHE_WARM_DELAY", "5"))  # seconds, debounces write bursts
+
+_warm_lock = threading.Lock()
+_warm_timer: Optional[threading.Timer] = None
+
 
 def try_import_model(candidates):
     """Try to import a model given a list of fully-qualified strings "module.Class"."""
@@ -110,256 +142,503 @@ def _build_search_filters(model, query: str, search_fields: List[str]):
     return filters
 
 
-def search_content(db: Session, query: str, limit: int = 20) -> List[schemas.SearchResult]:
-    """Search across different content types - only the ones that actually work."""
-    if not query or not query.strip():
-        return []
-    
-    query = query.strip()
-    results: List[schemas.SearchResult] = []
-
-    # --- Search in Album model ---
-    AlbumModel = try_import_model([
-        "app.modules.albums.models.Album",
-        "app.modules.albums.models.PhotoAlbum"
-    ])
-    if AlbumModel:
-        try:
-            # Correct search fields for the Album model
-            search_fields = ["title", "description"]
-            filters = _build_search_filters(AlbumModel, query, search_fields)
-            
-            if filters:
-                albums = (
-                    db.query(AlbumModel)
-                    .filter(or_(*filters))
-                    .limit(limit)
-                    .all()
-                )
-                
-                for album in albums:
-                    title = (
-                        getattr(album, "title", None) or 
-                        f"Album {getattr(album, 'id', 'Unknown')}"
-                    )
-                    
-                    results.append(
-                        schemas.SearchResult(
-                            id=str(getattr(album, "id", "")),
-                            type=schemas.ContentType.ALBUM,
-                            title=title,
-                            excerpt=_safe_excerpt(getattr(album, "description", "")),
-                            created_at=_safe_created_at(album),
-                            url=f"/albums/{getattr(album, 'id', '')}",
-                            thumbnail_url=getattr(album, "cover_image_url", None),
-                            tags=_parse_tags_field(getattr(album, "tags", None)),
-                        )
-                    )
-        except Exception as e:
-            db.rollback()
-            log.exception("Album search failed for query '%s': %s", query, e)
+SORT_ORDERS = ("relevance", "newest", "oldest")
 
-    # --- Search in Image model (WORKING) ---
-    ImageModel = try_import_model(["app.modules.images.models.Image"])
-    if ImageModel:
-        try:
-            search_fields = ["title", "description", "caption", "filename"]
-            filters = _build_search_filters(ImageModel, query, search_fields)
-            
-            if filters:
-                images = (
-                    db.query(ImageModel)
-                    .filter(or_(*filters))
-                    .limit(limit)
-                    .all()
-                )
-                
-                for img in images:
-                    title = getattr(img, "title", None) or getattr(img, "filename", None) or f"Image {getattr(img, 'id', 'Unknown')}"
-                    
-                    results.append(
-                        schemas.SearchResult(
-                            id=str(getattr(img, "id", "")),
-                            type=schemas.ContentType.IMAGE,
-                            title=title,
-                            excerpt=_safe_excerpt(getattr(img, "description", "") or getattr(img, "caption", "")),
-                            created_at=_safe_created_at(img),
-                            url=f"/images/{getattr(img, 'id', '')}",
-                            thumbnail_url=None,
-                            tags=[],
-                        )
-                    )
-        except Exception as e:
-            db.rollback()
-            log.exception("Image search failed for query '%s': %s", query, e)
-    
-    # --- Search in Upload model (WORKING) ---
-    UploadModel = try_import_model(["app.modules.uploads.models.Upload"])
-    if UploadModel:
-        try:
-            search_fields = ["filename", "description"]
-            filters = _build_search_filters(UploadModel, query, search_fields)
-            
-            if filters:
-                uploads = (
-                    db.query(UploadModel)
-                    .filter(or_(*filters))
-                    .limit(limit)
-                    .all()
-                )
-                
-                for upload in uploads:
-                    title = getattr(upload, "filename", None) or f"Upload {getattr(upload, 'id', 'Unknown')}"
-                    
-                    results.append(
-                        schemas.SearchResult(
-                            id=str(getattr(upload, "id", "")),
-                            type=schemas.ContentType.UPLOAD,
-                            title=title,
-                            excerpt=_safe_excerpt(getattr(upload, "description", "")),
-                            created_at=_safe_created_at(upload),
-                            url=getattr(upload, "url", None),
-                            thumbnail_url=getattr(upload, "thumbnail_url", None),
-                            tags=_parse_tags_field(getattr(upload, "tags", None)),
-                        )
-                    )
-        except Exception as e:
-            db.rollback()
-            log.exception("Upload search failed for query '%s': %s", query, e)
+class SearchPage(NamedTuple):
+    results: List[schemas.SearchResult]
+    total: Optional[int]                # None when it could not be determined
+    degraded: Tuple[str, ...] = ()      # content types left out because they were slow or failed
 
-    # --- Search in Comment model ---
-    CommentModel = try_import_model(["app.modules.comments.models.Comment"])
-    if CommentModel:
-        try:
-            # Correct search fields for the Comment model
-            search_fields = ["content"]
-            filters = _build_search_filters(CommentModel, query, search_fields)
-            
-            if filters:
-                comments = (
-                    db.query(CommentModel)
-                    .filter(or_(*filters))
-                    .limit(limit)
-                    .all()
-                )
-                
-                for comment in comments:
-                    content = getattr(comment, "content", None) or getattr(comment, "text", None) or getattr(comment, "body", None)
-                    title = f"Comment by {getattr(comment, 'author_name', 'User')}" if hasattr(comment, 'author_name') else "Comment"
-                    
-                    results.append(
-                        schemas.SearchResult(
-                            id=str(getattr(comment, "id", "")),
-                            type=schemas.ContentType.COMMENT,
-                            title=title,
-                            excerpt=_safe_excerpt(content),
-                            created_at=_safe_created_at(comment),
-                            url=f"/comments/{getattr(comment, 'id', '')}",
-                            thumbnail_url=None,
-                            tags=[],
-                        )
-                    )
-        except Exception as e:
-            db.rollback()
-            log.exception("Comment search failed for query '%s': %s", query, e)
 
-    # --- Search in User model ---
-    UserModel = try_import_model(["app.modules.users.models.User"])
-    if UserModel:
-        try:
-            # Correct search fields for the User model
-            search_fields = ["username", "email"]
-            filters = _build_search_filters(UserModel, query, search_fields)
-            
-            if filters:
-                users = (
-                    db.query(UserModel)
-                    .filter(or_(*filters))
-                    .limit(limit)
-                    .all()
-                )
-                
-                for user in users:
-                    title = (
-                        getattr(user, "username", None) or 
-                        f"User {getattr(user, 'id', 'Unknown')}"
-                    )
-                    
-                    results.append(
-                        schemas.SearchResult(
-                            id=str(getattr(user, "id", "")),
-                            type=schemas.ContentType.USER,
-                            title=title,
-                            excerpt=_safe_excerpt(getattr(user, "bio", "")),
-                            created_at=_safe_created_at(user),
-                            url=f"/users/{getattr(user, 'id', '')}",
-                            thumbnail_url=getattr(user, "avatar_url", None),
-                            tags=[],
-                        )
-                    )
-        except Exception as e:
-            db.rollback()
-            log.exception("User search failed for query '%s': %s", query, e)
+def _fulltext_available(db: Session) -> bool:
+    return SEARCH_FULLTEXT and db.get_bind().dialect.name == "postgresql"
+
+
+def _order_by(sort: str, score, created_at, key) -> tuple:
+    """ORDER BY for a sort mode; relevance needs a score column, else it means newest."""
+    if sort == "oldest":
+        return (created_at.asc(), key.asc())
+    if sort == "relevance" and score is not None:
+        return (score.desc(), created_at.desc())
+    return (created_at.desc(), key.desc())
+
+
+def _paged(q, order_by: tuple, limit: int, offset: int) -> Tuple[list, Optional[int]]:
+    """
+    Run one page of a query, getting the total match count from the same
+    statement with a window function. The total is unknown (None) when the
+    offset is past the last row.
+    """
+    rows = (
+        q.add_columns(func.count().over().label("total"))
+        .order_by(*order_by)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    if not rows:
+        return [], (0 if offset == 0 else None)
+    return [tuple(row)[:-1] for row in rows], rows[0].total
+
+
+def fulltext_search(
+    db: Session,
+    query: str,
+    limit: int = 20,
+    offset: int = 0,
+    content_type: Optional[str] = None,
+    sort: str = "relevance",
+) -> Tuple[List[schemas.SearchResult], Optional[int]]:
+    """
+    Relevance-ranked search over search_documents in a single query: the GIN
+    index on the weighted tsvector finds the matches, ts_rank orders them
+    (normalized to 0..1), newest first among equal ranks.
+    """
+    tsquery = func.websearch_to_tsquery(SEARCH_TS_CONFIG, query)
+    rank = func.ts_rank(SearchDocument.tsv, tsquery, 32).label("rank")
+    q = db.query(SearchDocument, rank).filter(SearchDocument.tsv.op("@@")(tsquery))
+    if content_type:
+        q = q.filter(SearchDocument.content_type == content_type)
+    rows, total = _paged(
+        q, _order_by(sort, rank, SearchDocument.created_at, SearchDocument.content_id), limit, offset
+    )
+    return [_document_result(doc, score) for doc, score in rows], total
+
+
+def trigram_search(
+    db: Session,
+    query: str,
+    limit: int = 20,
+    offset: int = 0,
+    content_type: Optional[str] = None,
+    sort: str = "relevance",
+) -> Tuple[List[schemas.SearchResult], Optional[int]]:
+    """
+    Typo-tolerant search with pg_trgm: a document matches when the query is
+    word-similar to its title, tags or body (the <% operator, served by the
+    trigram GIN indexes), ranked by the best similarity.
+    """
+    needle = literal(query)
+    similarity = func.greatest(
+        func.word_similarity(needle, func.coalesce(SearchDocument.title, "")),
+        func.word_similarity(needle, func.coalesce(SearchDocument.tags, "")),
+        func.word_similarity(needle, func.coalesce(SearchDocument.body, "")) * 0.8,
+    ).label("similarity")
+    q = db.query(SearchDocument, similarity).filter(
+        or_(
+            needle.op("<%")(SearchDocument.title),
+            needle.op("<%")(SearchDocument.tags),
+            needle.op("<%")(SearchDocument.body),
+        )
+    )
+    if content_type:
+        q = q.filter(SearchDocument.content_type == content_type)
+    rows, total = _paged(
+        q, _order_by(sort, similarity, SearchDocument.created_at, SearchDocument.content_id), limit, offset
+    )
+    return [_document_result(doc, score) for doc, score in rows], total
+
+
+def _document_result(doc: SearchDocument, score: float) -> schemas.SearchResult:
+    return schemas.SearchResult(
+        id=doc.content_id,
+        type=doc.content_type,
+        title=doc.title,
+        excerpt=_safe_excerpt(doc.body),
+        created_at=doc.created_at or datetime.now(timezone.utc),
+        url=doc.url,
+        thumbnail_url=doc.thumbnail_url,
+        tags=doc.tags.split() if doc.tags else [],
+        relevance_score=round(min(float(score), 1.0), 6),
+    )
+
+
+def memory_search(
+    query: str,
+    limit: int = 20,
+    offset: int = 0,
+    content_type: Optional[str] = None,
+    fuzzy: bool = False,
+    sort: str = "relevance",
+) -> Tuple[List[schemas.SearchResult], Optional[int]]:
+    """BM25-ranked search served from the in-process inverted index."""
+    index = search_index.index
+    hits, total = (index.fuzzy_search if fuzzy else index.search)(
+        query, limit=limit, offset=offset, content_type=content_type, sort=sort
+    )
+    return [
+        schemas.SearchResult(
+            id=doc["content_id"],
+            type=doc["content_type"],
+            title=doc["title"],
+            excerpt=_safe_excerpt(doc["body"]),
+            created_at=doc["created_at"],
+            url=doc["url"],
+            thumbnail_url=doc["thumbnail_url"],
+            tags=doc["tags"].split(),
+            relevance_score=round(score / (score + 1), 6),
+        )
+        for score, doc in hits
+    ], total
+
+
+# --- Per-model ILIKE search (used when neither index is available) ---
+
+def _album_result(album) -> schemas.SearchResult:
+    return schemas.SearchResult(
+        id=str(getattr(album, "id", "")),
+        type=schemas.ContentType.ALBUM,
+        title=getattr(album, "title", None) or f"Album {getattr(album, 'id', 'Unknown')}",
+        excerpt=_safe_excerpt(getattr(album, "description", "")),
+        created_at=_safe_created_at(album),
+        url=f"/albums/{getattr(album, 'id', '')}",
+        thumbnail_url=getattr(album, "cover_image_url", None),
+        tags=_parse_tags_field(getattr(album, "tags", None)),
+    )
+
+
+def _image_result(img) -> schemas.SearchResult:
+    return schemas.SearchResult(
+        id=str(getattr(img, "id", "")),
+        type=schemas.ContentType.IMAGE,
+        title=getattr(img, "title", None) or getattr(img, "filename", None) or f"Image {getattr(img, 'id', 'Unknown')}",
+        excerpt=_safe_excerpt(getattr(img, "description", "") or getattr(img, "caption", "")),
+        created_at=_safe_created_at(img),
+        url=f"/images/{getattr(img, 'id', '')}",
+        thumbnail_url=None,
+        tags=[],
+    )
+
 
-    # --- Search in Pages (WORKING) ---
-    PageModel = try_import_model(["app.modules.pages.models.Page"])
-    if PageModel:
+def _upload_result(upload) -> schemas.SearchResult:
+    return schemas.SearchResult(
+        id=str(getattr(upload, "id", "")),
+        type=schemas.ContentType.UPLOAD,
+        title=getattr(upload, "filename", None) or f"Upload {getattr(upload, 'id', 'Unknown')}",
+        excerpt=_safe_excerpt(getattr(upload, "description", "")),
+        created_at=_safe_created_at(upload),
+        url=getattr(upload, "url", None),
+        thumbnail_url=getattr(upload, "thumbnail_url", None),
+        tags=_parse_tags_field(getattr(upload, "tags", None)),
+    )
+
+
+def _comment_result(comment) -> schemas.SearchResult:
+    content = getattr(comment, "content", None) or getattr(comment, "text", None) or getattr(comment, "body", None)
+    return schemas.SearchResult(
+        id=str(getattr(comment, "id", "")),
+        type=schemas.ContentType.COMMENT,
+        title=f"Comment by {getattr(comment, 'author_name', 'User')}" if hasattr(comment, 'author_name') else "Comment",
+        excerpt=_safe_excerpt(content),
+        created_at=_safe_created_at(comment),
+        url=f"/comments/{getattr(comment, 'id', '')}",
+        thumbnail_url=None,
+        tags=[],
+    )
+
+
+def _user_result(user) -> schemas.SearchResult:
+    return schemas.SearchResult(
+        id=str(getattr(user, "id", "")),
+        type=schemas.ContentType.USER,
+        title=getattr(user, "username", None) or f"User {getattr(user, 'id', 'Unknown')}",
+        excerpt=_safe_excerpt(getattr(user, "bio", "")),
+        created_at=_safe_created_at(user),
+        url=f"/users/{getattr(user, 'id', '')}",
+        thumbnail_url=getattr(user, "avatar_url", None),
+        tags=[],
+    )
+
+
+def _page_result(page) -> schemas.SearchResult:
+    return schemas.SearchResult(
+        id=str(getattr(page, "id", "")),
+        type=schemas.ContentType.PAGE,
+        title=getattr(page, "title", None) or f"Page {getattr(page, 'id', 'Unknown')}",
+        excerpt=_safe_excerpt(getattr(page, "content", "")),
+        created_at=_safe_created_at(page),
+        url=getattr(page, "url", None) or f"/pages/{getattr(page, 'id', '')}",
+        tags=[],
+    )
+
+
+# content type -> model candidates, ILIKE fields, date column and result builder
+SOURCES: Dict[str, Dict[str, Any]] = {
+    "album": {
+        "models": ["app.modules.albums.models.Album", "app.modules.albums.models.PhotoAlbum"],
+        "fields": ["title", "description"],
+        "date": "created_at",
+        "build": _album_result,
+    },
+    "image": {
+        "models": ["app.modules.images.models.Image"],
+        "fields": ["title", "description", "caption", "filename"],
+        "date": "created_at",
+        "build": _image_result,
+    },
+    "upload": {
+        "models": ["app.modules.uploads.models.Upload"],
+        "fields": ["filename", "description"],
+        "date": "uploaded_at",
+        "build": _upload_result,
+    },
+    "comment": {
+        "models": ["app.modules.comments.models.Comment"],
+        "fields": ["content"],
+        "date": "created_at",
+        "build": _comment_result,
+    },
+    "user": {
+        "models": ["app.modules.users.models.User"],
+        "fields": ["username"],
+        "date": "created_at",
+        "build": _user_result,
+    },
+    "page": {
+        "models": ["app.modules.pages.models.Page"],
+        "fields": ["title", "content"],
+        "date": "created_at",
+        "build": _page_result,
+    },
+}
+
+
+def model_search(
+    db: Session,
+    content_type: str,
+    query: str,
+    limit: int = 20,
+    offset: int = 0,
+    sort: str = "newest",
+) -> Tuple[List[schemas.SearchResult], Optional[int]]:
+    """
+    ILIKE search against the one model behind `content_type`, with ordering,
+    offset, limit and the total count pushed into a single query.
+    """
+    source = SOURCES[content_type]
+    model = try_import_model(source["models"])
+    if model is None:
+        return [], 0
+    filters = _build_search_filters(model, query, source["fields"])
+    if not filters:
+        return [], 0
+    q = db.query(model).filter(or_(*filters))
+    rows, total = _paged(q, _order_by(sort, None, getattr(model, source["date"]), model.id), limit, offset)
+    return [source["build"](row[0]) for row in rows], total
+
+
+def _search_source(content_type: str, query: str, limit: int, sort: str) -> Tuple[List[schemas.SearchResult], Optional[int]]:
+    """Run one model's search on its own session, bounded by a statement timeout."""
+    db = SessionLocal()
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text(f"SET LOCAL statement_timeout = {int(SEARCH_SOURCE_TIMEOUT * 1000)}"))
+        return model_search(db, content_type, query, limit, 0, sort)
+    finally:
+        db.close()
+
+
+def _search_content_ilike(query: str, limit: int = 20, offset: int = 0, sort: str = "newest") -> SearchPage:
+    """
+    Search every model with ILIKE. The per-model queries run concurrently on
+    the fan-out pool, each with its own connection. The pool is shared by all
+    requests, so each query's SEARCH_SOURCE_TIMEOUT deadline runs from when it
+    starts, not from when it was queued; a query that does not get a worker
+    within SEARCH_QUEUE_TIMEOUT is dropped. Whatever misses its deadline (or
+    fails) is left out and reported in `degraded`, so latency is bounded by
+    the slowest source, not the sum. The date-ordered pages are merged with a
+    heap, keeping only the top k.
+    """
+    queued = time.monotonic()
+    started: Dict[str, float] = {}
+
+    def run(content_type: str):
+        started[content_type] = time.monotonic()
+        return _search_source(content_type, query, limit + offset, sort)
+
+    def deadline(future) -> float:
+        start = started.get(futures[future])
+        return queued + SEARCH_QUEUE_TIMEOUT if start is None else start + SEARCH_SOURCE_TIMEOUT
+
+    futures = {_fanout_pool.submit(run, content_type): content_type for content_type in SOURCES}
+    pending, not_done = set(futures), set()
+    while pending:
+        now = time.monotonic()
+        expired = {future for future in pending if not future.done() and deadline(future) <= now}
+        not_done |= expired
+        pending -= expired
+        if pending:
+            _, pending = wait(pending, timeout=max(0, min(deadline(f) for f in pending) - now), return_when=FIRST_COMPLETED)
+    done = set(futures) - not_done
+
+    pages: List[List[schemas.SearchResult]] = []
+    degraded = []
+    total = 0
+    for future in not_done:
+        if future.cancel():
+            log.warning("%s search got no worker in time for query '%s'", futures[future].capitalize(), query)
+        else:
+            log.warning("%s search timed out for query '%s'", futures[future].capitalize(), query)
+        degraded.append(futures[future])
+    for future in done:
         try:
-            search_fields = ["title", "content"]
-            filters = _build_search_filters(PageModel, query, search_fields)
-            
-            if filters:
-                pages = (
-                    db.query(PageModel)
-                    .filter(or_(*filters))
-                    .limit(limit)
-                    .all()
-                )
-                
-                for page in pages:
-                    title = getattr(page, "title", None) or f"Page {getattr(page, 'id', 'Unknown')}"
-                    
-                    results.append(
-                        schemas.SearchResult(
-                            id=str(getattr(page, "id", "")),
-                            type=schemas.ContentType.PAGE,
-                            title=title,
-                            excerpt=_safe_excerpt(getattr(page, "content", "")),
-                            created_at=_safe_created_at(page),
-                            url=getattr(page, "url", None) or f"/pages/{getattr(page, 'id', '')}",
-                            tags=[],
-                        )
-                    )
+            found, count = future.result()
         except Exception as e:
-            db.rollback()
-            log.exception("Page search failed for query '%s': %s", query, e)
+            degraded.append(futures[future])
+            log.exception("%s search failed for query '%s': %s", futures[future].capitalize(), query, e)
+            continue
+        pages.append(found)
+        total += count or 0
+
+    # --- Merge the per-source pages by date, newest first (oldest first on request) ---
+    oldest = sort == "oldest"
+    merged = heapq.merge(
+        *pages,
+        key=lambda r: (r.created_at or datetime.min.replace(tzinfo=timezone.utc)).timestamp(),
+        reverse=not oldest,
+    )
+    results = list(itertools.islice(merged, offset, offset + limit))
+    return SearchPage(results, None if degraded else total, tuple(sorted(degraded)))
+
+
+def search_page(
+    db: Session,
+    query: str,
+    content_type: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    fuzzy: bool = False,
+    sort: str = "relevance",
+    record: bool = True,
+) -> SearchPage:
+    """
+    One page of search results, the total number of matches and the content
+    types that had to be skipped. Served from the in-memory index once it is
+    built, otherwise from the full-text (or, with fuzzy, trigram) index on
+    Postgres, falling back to per-model ILIKE matching elsewhere. With a
+    content type, only that type's documents or table are queried.
+
+    Complete pages are cached until a write touches one of the content types
+    they cover (or the TTL runs out). `record` counts the query towards the
+    popular searches.
+    """
+    if not query or not query.strip():
+        return SearchPage([], 0)
+
+    normalized = normalize_query(query)
+    if record:
+        popular_queries.record(normalized, content_type)
+    key = (normalized, content_type, limit, offset, sort, fuzzy)
+    page = result_cache.get(key, content_type)
+    if page is not None:
+        return page
+
+    generation = result_cache.generation(content_type)
+    page = _search_page(db, query.strip(), content_type, limit, offset, fuzzy, sort)
+    if not page.degraded:
+        result_cache.put(key, page, generation, page.results)
+    return page
+
+
+def _search_page(db: Session, query: str, content_type: Optional[str], limit: int, offset: int, fuzzy: bool, sort: str) -> SearchPage:
+    if search_index.ready:
+        return SearchPage(*memory_search(query, limit=limit, offset=offset, content_type=content_type, fuzzy=fuzzy, sort=sort))
+    if _fulltext_available(db):
+        search = trigram_search if fuzzy else fulltext_search
+        return SearchPage(*search(db, query, limit=limit, offset=offset, content_type=content_type, sort=sort))
+    if content_type:
+        return SearchPage(*model_search(db, content_type, query, limit=limit, offset=offset, sort=sort))
+    return _search_content_ilike(query, limit=limit, offset=offset, sort=sort)
 
-    # --- Sort all results by date, newest first ---
+
+def warm_search_cache(limit: int = SEARCH_CACHE_WARM_QUERIES) -> int:
+    """Run the most popular queries so their first pages are cached. Returns the number run."""
+    global _warm_timer
+    with _warm_lock:
+        _warm_timer = None
+    top = popular_queries.top(limit)
+    if not top:
+        return 0
+    db = SessionLocal()
     try:
-        results.sort(key=lambda r: r.created_at or datetime.min.replace(tzinfo=timezone.utc), reverse=True)
+        for query, _ in top:
+            search_page(db, query, record=False)
     except Exception as e:
-        log.warning("Failed to sort search results: %s", e)
-    
-    return results[:limit]
+        log.warning("Search cache warm-up failed: %s", e)
+    finally:
+        db.close()
+    return len(top)
+
+
+def schedule_cache_warm() -> None:
+    """Warm the cache shortly, unless a warm-up is already pending."""
+    global _warm_timer
+    if SEARCH_CACHE_WARM_QUERIES <= 0:
+        return
+    with _warm_lock:
+        if _warm_timer is not None:
+            return
+        _warm_timer = threading.Timer(SEARCH_CACHE_WARM_DELAY, warm_search_cache)
+        _warm_timer.daemon = True
+        _warm_timer.start()
+
+
+@changes.on_commit
+def _warm_after_write(captured: List[changes.Change]) -> None:
+    if any(change.table in documents.SOURCES for change in captured):
+        schedule_cache_warm()
+
 
+def start_search_cache() -> None:
+    """Restore the popular-query counts and warm the cache with them."""
+    popular_queries.load()
+    schedule_cache_warm()
 
-def search_by_type(db: Session, query: str, content_type: str, limit: int = 20) -> List[schemas.SearchResult]:
+
+def stop_search_cache() -> None:
+    popular_queries.save()
+
+
+def search_content(db: Session, query: str, limit: int = 20, offset: int = 0, fuzzy: bool = False) -> List[schemas.SearchResult]:
+    """Search across all content types."""
+    return search_page(db, query, limit=limit, offset=offset, fuzzy=fuzzy)[0]
+
+
+def search_by_type(db: Session, query: str, content_type: str, limit: int = 20, offset: int = 0, fuzzy: bool = False) -> List[schemas.SearchResult]:
     """Search within a specific content type."""
-    # Simple approach - get all results and filter
-    all_results = search_content(db, query, limit * 3)
-    
-    # Filter by type - handle both string and enum types
-    filtered_results = []
-    for r in all_results:
-        result_type = r.type.value if hasattr(r.type, 'value') else str(r.type)
-        if result_type == content_type:
-            filtered_results.append(r)
-    
-    return filtered_results[:limit]
+    return search_page(db, query, content_type=content_type, limit=limit, offset=offset, fuzzy=fuzzy)[0]
+
+def suggest(db: Session, query: str, limit: int = 5) -> Tuple[List[schemas.SearchSuggestion], bool]:
+    """
+    Typeahead suggestions for a partial query, and whether they are every
+    match for it (so a client can filter them locally while the user keeps
+    typing). Served from the prefix index once it is built.
+    """
+    if suggestion_service.ready:
+        found, complete = suggestion_service.index.suggest(query, limit)
+        return [
+            schemas.SearchSuggestion(text=text, type=content_type)
+            for text, content_type, _ in found
+        ], complete
+    return get_search_suggestions(db, query, limit), False
+
 
 # New function: get_search_suggestions
 def get_search_suggestions(db: Session, query: str, limit: int = 5) -> List[schemas.SearchSuggestion]:
     """Generate search suggestions based on partial query matches."""
+    if suggestion_service.ready:
+        return suggest(db, query, limit)[0]
+    if search_index.ready:
+        # Complete the last word being typed from the index vocabulary
+        words = query.lower().split()
+        if not words:
+            return []
+        head = " ".join(words[:-1])
+        return [
+            schemas.SearchSuggestion(text=f"{head} {term}".strip(), count=df)
+            for term, df in search_index.index.complete(words[-1], limit)
+        ]
+
     suggestions = []
     
     # Use a set to store unique suggestions
@@ -406,11 +685,15 @@ def get_search_suggestions(db: Session, query: str, limit: int = 5) -> List[sche
     return suggestions[:limit]
 
 # New function: get_popular_searches
-def get_popular_searches(db: Session, limit: int = 10) -> List[str]:
+def get_popular_searches(db: Session, limit: int = 10, content_type: Optional[str] = None) -> List[str]:
     """
-    Get popular search terms based on most common titles/tags.
-    This is a placeholder as a dedicated analytics table doesn't exist.
+    Most frequent search queries, from the query sketch. Until any searches
+    have been recorded, fall back to the most common image and album titles.
     """
+    tracked = popular_queries.top(limit, content_type)
+    if tracked or content_type:
+        return [query for query, _ in tracked]
+
     popular_terms = []
     unique_terms = set()
     
@@ -527,5 +810,9 @@ def get_search_stats(db: Session) -> dict:
     except Exception as e:
         log.exception("Failed to get search stats: %s", e)
         stats["search_enabled"] = False
+
+    stats["memory_index"] = search_index.index.stats()
+    stats["result_cache"] = result_cache.stats()
+    stats["suggestion_index"] = suggestion_service.index.stats()
     
     return stats
@@ -0,0 +1,347 @@
+# app/modules/search/suggest.py
+"""
+Typeahead suggestions from an in-memory prefix index.
+
+Every suggestable phrase (image and album titles, upload tags, usernames)
+is stored once, with a weight: image titles by likes and views, tags by how
+many uploads carry them. The index itself is a sorted list of
+(suffix, phrase) pairs, one per word start of each phrase, so "sun" finds
+both "sunset" and "beach sunset", with the phrase weights in a parallel
+list. A lookup is two bisects to find the run of keys starting with the
+prefix and a heap selection of the heaviest keys in that run.
+
+Committed writes update the index incrementally through change capture;
+a periodic rebuild picks up popularity changes and writes made by other
+processes.
+"""
+import bisect
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.db import changes
+from app.db.database import SessionLocal
+
+log = logging.getLogger("search")
+
+# Configuration via environment variables (fallbacks)
+SEARCH_SUGGEST_INDEX = os.getenv("SEARCH_SUGGEST_INDEX", "1") != "0"
+# Full rebuild period in seconds, refreshes popularity weights (0 = never)
+SEARCH_SUGGEST_REFRESH_INTERVAL = float(os.getenv("SEARCH_SUGGEST_REFRESH_INTERVAL", "600"))
+
+SUGGEST_MAX_WORDS = 4        # word starts indexed per phrase
+SUGGEST_MAX_LENGTH = 100     # longer phrases are not useful as suggestions
+SUGGEST_MEMO_RUN = 1000      # answers for prefixes matching more keys than this are memoized
+SUGGEST_MEMO_LIMIT = 20      # memoized answers hold this many suggestions
+SUGGEST_MEMO_SIZE = 512      # memoized prefixes kept
+REBUILD_BATCH_SIZE = 1000
+
+# source table -> content type of its suggestions
+SOURCE_TYPES = {
+    "images": "image",
+    "albums": "album",
+    "uploads": "upload",
+    "users": "user",
+}
+
+Phrase = Tuple[str, str, float]  # (text, content type, weight)
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def image_weight(likes: Optional[int], views: Optional[int]) -> float:
+    """Popularity of an image title: likes count for more than views, both dampened."""
+    return 1.0 + 2.0 * math.log1p(likes or 0) + math.log1p(views or 0)
+
+
+def _phrases(table: str, values: Dict[str, Any], popularity: Dict[str, float], key: str) -> Optional[List[Phrase]]:
+    """Suggestions contributed by one source row, or None if the relevant column was not loaded."""
+    content_type = SOURCE_TYPES[table]
+    if table == "images":
+        if "title" not in values:
+            return None
+        return [(values["title"], content_type, popularity.get(key, 1.0))] if values["title"] else []
+    if table == "albums":
+        if "title" not in values:
+            return None
+        return [(values["title"], content_type, 1.0)] if values["title"] else []
+    if table == "users":
+        if "username" not in values:
+            return None
+        return [(values["username"], content_type, 1.0)] if values["username"] else []
+    if "tags" not in values:
+        return None
+    from app.modules.search.service import _parse_tags_field  # avoid import cycle
+    return [(tag, content_type, 1.0) for tag in dict.fromkeys(_parse_tags_field(values["tags"]))]
+
+
+class SuggestionIndex:
+    """
+    Sorted-array prefix index of weighted phrases. Phrases contributed by
+    several rows (a tag used on many uploads) accumulate their weights and
+    disappear when the last contributor is removed.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys: List[Tuple[str, str]] = []                      # sorted (suffix, phrase)
+        self._weights: List[float] = []                             # weight of the phrase of each key
+        self._entries: Dict[str, List[Any]] = {}                    # phrase -> [text, content type, weight, refs]
+        self._sources: Dict[Tuple[str, str], List[Phrase]] = {}    # (table, key) -> contributed phrases
+        self._popularity: Dict[str, float] = {}                     # image id -> title weight
+        self._memo: "OrderedDict[str, List[Phrase]]" = OrderedDict()  # broad prefix -> top suggestions
+        self._replay: Optional[List[Tuple[str, str, Optional[Dict[str, Any]]]]] = None
+        self.ready = False
+        self.built_at: Optional[float] = None
+
+    # ------------------ writes ------------------
+    @staticmethod
+    def _suffixes(phrase: str) -> List[str]:
+        starts = [0] + [i + 1 for i, ch in enumerate(phrase) if ch == " "]
+        return [phrase[i:] for i in starts[:SUGGEST_MAX_WORDS]]
+
+    def _forget(self, phrase: str) -> None:
+        """Drop memoized answers the phrase could appear in."""
+        if not self._memo:
+            return
+        suffixes = self._suffixes(phrase)
+        for prefix in [p for p in self._memo if any(s.startswith(p) for s in suffixes)]:
+            del self._memo[prefix]
+
+    def _add_phrase(self, text: str, content_type: str, weight: float, bulk: bool = False) -> None:
+        phrase = normalize(text)
+        if not phrase or len(phrase) > SUGGEST_MAX_LENGTH:
+            return
+        self._forget(phrase)
+        entry = self._entries.get(phrase)
+        if entry is not None:
+            entry[2] += weight
+            entry[3] += 1
+            if not bulk:
+                self._reweigh(phrase, entry[2])
+            return
+        self._entries[phrase] = [text.strip(), content_type, weight, 1]
+        if bulk:
+            return  # keys are laid out once at the end of a rebuild
+        for suffix in self._suffixes(phrase):
+            i = bisect.bisect_left(self._keys, (suffix, phrase))
+            self._keys.insert(i, (suffix, phrase))
+            self._weights.insert(i, weight)
+
+    def _reweigh(self, phrase: str, weight: float) -> None:
+        for suffix in self._suffixes(phrase):
+            i = bisect.bisect_left(self._keys, (suffix, phrase))
+            if i < len(self._keys) and self._keys[i] == (suffix, phrase):
+                self._weights[i] = weight
+
+    def _layout(self) -> None:
+        pairs = sorted(
+            ((suffix, phrase), entry[2])
+            for phrase, entry in self._entries.items()
+            for suffix in self._suffixes(phrase)
+        )
+        self._keys = [key for key, _ in pairs]
+        self._weights = [weight for _, weight in pairs]
+
+    def _remove_phrase(self, text: str, weight: float) -> None:
+        phrase = normalize(text)
+        entry = self._entries.get(phrase)
+        if entry is None:
+            return
+        self._forget(phrase)
+        entry[2] -= weight
+        entry[3] -= 1
+        if entry[3] > 0:
+            self._reweigh(phrase, entry[2])
+            return
+        del self._entries[phrase]
+        for suffix in self._suffixes(phrase):
+            i = bisect.bisect_left(self._keys, (suffix, phrase))
+            if i < len(self._keys) and self._keys[i] == (suffix, phrase):
+                del self._keys[i]
+                del self._weights[i]
+
+    def _set_source(self, table: str, key: str, phrases: Optional[List[Phrase]], bulk: bool = False) -> None:
+        """Replace the phrases contributed by one row (None removes the row)."""
+        for text, _, weight in self._sources.pop((table, key), []):
+            self._remove_phrase(text, weight)
+        if phrases:
+            self._sources[(table, key)] = phrases
+            for text, content_type, weight in phrases:
+                self._add_phrase(text, content_type, weight, bulk)
+
+    def apply(self, updates: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> None:
+        """Apply (table, key, column values) updates; values None deletes the row."""
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(updates)
+            for table, key, values in updates:
+                if values is None:
+                    self._set_source(table, key, None)
+                    continue
+                phrases = _phrases(table, values, self._popularity, key)
+                if phrases is not None:
+                    self._set_source(table, key, phrases)
+
+    def rebuild(self, rows: Iterable[Tuple[str, str, Dict[str, Any]]], popularity: Dict[str, float]) -> None:
+        """
+        Build a fresh index off to the side and swap it in. Writes applied
+        while it was building are replayed onto it before the swap.
+        """
+        with self._lock:
+            self._replay = []
+        try:
+            fresh = SuggestionIndex()
+            fresh._popularity = popularity
+            for table, key, values in rows:
+                fresh._set_source(table, key, _phrases(table, values, popularity, key), bulk=True)
+            fresh._layout()
+            with self._lock:
+                for updates in self._replay:
+                    fresh.apply(updates)
+                fresh.ready = True
+                fresh.built_at = time.time()
+                self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k not in ("_lock", "_replay")})
+        finally:
+            with self._lock:
+                self._replay = None
+
+    # ------------------ reads ------------------
+    def _lookup(self, prefix: str, limit: int) -> Tuple[List[Phrase], bool]:
+        lo = bisect.bisect_left(self._keys, (prefix,))
+        hi = bisect.bisect_left(self._keys, (prefix + "\U0010ffff",), lo)
+        if hi - lo > SUGGEST_MEMO_RUN and limit <= SUGGEST_MEMO_LIMIT:
+            # Broad prefixes (the first keystrokes) select from long runs; remember the answer
+            found = self._memo.get(prefix)
+            if found is None:
+                found = self._memo[prefix] = self._select(lo, hi, SUGGEST_MEMO_LIMIT)
+                if len(self._memo) > SUGGEST_MEMO_SIZE:
+                    self._memo.popitem(last=False)
+            else:
+                self._memo.move_to_end(prefix)
+            return found[:limit], False
+        return self._select(lo, hi, limit), hi - lo <= limit
+
+    def _select(self, lo: int, hi: int, limit: int) -> List[Phrase]:
+        # A phrase matching at two word starts has two keys in the run; over-select, then dedupe
+        found: List[Phrase] = []
+        seen = set()
+        for i in heapq.nlargest(limit * 2, range(lo, hi), key=self._weights.__getitem__):
+            phrase = self._keys[i][1]
+            if phrase not in seen and len(found) < limit:
+                seen.add(phrase)
+                text, content_type, weight, _ = self._entries[phrase]
+                found.append((text, content_type, weight))
+        return found
+
+    def suggest(self, prefix: str, limit: int = 5) -> Tuple[List[Phrase], bool]:
+        """
+        Highest-weighted phrases with a word starting with `prefix`, and whether
+        that is every match. When it is, a client can narrow the list itself
+        as the user keeps typing instead of asking again.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return [], False
+        with self._lock:
+            return self._lookup(prefix, limit)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "phrases": len(self._entries),
+                "keys": len(self._keys),
+                "built_at": self.built_at,
+            }
+
+
+def iter_suggestion_rows(db: Session) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    from app.modules.albums.models import Album
+    from app.modules.images.models import Image
+    from app.modules.uploads.models import Upload
+    from app.modules.users.models import User
+
+    for model, table, column in (
+        (Image, "images", "title"),
+        (Album, "albums", "title"),
+        (Upload, "uploads", "tags"),
+        (User, "users", "username"),
+    ):
+        for row_id, value in db.query(model.id, getattr(model, column)).yield_per(REBUILD_BATCH_SIZE):
+            yield table, str(row_id), {column: value}
+
+
+def load_popularity(db: Session) -> Dict[str, float]:
+    """Title weight of every image with counters, from image_stats."""
+    from app.modules.image_stats.models import ImageStats
+
+    return {
+        str(image_id): image_weight(likes, views)
+        for image_id, likes, views in db.query(
+            ImageStats.image_id, ImageStats.likes_count, ImageStats.views_count
+        ).yield_per(REBUILD_BATCH_SIZE)
+    }
+
+
+class SuggestionService:
+    """Owns the process-wide suggestion index: background rebuilds and commit updates."""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self.index = SuggestionIndex()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return SEARCH_SUGGEST_INDEX and self.index.ready
+
+    def rebuild(self) -> None:
+        db = self.session_factory()
+        try:
+            self.index.rebuild(iter_suggestion_rows(db), load_popularity(db))
+            log.info("Suggestion index rebuilt: %s phrases", len(self.index._entries))
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.rebuild()
+            except Exception as e:
+                log.exception("Suggestion index rebuild failed: %s", e)
+            if SEARCH_SUGGEST_REFRESH_INTERVAL <= 0 or self._stopping.wait(SEARCH_SUGGEST_REFRESH_INTERVAL):
+                return
+
+    def start(self) -> None:
+        if not SEARCH_SUGGEST_INDEX or (self._thread and self._thread.is_alive()):
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="search-suggest", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def on_commit(self, captured: List[changes.Change]) -> None:
+        updates = [
+            (change.table, change.key, None if change.op == changes.DELETE else change.data)
+            for change in captured
+            if change.table in SOURCE_TYPES
+        ]
+        if updates:
+            self.index.apply(updates)
+
+
+suggestion_service = SuggestionService()
+changes.on_commit(suggestion_service.on_commit)
@@ -1,7 +1,8 @@
 # app/modules/sitemap/sitemap.py
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
 from app.db.database import get_db
+from app.modules.cacher.snapshots import Snapshot
 from datetime import datetime, timezone
 import importlib
 from typing import List, Any, Optional
@@ -21,6 +22,9 @@ SITEMAP_SETTINGS = {
     "max_items": int(os.getenv("SITEMAP_MAX_ITEMS", "2000")),
 }
 
+# Rendered once per change to the sitemap's content, stored with .br/.gz siblings
+SITEMAP_SNAPSHOT = Snapshot("sitemap.xml", "application/xml", ("sitemap",))
+
 
 def _safe_iso(dt: Optional[datetime]) -> str:
     if not dt:
@@ -71,7 +75,12 @@ def _safe_list_query(db: Session, model, filter_expr=None, limit: int = 1000, or
 
 
 @router.get("/sitemap.xml", response_class=Response)
-def generate_sitemap(db: Session = Depends(get_db)):
+def get_sitemap(request: Request, db: Session = Depends(get_db)):
+    """Serve the sitemap snapshot, regenerating it when the content has changed."""
+    return SITEMAP_SNAPSHOT.respond(request, lambda: generate_sitemap(db).body)
+
+
+def generate_sitemap(db: Session):
     """
     Sitemap generator that includes:
       - root "/"
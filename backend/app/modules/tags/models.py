@@ -0,0 +1,34 @@
+# app/modules/tags/models.py
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, func
+
+from app.db.database import Base
+
+
+class Tag(Base):
+    """
+    One row per distinct (normalized) tag. upload_count (public uploads only)
+    is maintained incrementally alongside upload_tags and rebuilt by
+    reconcile_tag_counts().
+    """
+    __tablename__ = "tags"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(64), nullable=False, unique=True)
+    upload_count = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_tags_upload_count", "upload_count"),
+    )
+
+
+class UploadTag(Base):
+    """Upload <-> tag links. The primary key serves upload -> tags, the index tag -> uploads."""
+    __tablename__ = "upload_tags"
+
+    upload_id = Column(String(length=36), ForeignKey("uploads.id", ondelete="CASCADE"), primary_key=True)
+    tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_upload_tags_tag_upload", "tag_id", "upload_id"),
+    )
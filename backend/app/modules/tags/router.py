@@ -0,0 +1,46 @@
+# app/modules/tags/router.py
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.auth.dependencies import get_current_user
+from app.db.database import get_db
+from app.modules.tags import schemas, service
+from app.modules.users.schemas import User as UserSchema
+
+router = APIRouter(prefix="/tags", tags=["Tags"])
+
+
+@router.get("/", response_model=List[schemas.TagCount])
+def list_tags(
+    limit: int = Query(50, ge=1, le=500, description="Max number of tags"),
+    prefix: Optional[str] = Query(None, max_length=64, description="Only tags starting with this"),
+    db: Session = Depends(get_db),
+):
+    """Most used tags with their upload counts (tag cloud)"""
+    return [
+        schemas.TagCount(name=tag.name, count=tag.upload_count)
+        for tag in service.tag_counts(db, limit=limit, prefix=prefix)
+    ]
+
+
+@router.get("/{name}", response_model=schemas.TagCount)
+def get_tag(name: str, db: Session = Depends(get_db)):
+    """Upload count for one tag"""
+    tag = service.get_tag(db, name)
+    if not tag:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
+    return schemas.TagCount(name=tag.name, count=tag.upload_count)
+
+
+@router.post("/reconcile")
+def reconcile_tag_counts(
+    user: UserSchema = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Recount every tag from the upload_tags table (admin only)"""
+    if not user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    rows = service.reconcile_tag_counts(db)
+    return {"detail": "Tag counts reconciled", "rows": rows}
@@ -0,0 +1,10 @@
+# app/modules/tags/schemas.py
+from pydantic import BaseModel
+
+
+class TagCount(BaseModel):
+    name: str
+    count: int
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,213 @@
+# app/modules/tags/service.py
+import json
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import delete, func, insert, inspect, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.db import changes
+from app.modules.tags.models import Tag, UploadTag
+from app.modules.uploads import models as upload_models
+
+log = logging.getLogger("tags")
+
+MAX_TAG_LENGTH = 64
+MATCH_ALL = "all"   # uploads carrying every requested tag
+MATCH_ANY = "any"   # uploads carrying at least one of them
+
+_tags = Tag.__table__
+_links = UploadTag.__table__
+
+
+def normalize_tag(tag: Any) -> str:
+    return " ".join(str(tag).lower().split())[:MAX_TAG_LENGTH]
+
+
+def tag_names(value: Any) -> List[str]:
+    """
+    Distinct normalized tag names from a list, a JSON array string (the
+    Upload.tags column) or a comma-separated string, in first-seen order.
+    """
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            parsed = json.loads(value) if value else []
+        except ValueError:
+            parsed = value.split(",")
+        value = parsed if isinstance(parsed, list) else [parsed]
+    names = (normalize_tag(tag) for tag in value if tag is not None)
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def _ensure_tags(conn: Connection, names: List[str]) -> Dict[str, int]:
+    """{name: id} for the given names, creating the tags that do not exist yet."""
+    ids = dict(conn.execute(select(_tags.c.name, _tags.c.id).where(_tags.c.name.in_(names))).all())
+    missing = [name for name in names if name not in ids]
+    if missing:
+        rows = [{"name": name} for name in missing]
+        if conn.dialect.name == "postgresql":
+            conn.execute(pg_insert(_tags).values(rows).on_conflict_do_nothing(index_elements=["name"]))
+        else:
+            conn.execute(insert(_tags), rows)
+        ids.update(conn.execute(select(_tags.c.name, _tags.c.id).where(_tags.c.name.in_(missing))).all())
+    return ids
+
+
+def _linked_names(conn: Connection, upload_id: str) -> Set[str]:
+    return set(conn.execute(
+        select(_tags.c.name)
+        .join(_links, _links.c.tag_id == _tags.c.id)
+        .where(_links.c.upload_id == upload_id)
+    ).scalars())
+
+
+def _bump_counts(conn: Connection, names: Set[str], delta: int) -> None:
+    if names:
+        conn.execute(
+            update(_tags).where(_tags.c.name.in_(list(names))).values(upload_count=_tags.c.upload_count + delta)
+        )
+
+
+def _is_public(privacy: Any) -> bool:
+    return privacy == "public"
+
+
+def set_upload_tags(
+    conn: Connection,
+    upload_id: str,
+    names: List[str],
+    previous: Optional[Set[str]] = None,
+    was_public: bool = True,
+    is_public: bool = True,
+) -> None:
+    """
+    Make upload_tags match `names` for one upload and adjust the tag counts.
+    `previous` is the currently linked set, when the caller already knows it.
+    Every upload is linked, but only public ones are counted: `was_public`
+    and `is_public` give its visibility before and after the write.
+    """
+    if previous is None:
+        previous = _linked_names(conn, upload_id)
+    wanted = set(names)
+    added = [name for name in names if name not in previous]
+    removed = list(previous - wanted)
+    if added:
+        ids = _ensure_tags(conn, added)
+        conn.execute(insert(_links), [{"upload_id": upload_id, "tag_id": ids[name]} for name in added])
+    if removed:
+        ids = list(conn.execute(select(_tags.c.id).where(_tags.c.name.in_(removed))).scalars())
+        conn.execute(delete(_links).where(_links.c.upload_id == upload_id, _links.c.tag_id.in_(ids)))
+
+    counted_before = previous if was_public else set()
+    counted_after = wanted if is_public else set()
+    _bump_counts(conn, counted_before - counted_after, -1)
+    _bump_counts(conn, counted_after - counted_before, 1)
+
+
+def _column_value(change: changes.Change, name: str) -> Any:
+    if name in change.data:
+        return change.data[name]
+    return inspect(change.obj).dict.get(name) if change.obj is not None else None
+
+
+@changes.on_flush
+def sync_upload_tags(session: Session, captured: List[changes.Change]) -> None:
+    """
+    Mirror Upload.tags (the JSON column the write paths set) into upload_tags
+    inside the same transaction, so tag filters and counts never drift from it.
+    Counts only include public uploads, so a privacy change adjusts them too.
+    """
+    conn = None
+    for change in captured:
+        if change.table != upload_models.Upload.__tablename__:
+            continue
+        conn = conn or session.connection()
+        names = tag_names(_column_value(change, "tags"))
+        public = _is_public(_column_value(change, "privacy"))
+        if change.op == changes.INSERT:
+            set_upload_tags(conn, change.key, names, previous=set(), was_public=False, is_public=public)
+        elif change.op == changes.UPDATE:
+            was_public = public
+            if change.obj is not None:
+                attrs = inspect(change.obj).attrs
+                privacy = attrs.privacy.history
+                if not attrs.tags.history.has_changes() and not privacy.has_changes():
+                    continue
+                if privacy.deleted:
+                    was_public = _is_public(privacy.deleted[0])
+            set_upload_tags(conn, change.key, names, was_public=was_public, is_public=public)
+        else:
+            # The links may already be gone through ON DELETE CASCADE; count from the row itself
+            conn.execute(delete(_links).where(_links.c.upload_id == change.key))
+            if public:
+                _bump_counts(conn, set(names), -1)
+
+
+def filter_uploads(
+    db: Session,
+    tags: List[str],
+    match: str = MATCH_ALL,
+    skip: int = 0,
+    limit: int = 100,
+) -> List[upload_models.Upload]:
+    """
+    Public uploads carrying all (or any) of the tags, newest first. Resolved
+    through the tag name index and the (tag_id, upload_id) index of upload_tags.
+    """
+    names = tag_names(tags)
+    if not names:
+        return []
+    matched = (
+        select(UploadTag.upload_id)
+        .join(Tag, Tag.id == UploadTag.tag_id)
+        .where(Tag.name.in_(names))
+        .group_by(UploadTag.upload_id)
+    )
+    if match == MATCH_ALL:
+        matched = matched.having(func.count() == len(names))
+    Upload = upload_models.Upload
+    return (
+        db.query(Upload)
+        .filter(Upload.id.in_(matched), Upload.privacy == "public")
+        .order_by(Upload.uploaded_at.desc(), Upload.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+
+def tag_counts(db: Session, limit: int = 50, prefix: Optional[str] = None) -> List[Tag]:
+    """Most used tags with their public upload counts, for tag clouds."""
+    q = db.query(Tag).filter(Tag.upload_count > 0)
+    if prefix:
+        q = q.filter(Tag.name.like(f"{normalize_tag(prefix)}%"))
+    return q.order_by(Tag.upload_count.desc(), Tag.name).limit(limit).all()
+
+
+def get_tag(db: Session, name: str) -> Optional[Tag]:
+    return db.query(Tag).filter(Tag.name == normalize_tag(name)).first()
+
+
+def reconcile_tag_counts(db: Session) -> int:
+    """Recount upload_count (public uploads only) for every tag from upload_tags. Returns the number of tags."""
+    uploads = upload_models.Upload.__table__
+    counted = (
+        select(func.count())
+        .select_from(_links.join(uploads, uploads.c.id == _links.c.upload_id))
+        .where(_links.c.tag_id == _tags.c.id, uploads.c.privacy == "public")
+        .correlate(_tags)
+        .scalar_subquery()
+    )
+    try:
+        result = db.execute(update(_tags).values(upload_count=counted))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    log.info("Reconciled tag counts: %s tags", result.rowcount)
+    return result.rowcount
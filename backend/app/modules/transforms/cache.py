@@ -0,0 +1,246 @@
+# app/modules/transforms/cache.py
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: a single worker process is assumed
+    fcntl = None
+
+log = logging.getLogger("transforms")
+
+
+class DerivativeCache:
+    """
+    Size-bounded on-disk cache of generated image renditions, shared by every
+    worker process that uses the same `cache_dir`.
+
+    index.json is the shared record of the entries and when each was last
+    used. Every change to it (a new rendition, an eviction, an invalidation)
+    is made under an exclusive flock() on index.lock after re-reading it, so
+    workers never drop each other's entries and eviction keeps the directory
+    as a whole under `max_bytes`. Lookups use an in-memory copy that is
+    reloaded when index.json changes; hits are recorded locally and merged
+    into the shared LRU order with this worker's next write. A file removed
+    by another worker since the copy was loaded is treated as a miss.
+    Concurrent misses for the same key within a worker are collapsed: one
+    caller produces the rendition, the others wait for its result.
+    """
+
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "index.lock"
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # flock() does not exclude threads sharing a process
+        self._entries: Dict[str, Dict] = {}
+        self._index_mtime: Optional[int] = None
+        self._touched: Dict[str, float] = {}
+        self._inflight: Dict[str, Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._reload()
+
+    # ------------------ shared index ------------------
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, self.INDEX_FILE)
+
+    def _read_index(self) -> Dict[str, Dict]:
+        try:
+            with open(self._index_path()) as f:
+                items = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return dict(items)
+
+    def _write_index(self, entries: Dict[str, Dict]) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".temp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(list(entries.items()), f)
+            os.replace(tmp, self._index_path())
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self._index_path()).st_mtime_ns
+        except OSError:
+            return None
+
+    def _reload(self) -> None:
+        mtime = self._mtime()
+        entries = self._read_index()
+        with self._lock:
+            self._entries = entries
+            self._index_mtime = mtime
+
+    @contextmanager
+    def _exclusive(self):
+        with self._write_lock:
+            if fcntl is None:
+                yield
+                return
+            fd = os.open(os.path.join(self.cache_dir, self.LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def _update(self, change: Callable[[Dict[str, Dict]], List[Dict]]) -> None:
+        """
+        Apply change(entries) to the current shared index, merge this worker's
+        hits, evict past max_bytes and write it back, all under the lock.
+        change() returns the entries it removed; their files are deleted too.
+        """
+        with self._exclusive():
+            entries = self._read_index()
+            with self._lock:
+                touched, self._touched = self._touched, {}
+            for key, used in touched.items():
+                if key in entries:
+                    entries[key]["used"] = max(entries[key].get("used", 0), used)
+            removed = change(entries)
+            evicted = self._evict(entries)
+            self._write_index(entries)
+            self._remove_files(removed + evicted)
+            mtime = self._mtime()
+        with self._lock:
+            self._entries = entries
+            self._index_mtime = mtime
+            self.evictions += len(evicted)
+
+    def _evict(self, entries: Dict[str, Dict]) -> List[Dict]:
+        total = sum(entry["size"] for entry in entries.values())
+        evicted = []
+        for key in sorted(entries, key=lambda k: entries[k].get("used", 0)):
+            if total <= self.max_bytes:
+                break
+            entry = entries.pop(key)
+            total -= entry["size"]
+            evicted.append(entry)
+        return evicted
+
+    def _remove_files(self, entries: List[Dict]) -> None:
+        for entry in entries:
+            try:
+                os.remove(self.path_for(entry))
+            except FileNotFoundError:
+                pass
+
+    def save(self) -> None:
+        """Merge the hits recorded by this worker into the shared index."""
+        with self._lock:
+            if not self._touched:
+                return
+        try:
+            self._update(lambda entries: [])
+        except OSError as e:
+            log.warning("Failed to save transform cache index: %s", e)
+
+    # ------------------ entries ------------------
+    def path_for(self, entry: Dict) -> str:
+        return os.path.join(self.cache_dir, entry["file"])
+
+    def get(self, key: str) -> Optional[Dict]:
+        if self._mtime() != self._index_mtime:
+            self._reload()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or not os.path.exists(self.path_for(entry)):
+            return None
+        with self._lock:
+            self._touched[key] = time.time()
+        return entry
+
+    def put(self, key: str, data: bytes, entry: Dict) -> Dict:
+        """Store `data` under `key`. `entry` must contain a unique "file" name."""
+        entry = {**entry, "size": len(data), "used": time.time()}
+        path = self.path_for(entry)
+
+        def store(entries):
+            # Written under the lock, so no other worker can evict the file in between
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".temp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            old = entries.pop(key, None)
+            entries[key] = entry
+            return [old] if old and old["file"] != entry["file"] else []
+
+        self._update(store)
+        return entry
+
+    def get_or_create(self, key: str, producer: Callable[[], Tuple[bytes, Dict]]) -> Dict:
+        """
+        Return the cached entry for `key`, calling producer() at most once per
+        key across concurrent callers in this worker. producer returns (data, entry).
+        """
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            return future.result()
+
+        self.misses += 1
+        try:
+            data, entry = producer()
+            entry = self.put(key, data, entry)
+            future.set_result(entry)
+            return entry
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def invalidate(self, predicate: Callable[[Dict], bool]) -> int:
+        """Drop every entry whose metadata matches predicate. Returns the count."""
+        removed: List[Dict] = []
+
+        def drop(entries):
+            for key in [key for key, entry in entries.items() if predicate(entry)]:
+                removed.append(entries.pop(key))
+            return list(removed)
+
+        self._update(drop)
+        return len(removed)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(entry["size"] for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,45 @@
+# app/modules/transforms/router.py
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from app.db.database import get_db
+from app.modules.cacher.service import etag_matches
+from app.modules.transforms import service
+
+router = APIRouter(prefix="/img", tags=["Image Transforms"])
+transform_service = service.TransformService()
+
+
+@router.get("/cache/stats")
+def transform_cache_stats():
+    return transform_service.cache.stats()
+
+
+@router.get("/{upload_id}")
+def get_transformed_image(
+    upload_id: str,
+    request: Request,
+    w: Optional[int] = Query(None, ge=service.TRANSFORM_MIN_WIDTH, le=service.TRANSFORM_MAX_WIDTH, description="Target width in px (never upscales)"),
+    fmt: str = Query("auto", regex="^(auto|jpeg|webp|avif|png)$", description="Output format; auto picks AVIF/WebP from Accept"),
+    q: int = Query(80, ge=1, le=100, description="Encoder quality"),
+    db: Session = Depends(get_db),
+):
+    """
+    Serve a resized/re-encoded rendition of an upload, e.g. /img/{id}?w=640&fmt=webp&q=80.
+    Renditions are generated on first request and served from the disk cache afterwards.
+    """
+    resolved = service.negotiate_format(fmt, request.headers.get("accept"))
+    path, entry = transform_service.get_rendition(db, upload_id, w, resolved, q)
+
+    headers = {
+        "ETag": entry["etag"],
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if fmt == "auto":
+        headers["Vary"] = "Accept"
+
+    if etag_matches(request, entry["etag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(path, media_type=entry["media_type"], headers=headers)
@@ -0,0 +1,97 @@
+# app/modules/transforms/service.py
+import hashlib
+import os
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.modules.uploads.derivatives import available_formats, downscale, PIL_FORMATS
+from app.modules.uploads.service import UploadService
+from app.modules.transforms.cache import DerivativeCache
+
+# Configuration via environment variables (fallbacks)
+TRANSFORM_CACHE_DIR = os.getenv("TRANSFORM_CACHE_DIR", os.path.join(os.getcwd(), "transform_cache"))
+TRANSFORM_CACHE_MAX_BYTES = int(os.getenv("TRANSFORM_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))  # 1 GiB
+TRANSFORM_MIN_WIDTH = 16
+TRANSFORM_MAX_WIDTH = int(os.getenv("TRANSFORM_MAX_WIDTH", "4096"))
+
+MEDIA_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "avif": "image/avif", "png": "image/png"}
+
+derivative_cache = DerivativeCache(TRANSFORM_CACHE_DIR, TRANSFORM_CACHE_MAX_BYTES)
+
+
+def negotiate_format(fmt: str, accept: Optional[str]) -> str:
+    """
+    Resolve fmt="auto" from the Accept header (AVIF > WebP > JPEG) and reject
+    formats this server cannot encode.
+    """
+    encodable = set(available_formats(["avif", "webp"])) | {"jpeg", "png"}
+    if fmt == "auto":
+        accept = accept or ""
+        for candidate in ("avif", "webp"):
+            if f"image/{candidate}" in accept and candidate in encodable:
+                return candidate
+        return "jpeg"
+    if fmt not in encodable:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported format: {fmt}")
+    return fmt
+
+
+def _render(source_path: str, width: Optional[int], fmt: str, quality: int) -> bytes:
+    """Decode (at reduced JPEG scale when possible), resize and encode one rendition."""
+    with Image.open(source_path) as im:
+        if width:
+            im.draft("RGB", (width, max(1, round(im.height * width / im.width))))
+        im.load()
+        if width:
+            im = downscale(im, width)
+        if fmt == "jpeg" and im.mode != "RGB":
+            im = im.convert("RGB")
+        elif im.mode not in ("RGB", "RGBA", "L", "LA"):
+            im = im.convert("RGBA")
+        out = BytesIO()
+        im.save(out, format=PIL_FORMATS[fmt], quality=quality)
+        return out.getvalue()
+
+
+class TransformService:
+    def __init__(self, cache: DerivativeCache = derivative_cache):
+        self.cache = cache
+        self.uploads = UploadService()
+
+    @staticmethod
+    def cache_key(upload_id: str, width: Optional[int], fmt: str, quality: int) -> str:
+        # Upload files are never rewritten in place, so the id identifies the bytes
+        return f"{upload_id}:w{width or 0}:q{quality}:{fmt}"
+
+    def get_rendition(
+        self, db: Session, upload_id: str, width: Optional[int], fmt: str, quality: int
+    ) -> Tuple[str, Dict]:
+        """
+        Return (file path, cache entry) for the requested rendition, generating
+        it on first request. Cache hits do not touch the database.
+        """
+        key = self.cache_key(upload_id, width, fmt, quality)
+
+        def produce():
+            upload = self.uploads.get_upload(db, upload_id)
+            if not upload or not upload.storage_path or not os.path.exists(upload.storage_path):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+            data = _render(upload.storage_path, width, fmt, quality)
+            digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+            return data, {
+                "file": f"{hashlib.sha1(key.encode()).hexdigest()}.{fmt}",
+                "upload_id": upload_id,
+                "etag": f'"{digest}"',
+                "media_type": MEDIA_TYPES[fmt],
+            }
+
+        entry = self.cache.get_or_create(key, produce)
+        return self.cache.path_for(entry), entry
+
+    def invalidate_upload(self, upload_id: str) -> int:
+        """Drop every cached rendition of an upload (e.g. after it is deleted)."""
+        return self.cache.invalidate(lambda entry: entry.get("upload_id") == upload_id)
@@ -0,0 +1,316 @@
+# app/modules/uploads/batch.py
+import json
+import logging
+import os
+import tarfile
+import uuid
+import zipfile
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db import changes
+from app.modules.uploads import models
+from app.modules.uploads.derivatives import compute_derivatives
+from app.modules.uploads.ingest import ingest_fileobj
+from app.modules.uploads.queue import get_pool
+from app.modules.uploads.service import BASE_URL, UploadService, blob_filename
+from app.modules.uploads.tasks import derivative_fields, derivative_key
+
+log = logging.getLogger("uploads")
+
+# Configuration via environment variables (fallbacks)
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+
+
+def _archive_members(archive: BinaryIO) -> Iterator[Tuple[str, BinaryIO]]:
+    """
+    Yield (name, fileobj) for every regular file in a zip or tar archive,
+    skipping directories and macOS/hidden metadata. Members are read lazily.
+    """
+    if zipfile.is_zipfile(archive):
+        archive.seek(0)
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not name or name.startswith(".") or info.filename.startswith("__MACOSX/"):
+                    continue
+                with zf.open(info) as member:
+                    yield info.filename, member
+        return
+
+    archive.seek(0)
+    try:
+        tf = tarfile.open(fileobj=archive, mode="r|*")
+    except tarfile.TarError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Archive must be a zip or tar file")
+    with tf:
+        for info in tf:
+            name = os.path.basename(info.name)
+            if not info.isfile() or not name or name.startswith("."):
+                continue
+            member = tf.extractfile(info)
+            if member is not None:
+                yield info.name, member
+
+
+class BatchUploadService:
+    """
+    Import many files in one request.
+
+    Files (or the members of a zip/tar archive) are streamed to disk and
+    hashed one after another, the decode/EXIF/thumbnail/rendition work for
+    every new content hash is fanned out over the derivatives process pool,
+    and all Upload rows are written with one bulk INSERT and one commit.
+    Rows are created ready, so nothing is left for the background worker.
+    """
+
+    def __init__(self):
+        self.upload_service = UploadService()
+        self.upload_dir = self.upload_service.upload_dir
+
+    def _ingest_all(self, sources: Iterator[Tuple[str, BinaryIO]], items: List[Dict[str, Any]]) -> None:
+        for name, fileobj in sources:
+            if len(items) >= BATCH_MAX_FILES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"A batch may contain at most {BATCH_MAX_FILES} files",
+                )
+            item = {"filename": name, "ingested": None, "error": None}
+            try:
+                item["ingested"] = ingest_fileobj(fileobj, self.upload_dir)
+            except HTTPException as e:
+                item["error"] = e.detail
+            items.append(item)
+
+    def _compute(self, new_blobs: Dict[str, Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+        """Run compute_derivatives for {content_hash: (source_path, blob filename)} on the process pool."""
+        pool = get_pool()
+        futures = {
+            content_hash: pool.submit(
+                compute_derivatives,
+                source_path,
+                self.upload_service.thumb_dir,
+                derivative_key(filename),
+                self.upload_service.rendition_dir,
+            )
+            for content_hash, (source_path, filename) in new_blobs.items()
+        }
+        results = {}
+        for content_hash, future in futures.items():
+            try:
+                results[content_hash] = future.result()
+            except Exception as e:
+                log.warning("Derivative generation failed for blob %s: %s", content_hash, e)
+                results[content_hash] = {"error": str(e)}
+        return results
+
+    def _discard_derivatives(self, results: Dict[str, Dict[str, Any]]) -> None:
+        """Remove the thumbnails and renditions _compute() wrote for blobs that were not stored."""
+        for result in results.values():
+            paths = [os.path.join(self.upload_service.rendition_dir, r["name"]) for r in result.get("renditions") or []]
+            if result.get("thumbnail_name"):
+                paths.append(os.path.join(self.upload_service.thumb_dir, result["thumbnail_name"]))
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _reserve_blobs(
+        self,
+        db: Session,
+        ingested: Dict[str, Dict[str, Any]],
+        counts: Dict[str, int],
+        names: Dict[str, str],
+    ) -> Tuple[Dict[str, models.UploadBlob], Dict[str, bool]]:
+        """
+        Take the references for this batch: bump existing blobs (locked) and
+        insert the new ones, stored under the file names picked in `names`.
+        Returns ({content_hash: blob}, {content_hash: created}).
+        """
+        existing = {
+            blob.content_hash: blob
+            for blob in db.query(models.UploadBlob)
+            .filter(models.UploadBlob.content_hash.in_(list(ingested)))
+            .with_for_update()
+        }
+        blobs, created = {}, {}
+        for content_hash, first in ingested.items():
+            blob = existing.get(content_hash)
+            if blob is None:
+                filename = names.get(content_hash) or blob_filename(content_hash, first["ext"])
+                blob = models.UploadBlob(
+                    content_hash=content_hash,
+                    filename=filename,
+                    storage_path=os.path.join(self.upload_dir, filename),
+                    content_type=first["content_type"],
+                    size_bytes=first["size_bytes"],
+                    ref_count=counts[content_hash],
+                )
+                try:
+                    with db.begin_nested():
+                        db.add(blob)
+                    blobs[content_hash] = blob
+                    created[content_hash] = True
+                    continue
+                except IntegrityError:
+                    # Stored by a concurrent upload in the meantime
+                    blob = (
+                        db.query(models.UploadBlob)
+                        .filter(models.UploadBlob.content_hash == content_hash)
+                        .with_for_update()
+                        .one()
+                    )
+            blob.ref_count += counts[content_hash]
+            blobs[content_hash] = blob
+            created[content_hash] = False
+        return blobs, created
+
+    def create_batch(
+        self,
+        db: Session,
+        files: List[UploadFile],
+        archive: Optional[UploadFile] = None,
+        uploader_id: Optional[str] = None,
+        description: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        privacy: Optional[str] = "public",
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns one result per input file, in input order:
+        {"filename", "status": created|duplicate|error, "upload", "error"}.
+        """
+        items: List[Dict[str, Any]] = []
+        try:
+            self._ingest_all(((f.filename or "", f.file) for f in files or []), items)
+            if archive is not None:
+                self._ingest_all(_archive_members(archive.file), items)
+        except Exception:
+            for item in items:
+                if item["ingested"] and os.path.exists(item["ingested"]["temp_path"]):
+                    os.remove(item["ingested"]["temp_path"])
+            raise
+        if not items:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No files in batch")
+
+        ok = [item for item in items if item["ingested"]]
+        first_by_hash: Dict[str, Dict[str, Any]] = {}
+        counts: Dict[str, int] = {}
+        for item in ok:
+            content_hash = item["ingested"]["content_hash"]
+            first_by_hash.setdefault(content_hash, item["ingested"])
+            counts[content_hash] = counts.get(content_hash, 0) + 1
+
+        moved = []
+        results: Dict[str, Dict[str, Any]] = {}
+        try:
+            # Pillow work happens before any row is locked
+            known = {
+                content_hash for (content_hash,) in db.query(models.UploadBlob.content_hash)
+                .filter(models.UploadBlob.content_hash.in_(list(first_by_hash)))
+            }
+            names = {
+                content_hash: blob_filename(content_hash, ingested["ext"])
+                for content_hash, ingested in first_by_hash.items()
+                if content_hash not in known
+            }
+            results = self._compute({
+                content_hash: (first_by_hash[content_hash]["temp_path"], filename)
+                for content_hash, filename in names.items()
+            })
+
+            blobs, created = self._reserve_blobs(db, first_by_hash, counts, names)
+            # Blobs stored by a concurrent upload in the meantime keep their own derivatives
+            self._discard_derivatives({
+                content_hash: result for content_hash, result in results.items() if not created[content_hash]
+            })
+
+            # Duplicates of content stored before this batch copy its derivatives
+            reused = [content_hash for content_hash, is_new in created.items() if not is_new]
+            inherited = {}
+            if reused:
+                # One sibling per hash; GROUP BY rather than DISTINCT ON, which is Postgres-only
+                sibling_ids = (
+                    select(func.min(models.Upload.id))
+                    .where(models.Upload.content_hash.in_(reused))
+                    .group_by(models.Upload.content_hash)
+                )
+                for sibling in db.query(models.Upload).filter(models.Upload.id.in_(sibling_ids)):
+                    inherited[sibling.content_hash] = {
+                        name: getattr(sibling, name) for name in UploadService.DERIVED_FIELDS
+                    }
+
+            rows = []
+            seen = set()
+            for item in ok:
+                ingested = item["ingested"]
+                content_hash = ingested["content_hash"]
+                blob = blobs[content_hash]
+                if created[content_hash]:
+                    fields = derivative_fields(results.get(content_hash, {"error": "not processed"}))
+                else:
+                    fields = inherited.get(content_hash, {"processing_status": models.PROCESSING_PENDING})
+                item["status"] = "created" if created[content_hash] and content_hash not in seen else "duplicate"
+                seen.add(content_hash)
+
+                upload_id = str(uuid.uuid4())
+                item["upload_id"] = upload_id
+                rows.append({
+                    "id": upload_id,
+                    "filename": blob.filename,
+                    "storage_path": blob.storage_path,
+                    "url": f"{BASE_URL}/static/uploads/{blob.filename}",
+                    "thumbnail_url": None,
+                    "content_type": blob.content_type,
+                    "size_bytes": ingested["size_bytes"],
+                    "content_hash": content_hash,
+                    "uploader_id": uploader_id,
+                    "description": description,
+                    "tags": json.dumps(tags or []),
+                    "exif": json.dumps({}),
+                    "privacy": privacy or "public",
+                    **fields,
+                })
+
+            uploads = {}
+            if rows:
+                db.execute(insert(models.Upload), rows)
+                uploads = {
+                    upload.id: upload
+                    for upload in db.query(models.Upload).filter(
+                        models.Upload.id.in_([row["id"] for row in rows])
+                    )
+                }
+                # The bulk insert bypasses the unit of work; report it to change capture
+                changes.publish(db, [changes.snapshot(upload, changes.INSERT) for upload in uploads.values()])
+
+            # Move each new original into place before the rows become visible
+            for content_hash, is_new in created.items():
+                if is_new:
+                    dest_path = blobs[content_hash].storage_path
+                    os.replace(first_by_hash[content_hash]["temp_path"], dest_path)
+                    moved.append(dest_path)
+            db.commit()
+        except Exception:
+            db.rollback()
+            for path in moved:
+                if os.path.exists(path):
+                    os.remove(path)
+            self._discard_derivatives(results)
+            raise
+        finally:
+            for item in ok:
+                if os.path.exists(item["ingested"]["temp_path"]):
+                    os.remove(item["ingested"]["temp_path"])
+
+        return [
+            {
+                "filename": item["filename"],
+                "status": item.get("status", "error"),
+                "upload": uploads.get(item.get("upload_id")),
+                "error": item["error"],
+            }
+            for item in items
+        ]
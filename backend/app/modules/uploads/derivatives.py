@@ -0,0 +1,247 @@
+# app/modules/uploads/derivatives.py
+"""
+Pure image-processing helpers for upload derivatives.
+
+Nothing here touches the database or app settings, so these functions can run
+in worker processes (local process pool or RQ worker) without importing the app.
+"""
+import json
+import math
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from PIL import Image, ExifTags
+
+try:  # AVIF support for Pillow < 11.2 comes from the optional pillow-avif-plugin
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+THUMBNAIL_SIZE = (300, 300)  # px
+
+# Rendition ladder (override with env vars)
+RENDITION_WIDTHS = sorted(
+    {int(w) for w in os.getenv("RENDITION_WIDTHS", "160,320,640,1280,2048").split(",") if w.strip()},
+    reverse=True,
+)
+RENDITION_FORMATS = [f.strip().lower() for f in os.getenv("RENDITION_FORMATS", "webp,avif").split(",") if f.strip()]
+RENDITION_QUALITY = {"webp": 80, "avif": 60, "jpeg": 82}
+PIL_FORMATS = {"webp": "WEBP", "avif": "AVIF", "jpeg": "JPEG", "png": "PNG"}
+
+# Vendor blobs and binary fields that bloat the stored raw EXIF without being readable
+RAW_EXIF_SKIP = {"MakerNote", "UserComment", "PrintImageMatching", "ComponentsConfiguration", "FileSource", "SceneType"}
+RAW_EXIF_MAX_VALUE = 256  # longer (stringified) values are dropped from the raw EXIF
+
+
+def read_exif(pil_image: Image.Image) -> Dict[str, Any]:
+    """
+    EXIF of a Pillow Image keyed by tag name, with values as Pillow returns
+    them (rationals, tuples, the GPSInfo dict).
+    """
+    try:
+        raw_exif = pil_image._getexif()
+    except Exception:
+        return {}
+    return {ExifTags.TAGS.get(tag_id, tag_id): value for tag_id, value in (raw_exif or {}).items()}
+
+
+def serializable_exif(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    JSON-safe copy of raw EXIF for storage: binary and vendor fields dropped,
+    other values stringified when needed and skipped when they are huge.
+    """
+    exif_data = {}
+    for tag, value in raw.items():
+        if tag in RAW_EXIF_SKIP or isinstance(value, bytes):
+            continue
+        try:
+            json.dumps(value)
+        except Exception:
+            value = str(value)
+        if isinstance(value, str) and len(value) > RAW_EXIF_MAX_VALUE:
+            continue
+        exif_data[str(tag)] = value
+    return exif_data
+
+
+def extract_exif(pil_image: Image.Image) -> Dict[str, Any]:
+    """
+    Extract EXIF from Pillow Image and return dictionary with human keys.
+    """
+    return serializable_exif(read_exif(pil_image))
+
+
+def _text(value: Any, max_length: int) -> Optional[str]:
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "ignore")
+    if not isinstance(value, str):
+        return None
+    value = value.replace("\x00", "").strip()
+    return value[:max_length] or None
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    try:
+        number = float(value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _degrees(value: Any, ref: Any) -> Optional[float]:
+    """GPS (degrees, minutes, seconds) rationals to signed decimal degrees."""
+    try:
+        d, m, s = (float(v) for v in value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    degrees = d + m / 60 + s / 3600
+    if isinstance(ref, bytes):
+        ref = ref.decode("ascii", "ignore")
+    if ref in ("S", "W"):
+        degrees = -degrees
+    return degrees if math.isfinite(degrees) else None
+
+
+def _taken_at(value: Any) -> Optional[datetime]:
+    value = _text(value, 32)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value[:19], "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def curate_exif(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The typed EXIF subset stored in indexed Upload columns: camera, lens,
+    exposure settings, capture time (camera local time, no zone) and GPS
+    position. Missing or malformed values are None.
+    """
+    gps = raw.get("GPSInfo")
+    gps = {ExifTags.GPSTAGS.get(k, k): v for k, v in gps.items()} if isinstance(gps, dict) else {}
+    iso = _number(raw.get("ISOSpeedRatings", raw.get("PhotographicSensitivity")))
+    lat = _degrees(gps.get("GPSLatitude"), gps.get("GPSLatitudeRef"))
+    lon = _degrees(gps.get("GPSLongitude"), gps.get("GPSLongitudeRef"))
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180) or (lat == 0 and lon == 0):
+        lat = lon = None
+    return {
+        "camera_make": _text(raw.get("Make"), 64),
+        "camera_model": _text(raw.get("Model"), 128),
+        "lens_model": _text(raw.get("LensModel"), 128),
+        "focal_length": _number(raw.get("FocalLength")),
+        "aperture": _number(raw.get("FNumber")),
+        "exposure_time": _number(raw.get("ExposureTime")),
+        "iso": int(iso) if iso is not None else None,
+        "taken_at": _taken_at(raw.get("DateTimeOriginal") or raw.get("DateTime")),
+        "gps_lat": lat,
+        "gps_lon": lon,
+    }
+
+
+def make_thumbnail(pil_image: Image.Image, thumb_path: str) -> None:
+    """
+    Create a thumbnail and save to thumb_path.
+    """
+    im = pil_image.copy()
+    im.thumbnail(THUMBNAIL_SIZE)
+    if im.mode not in ("RGB", "L"):
+        im = im.convert("RGB")
+    im.save(thumb_path, format="JPEG", quality=85)
+
+
+def available_formats(formats: List[str] = RENDITION_FORMATS) -> List[str]:
+    """
+    Keep only the rendition formats this Pillow build can encode.
+    JPEG is used when none of the requested formats is available.
+    """
+    Image.init()  # Image.SAVE only lists the preinit plugins until init() runs
+    supported = [f for f in formats if PIL_FORMATS.get(f) in Image.SAVE]
+    return supported or ["jpeg"]
+
+
+def downscale(im: Image.Image, width: int) -> Image.Image:
+    """
+    Shrink an image to `width` px wide: halve with reduce() (cheap box filter)
+    while the image is at least twice the target, then finish with one LANCZOS
+    resize. Returns the input unchanged if it is not wider than `width`.
+    """
+    if im.width <= width:
+        return im
+    while im.width // 2 >= width:
+        im = im.reduce(2)
+    height = max(1, round(im.height * width / im.width))
+    return im.resize((width, height), Image.LANCZOS)
+
+
+def make_renditions(im: Image.Image, out_dir: str, key: str, original_width: int) -> List[Dict[str, Any]]:
+    """
+    Write the rendition ladder for an already decoded image.
+
+    Widths are processed largest first and each rendition is derived from the
+    previous one, so every step starts from the smallest image available.
+    Widths larger than the original are skipped; if the original is smaller
+    than the whole ladder, one rendition at its own width is written.
+    """
+    widths = [w for w in RENDITION_WIDTHS if w < original_width] or [original_width]
+    formats = available_formats()
+
+    if im.mode not in ("RGB", "RGBA"):
+        im = im.convert("RGBA" if "transparency" in im.info or im.mode in ("LA", "PA") else "RGB")
+
+    renditions = []
+    current = im
+    for width in widths:
+        current = downscale(current, width)
+        for fmt in formats:
+            out = current.convert("RGB") if fmt == "jpeg" and current.mode != "RGB" else current
+            name = f"{key}_{width}.{fmt}"
+            out.save(os.path.join(out_dir, name), format=PIL_FORMATS[fmt], quality=RENDITION_QUALITY[fmt])
+            renditions.append({
+                "width": out.width,
+                "height": out.height,
+                "format": fmt,
+                "name": name,
+            })
+    return renditions
+
+
+def compute_derivatives(source_path: str, thumb_dir: str, key: str, rendition_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Decode the original once and produce everything derived from it.
+
+    For JPEGs, Image.draft() lets libjpeg decode straight to the smallest DCT
+    scale that still covers the largest rendition. Returns a dict with width,
+    height, exif (raw, JSON-safe), exif_fields (curated, see curate_exif),
+    thumbnail_name (written to thumb_dir) and renditions (written to
+    rendition_dir), or {"error": "..."} if the file cannot be decoded.
+    """
+    try:
+        with Image.open(source_path) as im:
+            width, height = im.size
+            raw_exif = read_exif(im)
+            exif_data = serializable_exif(raw_exif)
+            exif_fields = curate_exif(raw_exif)
+
+            if rendition_dir and RENDITION_WIDTHS:
+                target = min(RENDITION_WIDTHS[0], width)
+                im.draft("RGB", (target, max(1, round(height * target / width))))
+            im.load()
+
+            thumb_name = f"{key}_thumb.jpg"
+            make_thumbnail(im, os.path.join(thumb_dir, thumb_name))
+            renditions = make_renditions(im, rendition_dir, key, width) if rendition_dir else []
+    except Exception as e:
+        return {"error": str(e)}
+
+    return {
+        "width": width,
+        "height": height,
+        "exif": exif_data,
+        "exif_fields": exif_fields,
+        "thumbnail_name": thumb_name,
+        "renditions": renditions,
+    }
@@ -0,0 +1,240 @@
+# app/modules/uploads/ingest.py
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+import multipart
+from multipart.multipart import parse_options_header
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+
+# Configuration via environment variables (fallbacks)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))  # 100 MiB
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", str(1024 * 1024)))  # 1 MiB
+
+SNIFF_BYTES = 32
+MAX_FORM_FIELD_BYTES = 64 * 1024  # total size of the non-file fields of a multipart upload
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # allowance for boundaries, part headers and fields in Content-Length checks
+
+
+def sniff_format(head: bytes) -> Optional[Tuple[str, str]]:
+    """
+    Identify an image from its first bytes. Returns (content_type, extension)
+    or None for anything that is not a supported image.
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg", ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png", ".png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif", ".gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "image/tiff", ".tiff"
+    if head.startswith(b"BM"):
+        return "image/bmp", ".bmp"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"avif", b"avis"):
+            return "image/avif", ".avif"
+        if brand in (b"heic", b"heix", b"mif1", b"msf1"):
+            return "image/heic", ".heic"
+    return None
+
+
+class StreamingIngest:
+    """
+    Write one upload to a temp file while hashing (SHA-256), enforcing the size
+    limit and sniffing the format, all in a single pass over the bytes.
+    Memory use is one chunk regardless of file size.
+    """
+
+    def __init__(self, dest_dir: str, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.head = b""
+        self.hasher = hashlib.sha256()
+        fd, self.temp_path = tempfile.mkstemp(dir=dest_dir, suffix=".temp")
+        self.out = os.fdopen(fd, "wb")
+
+    def feed(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            self.abort()
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File exceeds the {self.max_bytes} byte upload limit",
+            )
+        if len(self.head) < SNIFF_BYTES:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+        self.hasher.update(chunk)
+        self.out.write(chunk)
+
+    def finish(self, sniff: bool = True) -> Dict:
+        """
+        Close the temp file and return what was learned about it:
+        temp_path, size_bytes, content_hash, content_type and ext.
+        With sniff=False (e.g. a chunk of a larger file) the format is not
+        checked and content_type/ext are None.
+        """
+        self.out.close()
+        if not sniff:
+            return {
+                "temp_path": self.temp_path,
+                "size_bytes": self.size,
+                "content_hash": self.hasher.hexdigest(),
+                "content_type": None,
+                "ext": None,
+            }
+        fmt = sniff_format(self.head)
+        if fmt is None:
+            self.abort()
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Unsupported or unrecognized image format",
+            )
+        content_type, ext = fmt
+        return {
+            "temp_path": self.temp_path,
+            "size_bytes": self.size,
+            "content_hash": self.hasher.hexdigest(),
+            "content_type": content_type,
+            "ext": ext,
+        }
+
+    def abort(self) -> None:
+        """Close and delete the temp file."""
+        if not self.out.closed:
+            self.out.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+def ingest_fileobj(fileobj: BinaryIO, dest_dir: str, max_bytes: int = MAX_UPLOAD_BYTES) -> Dict:
+    """Synchronously stream a file-like object through StreamingIngest."""
+    ingest = StreamingIngest(dest_dir, max_bytes)
+    try:
+        while True:
+            chunk = fileobj.read(INGEST_CHUNK_SIZE)
+            if not chunk:
+                break
+            ingest.feed(chunk)
+        return ingest.finish()
+    except Exception:
+        ingest.abort()
+        raise
+
+
+class _MultipartForm:
+    """
+    python-multipart callbacks for one multipart/form-data body: bytes of the
+    file part are queued for StreamingIngest as they are parsed, every other
+    part is collected as a (small) text field.
+    """
+
+    def __init__(self, file_field: str):
+        self.file_field = file_field
+        self.fields: Dict[str, str] = {}
+        self.file_chunks: List[bytes] = []
+        self.file_seen = False
+        self.field_bytes = 0
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._name: Optional[str] = None
+        self._in_file = False
+        self._value = bytearray()
+
+    def callbacks(self) -> Dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._name = None
+        self._in_file = False
+        self._value = bytearray()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("latin-1")
+        if self._name == self.file_field and b"filename" in options:
+            if self.file_seen:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Only one '{self.file_field}' file per request")
+            self.file_seen = self._in_file = True
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self.file_chunks.append(data[start:end])
+            return
+        self.field_bytes += end - start
+        if self.field_bytes > MAX_FORM_FIELD_BYTES:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Form fields too large")
+        self._value += data[start:end]
+
+    def on_part_end(self) -> None:
+        if not self._in_file and self._name:
+            self.fields[self._name] = self._value.decode("utf-8", errors="replace")
+
+
+async def ingest_multipart(
+    request: Request,
+    dest_dir: str,
+    file_field: str = "file",
+    max_bytes: int = MAX_UPLOAD_BYTES,
+) -> Tuple[Dict, Dict[str, str]]:
+    """
+    Parse a multipart/form-data request body as it arrives from the client.
+    The `file_field` part is streamed through StreamingIngest, so it is
+    written to disk exactly once and the size limit stops the transfer as
+    soon as it is exceeded (up front, when Content-Length already says so).
+    Returns (ingested file, {field name: value} for the other fields).
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Expected multipart/form-data")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds the {max_bytes} byte upload limit",
+        )
+
+    form = _MultipartForm(file_field)
+    parser = multipart.MultipartParser(params[b"boundary"], form.callbacks())
+    ingest = StreamingIngest(dest_dir, max_bytes)
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if form.file_chunks:
+                data, form.file_chunks = b"".join(form.file_chunks), []
+                await run_in_threadpool(ingest.feed, data)
+        parser.finalize()
+        if not form.file_seen:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Missing '{file_field}' file")
+        return await run_in_threadpool(ingest.finish), form.fields
+    except Exception:
+        ingest.abort()
+        raise
@@ -1,10 +1,72 @@
 # app/modules/uploads/models.py
 import json
-from sqlalchemy import Column, String, DateTime, Integer, Text, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, DateTime, Float, Integer, Text, ForeignKey, Index
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime
+from typing import Optional
 from app.db.database import Base
 
+def build_srcset(renditions_json: str) -> dict:
+    """
+    Turn the stored rendition list into {"webp": "url 160w, url 320w", ...}.
+    """
+    try:
+        renditions = json.loads(renditions_json) if renditions_json else []
+    except (TypeError, ValueError):
+        return {}
+    srcset = {}
+    for r in sorted(renditions, key=lambda r: r["width"]):
+        srcset.setdefault(r["format"], []).append(f"{r['url']} {r['width']}w")
+    return {fmt: ", ".join(entries) for fmt, entries in srcset.items()}
+
+
+# Upload.processing_status values
+PROCESSING_PENDING = "processing"   # original stored, derivatives not generated yet
+PROCESSING_READY = "ready"
+PROCESSING_FAILED = "failed"
+
+# Curated EXIF columns, filled with the other derivatives (see derivatives.curate_exif)
+EXIF_FIELDS = (
+    "camera_make", "camera_model", "lens_model", "focal_length", "aperture",
+    "exposure_time", "iso", "taken_at", "gps_lat", "gps_lon",
+)
+
+class UploadBlob(Base):
+    """
+    One stored original, shared by every Upload with the same content hash.
+    The file and its derivatives are deleted when ref_count drops to zero.
+    """
+    __tablename__ = "upload_blobs"
+
+    content_hash = Column(String(64), primary_key=True)
+    filename = Column(String, nullable=False)
+    storage_path = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+    size_bytes = Column(Integer, nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UploadSession(Base):
+    """
+    A resumable upload in progress. Chunks are staged on disk under
+    uploads/staging/{id}/ and only the session metadata lives here.
+    """
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(length=36), primary_key=True, index=True)
+    uploader_id = Column(String, ForeignKey("users.id"), nullable=True, index=True)
+    filename = Column(String, nullable=True)        # client-side name, informational only
+    total_size = Column(Integer, nullable=False)
+    chunk_size = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=True)      # expected hash of the whole file, if the client sent one
+    description = Column(Text, nullable=True)
+    tags = Column(Text, nullable=True)              # JSON array string
+    privacy = Column(String, default="public")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+
 class Upload(Base):
     __tablename__ = "uploads"
 
@@ -18,12 +80,45 @@ class Upload(Base):
     width = Column(Integer, nullable=True)
     height = Column(Integer, nullable=True)
     size_bytes = Column(Integer, nullable=True)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 hex, key into upload_blobs
     uploaded_at = Column(DateTime, default=datetime.utcnow)
     uploader_id = Column(String, ForeignKey("users.id"), nullable=True, index=True)  # user id reference
     description = Column(Text, nullable=True)
     tags = Column(Text, nullable=True)   # stored as JSON array string
-    exif = Column(Text, nullable=True)   # JSON string of exif metadata
+    exif = deferred(Column(Text, nullable=True))  # JSON string of raw exif metadata, loaded on access
     privacy = Column(String, default="public")  # public, unlisted, private
+    renditions = Column(Text, nullable=True)  # JSON list of {width, height, format, name, url}
+    processing_status = Column(String, nullable=False, default=PROCESSING_READY, server_default=PROCESSING_READY)
+
+    # Curated EXIF
+    camera_make = Column(String(64), nullable=True)
+    camera_model = Column(String(128), nullable=True)
+    lens_model = Column(String(128), nullable=True)
+    focal_length = Column(Float, nullable=True)      # mm
+    aperture = Column(Float, nullable=True)          # f-number
+    exposure_time = Column(Float, nullable=True)     # seconds
+    iso = Column(Integer, nullable=True)
+    taken_at = Column(DateTime, nullable=True)       # camera local time
+    gps_lat = Column(Float, nullable=True)
+    gps_lon = Column(Float, nullable=True)
+    geohash = Column(String(12), nullable=True)      # of (gps_lat, gps_lon), for spatial lookups without PostGIS
+
+    __table_args__ = (
+        Index("ix_uploads_camera", "camera_make", "camera_model"),
+        Index("ix_uploads_lens_model", "lens_model"),
+        Index("ix_uploads_taken_at", "taken_at"),
+        Index("ix_uploads_iso", "iso"),
+        Index("ix_uploads_geohash", "geohash", postgresql_ops={"geohash": "text_pattern_ops"}),
+    )
 
     # New relationship to the content object (Image)
     image = relationship("Image", back_populates="upload")
+
+    @property
+    def srcset(self) -> dict:
+        return build_srcset(self.renditions)
+
+    @property
+    def exif_summary(self) -> Optional[dict]:
+        summary = {name: getattr(self, name) for name in EXIF_FIELDS}
+        return summary if any(value is not None for value in summary.values()) else None
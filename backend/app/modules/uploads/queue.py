@@ -0,0 +1,81 @@
+# app/modules/uploads/queue.py
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from app.modules.uploads import tasks
+from app.modules.uploads.derivatives import compute_derivatives
+
+log = logging.getLogger("uploads")
+
+# Use Redis/RQ (see run_worker.py) when REDIS_URL is set, otherwise a local process pool
+REDIS_URL = os.getenv("REDIS_URL")
+DERIVATIVES_QUEUE = os.getenv("DERIVATIVES_QUEUE", "derivatives")
+DERIVATIVE_WORKERS = int(os.getenv("DERIVATIVE_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    Lazily create the local process pool. Workers are spawned rather than
+    forked so they do not inherit the app's threads or DB connections.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=DERIVATIVE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_pool(wait: bool = True) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait)
+            _pool = None
+
+
+def _enqueue_rq(content_hash: str, source_path: str) -> bool:
+    try:
+        from redis import Redis
+        from rq import Queue
+    except ImportError:
+        log.warning("REDIS_URL is set but redis/rq are not installed; using the local pool")
+        return False
+    try:
+        queue = Queue(DERIVATIVES_QUEUE, connection=Redis.from_url(REDIS_URL))
+        queue.enqueue(tasks.process_upload, content_hash, source_path)
+        return True
+    except Exception as e:
+        log.warning("Failed to enqueue derivatives for %s on Redis, using the local pool: %s", content_hash, e)
+        return False
+
+
+def enqueue_derivatives(content_hash: str, source_path: str) -> None:
+    """
+    Schedule thumbnail/metadata generation for a stored blob and return
+    immediately. Derivative files are named after the stored original.
+    """
+    if REDIS_URL and _enqueue_rq(content_hash, source_path):
+        return
+
+    future = get_pool().submit(
+        compute_derivatives, source_path, tasks.THUMB_DIR, tasks.derivative_key(source_path), tasks.RENDITION_DIR
+    )
+
+    def _store(done):
+        try:
+            result = done.result()
+        except Exception as e:
+            result = {"error": str(e)}
+        tasks.apply_derivatives(content_hash, result)
+
+    future.add_done_callback(_store)
@@ -0,0 +1,251 @@
+# app/modules/uploads/resumable.py
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from app.modules.uploads import models, schemas
+from app.modules.uploads.ingest import INGEST_CHUNK_SIZE, MAX_UPLOAD_BYTES, StreamingIngest
+from app.modules.uploads.service import UPLOAD_DIR, UploadService
+
+# Configuration via environment variables (fallbacks)
+RESUMABLE_CHUNK_SIZE = int(os.getenv("RESUMABLE_CHUNK_SIZE", str(8 * 1024 * 1024)))  # 8 MiB
+RESUMABLE_MAX_CHUNK_SIZE = int(os.getenv("RESUMABLE_MAX_CHUNK_SIZE", str(64 * 1024 * 1024)))
+RESUMABLE_MIN_CHUNK_SIZE = 256 * 1024
+RESUMABLE_SESSION_TTL = int(os.getenv("RESUMABLE_SESSION_TTL", str(24 * 3600)))  # seconds
+
+STAGING_DIR = os.path.join(UPLOAD_DIR, "staging")
+os.makedirs(STAGING_DIR, exist_ok=True)
+
+PART_SUFFIX = ".part"
+
+
+class ResumableUploadService:
+    """
+    Resumable uploads: init a session, PUT chunks by byte offset (in any order,
+    in parallel, retried as often as needed), then finalize.
+
+    Each chunk is streamed to its own file under staging/{session_id}/ while
+    its SHA-256 is checked against the X-Chunk-SHA256 header, so a failed or
+    corrupted chunk is simply re-sent. Finalize concatenates the parts through
+    StreamingIngest (one pass, constant memory) and hands the result to
+    UploadService.register_ingested_file like a regular upload.
+    """
+
+    def __init__(self):
+        self.staging_dir = STAGING_DIR
+        self.upload_service = UploadService()
+
+    # ------------------ helpers ------------------
+    def _session_dir(self, session_id: str) -> str:
+        return os.path.join(self.staging_dir, session_id)
+
+    @staticmethod
+    def _offsets(session: models.UploadSession) -> List[int]:
+        return list(range(0, session.total_size, session.chunk_size))
+
+    @staticmethod
+    def _expected_length(session: models.UploadSession, offset: int) -> int:
+        return min(session.chunk_size, session.total_size - offset)
+
+    def _received(self, session: models.UploadSession) -> Dict[int, int]:
+        """Map offset -> size of every chunk staged so far."""
+        received = {}
+        session_dir = self._session_dir(session.id)
+        if not os.path.isdir(session_dir):
+            return received
+        for name in os.listdir(session_dir):
+            if name.endswith(PART_SUFFIX):
+                offset = int(name[:-len(PART_SUFFIX)])
+                received[offset] = os.path.getsize(os.path.join(session_dir, name))
+        return received
+
+    def _part_path(self, session_id: str, offset: int) -> str:
+        return os.path.join(self._session_dir(session_id), f"{offset:015d}{PART_SUFFIX}")
+
+    def get_session(self, db: Session, session_id: str, uploader_id: Optional[str], for_update: bool = False) -> models.UploadSession:
+        try:
+            session_id = str(uuid.UUID(session_id))
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid upload session ID format")
+        q = db.query(models.UploadSession).filter(models.UploadSession.id == session_id)
+        if for_update:
+            q = q.with_for_update()
+        session = q.first()
+        if not session or session.uploader_id != uploader_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found")
+        if session.expires_at < datetime.utcnow():
+            raise HTTPException(status_code=status.HTTP_410_GONE, detail="Upload session expired")
+        return session
+
+    def describe(self, session: models.UploadSession) -> dict:
+        received = self._received(session)
+        complete = [
+            offset for offset, size in received.items()
+            if size == self._expected_length(session, offset)
+        ]
+        return {
+            "id": session.id,
+            "filename": session.filename,
+            "total_size": session.total_size,
+            "chunk_size": session.chunk_size,
+            "expires_at": session.expires_at,
+            "received": sorted(complete),
+            "missing": [offset for offset in self._offsets(session) if offset not in received],
+            "received_bytes": sum(received[offset] for offset in complete),
+        }
+
+    # ------------------ protocol ------------------
+    def create_session(self, db: Session, data: schemas.UploadSessionCreate, uploader_id: Optional[str]) -> models.UploadSession:
+        if data.size > MAX_UPLOAD_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File exceeds the {MAX_UPLOAD_BYTES} byte upload limit",
+            )
+        chunk_size = data.chunk_size or RESUMABLE_CHUNK_SIZE
+        chunk_size = max(RESUMABLE_MIN_CHUNK_SIZE, min(chunk_size, RESUMABLE_MAX_CHUNK_SIZE))
+
+        self.purge_expired(db)
+
+        session = models.UploadSession(
+            id=str(uuid.uuid4()),
+            uploader_id=uploader_id,
+            filename=data.filename,
+            total_size=data.size,
+            chunk_size=chunk_size,
+            sha256=data.sha256.lower() if data.sha256 else None,
+            description=data.description,
+            tags=json.dumps(data.tags or []),
+            privacy=data.privacy or "public",
+            expires_at=datetime.utcnow() + timedelta(seconds=RESUMABLE_SESSION_TTL),
+        )
+        db.add(session)
+        db.commit()
+        db.refresh(session)
+        os.makedirs(self._session_dir(session.id), exist_ok=True)
+        return session
+
+    async def put_chunk(
+        self,
+        session: models.UploadSession,
+        offset: int,
+        body: AsyncIterator[bytes],
+        chunk_sha256: str,
+    ) -> dict:
+        """
+        Stream one chunk to staging and verify it. Re-sending a chunk that is
+        already stored replaces it, so clients can retry blindly.
+        """
+        if offset < 0 or offset >= session.total_size or offset % session.chunk_size:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Offset must be a multiple of {session.chunk_size} below {session.total_size}",
+            )
+        expected = self._expected_length(session, offset)
+
+        session_dir = self._session_dir(session.id)
+        os.makedirs(session_dir, exist_ok=True)
+        ingest = StreamingIngest(session_dir, max_bytes=expected)
+        try:
+            async for piece in body:
+                await run_in_threadpool(ingest.feed, piece)
+            result = await run_in_threadpool(ingest.finish, False)
+        except Exception:
+            ingest.abort()
+            raise
+
+        if result["size_bytes"] != expected:
+            ingest.abort()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Chunk at offset {offset} must be {expected} bytes, got {result['size_bytes']}",
+            )
+        if result["content_hash"] != chunk_sha256.lower():
+            ingest.abort()
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"SHA-256 mismatch for chunk at offset {offset}",
+            )
+
+        # Atomic rename: a parallel retry of the same chunk just wins or loses the race
+        os.replace(result["temp_path"], self._part_path(session.id, offset))
+        return {"offset": offset, "size": result["size_bytes"], "sha256": result["content_hash"]}
+
+    def _assemble(self, session: models.UploadSession) -> Dict:
+        """Concatenate the staged parts into one ingested temp file."""
+        ingest = StreamingIngest(self.upload_service.upload_dir, max_bytes=session.total_size)
+        try:
+            for offset in self._offsets(session):
+                with open(self._part_path(session.id, offset), "rb") as part:
+                    for piece in iter(lambda: part.read(INGEST_CHUNK_SIZE), b""):
+                        ingest.feed(piece)
+            ingested = ingest.finish()
+        except Exception:
+            ingest.abort()
+            raise
+
+        if session.sha256 and ingested["content_hash"] != session.sha256:
+            ingest.abort()
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="SHA-256 of the assembled file does not match the one given at init",
+            )
+        return ingested
+
+    def finalize(self, db: Session, session_id: str, uploader_id: Optional[str]) -> models.Upload:
+        """
+        Assemble a fully uploaded session into a regular Upload. The session row
+        is locked so concurrent finalize calls produce a single upload.
+        """
+        session = self.get_session(db, session_id, uploader_id, for_update=True)
+        state = self.describe(session)
+        if state["missing"] or len(state["received"]) != len(self._offsets(session)):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Upload is incomplete", "missing": state["missing"]},
+            )
+
+        ingested = self._assemble(session)
+        try:
+            tags = json.loads(session.tags) if session.tags else []
+        except ValueError:
+            tags = []
+
+        # Deleted in the same transaction that creates the Upload
+        db.delete(session)
+        upload = self.upload_service.register_ingested_file(
+            db,
+            ingested,
+            uploader_id=uploader_id,
+            description=session.description,
+            tags=tags,
+            privacy=session.privacy,
+        )
+        shutil.rmtree(self._session_dir(session.id), ignore_errors=True)
+        return upload
+
+    def abort(self, db: Session, session_id: str, uploader_id: Optional[str]) -> None:
+        session = self.get_session(db, session_id, uploader_id, for_update=True)
+        db.delete(session)
+        db.commit()
+        shutil.rmtree(self._session_dir(session.id), ignore_errors=True)
+
+    def purge_expired(self, db: Session) -> int:
+        """Drop expired sessions and their staged chunks."""
+        expired = (
+            db.query(models.UploadSession)
+            .filter(models.UploadSession.expires_at < datetime.utcnow())
+            .all()
+        )
+        for session in expired:
+            db.delete(session)
+        db.commit()
+        for session in expired:
+            shutil.rmtree(self._session_dir(session.id), ignore_errors=True)
+        return len(expired)
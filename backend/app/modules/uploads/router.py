@@ -1,6 +1,7 @@
 import json
 import os
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Query, Request, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.db.database import get_db
@@ -9,37 +10,162 @@ from app.modules.images.schemas import ImageResponse  # Import Image schema for
 from app.modules.users.schemas import User as UserSchema
 from app.auth.dependencies import get_current_user
 from app.modules.uploads.service import UploadService
+from app.modules.uploads.ingest import ingest_multipart
+from app.modules.uploads.resumable import ResumableUploadService
+from app.modules.uploads.batch import BatchUploadService
+from app.modules.transforms.service import TransformService
 
 router = APIRouter(prefix="/uploads", tags=["uploads"])
 
 
-def deserialize_upload(upload):
-    """Ensure tags/exif are parsed and URL is corrected"""
-    if upload:
-        # Parse tags
-        try:
-            upload.tags = json.loads(upload.tags) if upload.tags else []
-        except Exception:
-            upload.tags = []
-        # Parse exif
+def deserialize_upload(upload, schema=schemas.UploadOut):
+    """
+    Response model for an upload: tags/exif JSON parsed by the schema and URL
+    corrected. The ORM object itself is left untouched, so nothing is written
+    back when the request session commits. List endpoints pass
+    UploadSummaryOut, which never loads the (deferred) raw EXIF.
+    """
+    if not upload:
+        return upload
+    out = schema.from_orm(upload)
+
+    # ✅ Fix URL so frontend always gets /static/uploads/{filename}
+    if out.url:
+        filename = os.path.basename(out.url)
+        out.url = f"http://localhost:8000/static/uploads/{filename}"
+
+    return out
+
+
+def parse_tags(tags: Optional[str]) -> List[str]:
+    """Form tags arrive as a JSON array string or comma-separated."""
+    parsed_tags = []
+    if tags:
         try:
-            upload.exif = json.loads(upload.exif) if upload.exif else {}
+            parsed_tags = json.loads(tags)
+            if not isinstance(parsed_tags, list):
+                parsed_tags = []
         except Exception:
-            upload.exif = {}
+            # fallback to comma-separated
+            parsed_tags = [t.strip() for t in tags.split(",") if t.strip()]
+    return parsed_tags
 
-        # ✅ Fix URL so frontend always gets /static/uploads/{filename}
-        if hasattr(upload, "url") and upload.url:
-            filename = os.path.basename(upload.url)
-            upload.url = f"http://localhost:8000/static/uploads/{filename}"
 
-    return upload
+@router.get("/", response_model=List[schemas.UploadSummaryOut])
+def list_uploads(
+    skip: int = 0,
+    limit: int = 100,
+    tags: Optional[str] = Query(None, description="Comma-separated tags to filter by"),
+    match: str = Query("all", regex="^(all|any)$", description="Require all of the tags, or any of them"),
+    db: Session = Depends(get_db),
+):
+    upload_service = UploadService()
+    items = upload_service.list_uploads(db, skip=skip, limit=limit, tags=parse_tags(tags) or None, match=match)
+    return [deserialize_upload(item, schemas.UploadSummaryOut) for item in items]
 
 
-@router.get("/", response_model=List[schemas.UploadOut])
-def list_uploads(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    upload_service = UploadService()
-    items = upload_service.list_uploads(db, skip=skip, limit=limit)
-    return [deserialize_upload(item) for item in items]
+@router.post("/batch", response_model=schemas.BatchUploadOut, status_code=status.HTTP_207_MULTI_STATUS)
+async def create_upload_batch(
+    files: List[UploadFile] = File([]),
+    archive: Optional[UploadFile] = File(None, description="zip or tar(.gz) of images"),
+    description: Optional[str] = Form(None),
+    tags: Optional[str] = Form(None),
+    privacy: Optional[str] = Form("public"),
+    db: Session = Depends(get_db),
+    user: UserSchema = Depends(get_current_user),
+):
+    """
+    Upload many images at once, as repeated `files` fields and/or one archive.
+    Thumbnails and metadata are generated in parallel across processes and the
+    uploads are returned ready, with a per-file status.
+    """
+    items = await run_in_threadpool(
+        BatchUploadService().create_batch,
+        db,
+        files,
+        archive=archive,
+        uploader_id=user.id,
+        description=description,
+        tags=parse_tags(tags),
+        privacy=privacy,
+    )
+    for item in items:
+        item["upload"] = deserialize_upload(item["upload"], schemas.UploadSummaryOut)
+    return {
+        "created": sum(1 for item in items if item["status"] == "created"),
+        "duplicates": sum(1 for item in items if item["status"] == "duplicate"),
+        "failed": sum(1 for item in items if item["status"] == "error"),
+        "items": items,
+    }
+
+
+# ------------------ resumable uploads ------------------
+@router.post("/sessions", response_model=schemas.UploadSessionOut, status_code=status.HTTP_201_CREATED)
+def create_upload_session(
+    data: schemas.UploadSessionCreate,
+    db: Session = Depends(get_db),
+    user: UserSchema = Depends(get_current_user),
+):
+    """
+    Start a resumable upload. Send the chunks with
+    PUT /uploads/sessions/{id}/chunks/{offset} (offsets are multiples of the
+    returned chunk_size), then POST /uploads/sessions/{id}/complete.
+    """
+    resumable = ResumableUploadService()
+    session = resumable.create_session(db, data, uploader_id=str(user.id))
+    return resumable.describe(session)
+
+
+@router.get("/sessions/{session_id}", response_model=schemas.UploadSessionOut)
+def get_upload_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    user: UserSchema = Depends(get_current_user),
+):
+    """Which chunks are stored and which are still missing (for resuming)."""
+    resumable = ResumableUploadService()
+    session = resumable.get_session(db, session_id, uploader_id=str(user.id))
+    return resumable.describe(session)
+
+
+@router.put("/sessions/{session_id}/chunks/{offset}", response_model=schemas.UploadChunkOut)
+async def put_upload_chunk(
+    session_id: str,
+    offset: int,
+    request: Request,
+    x_chunk_sha256: str = Header(..., min_length=64, max_length=64, description="Hex SHA-256 of this chunk"),
+    db: Session = Depends(get_db),
+    user: UserSchema = Depends(get_current_user),
+):
+    """
+    Store the raw request body as the chunk starting at `offset`.
+    Chunks may be sent in parallel and in any order; a chunk whose hash does
+    not match X-Chunk-SHA256 is rejected with 422 and should be re-sent.
+    """
+    resumable = ResumableUploadService()
+    session = resumable.get_session(db, session_id, uploader_id=str(user.id))
+    return await resumable.put_chunk(session, offset, request.stream(), x_chunk_sha256)
+
+
+@router.post("/sessions/{session_id}/complete", response_model=schemas.UploadOut, status_code=status.HTTP_201_CREATED)
+def complete_upload_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    user: UserSchema = Depends(get_current_user),
+):
+    """Assemble the chunks and create the Upload (409 lists missing chunks)."""
+    resumable = ResumableUploadService()
+    upload = resumable.finalize(db, session_id, uploader_id=str(user.id))
+    return deserialize_upload(upload)
+
+
+@router.delete("/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+def abort_upload_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    user: UserSchema = Depends(get_current_user),
+):
+    ResumableUploadService().abort(db, session_id, uploader_id=str(user.id))
 
 
 @router.get("/{upload_id}", response_model=schemas.UploadOut)
@@ -53,41 +179,39 @@ def get_upload(upload_id: str, db: Session = Depends(get_db)):
 
 @router.post("/", response_model=schemas.UploadOut, status_code=status.HTTP_201_CREATED)
 async def create_upload(
-    file: UploadFile = File(...),
-    description: Optional[str] = Form(None),
-    tags: Optional[str] = Form(None),  # JSON string or comma-separated
-    privacy: Optional[str] = Form("public"),
+    request: Request,
     db: Session = Depends(get_db),
     user: UserSchema = Depends(get_current_user),
 ):
-    """Upload a new file and return its metadata"""
-    parsed_tags = []
-    if tags:
-        try:
-            parsed_tags = json.loads(tags)
-            if not isinstance(parsed_tags, list):
-                parsed_tags = []
-        except Exception:
-            # fallback to comma-separated
-            parsed_tags = [t.strip() for t in tags.split(",") if t.strip()]
-
+    """
+    Upload a new file and return its metadata.
+    Multipart form: `file`, plus optional `description`, `tags` (JSON string
+    or comma-separated) and `privacy`. The body is parsed as it arrives, so
+    the file is written to disk once and an oversized upload is cut off
+    with 413 as soon as it passes MAX_UPLOAD_BYTES.
+    The upload is returned with processing_status "processing" until the
+    thumbnail and metadata have been generated.
+    """
     upload_service = UploadService()
+    ingested, fields = await ingest_multipart(request, upload_service.upload_dir)
     try:
-        new_upload = upload_service.create_upload_from_file(
+        new_upload = await upload_service.create_upload(
             db=db,
-            file_obj=file,
+            ingested=ingested,
             uploader_id=user.id,
-            description=description,
-            tags=parsed_tags,
-            privacy=privacy,
+            description=fields.get("description"),
+            tags=parse_tags(fields.get("tags")),
+            privacy=fields.get("privacy") or "public",
         )
         return deserialize_upload(new_upload)
+    except HTTPException:
+        raise  # size limit / unsupported format
     except Exception as e:
         print(f"Upload service error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
-@router.delete("/{upload_id}", response_model=schemas.UploadOut)
+@router.delete("/{upload_id}", response_model=schemas.UploadSummaryOut)
 def delete_upload(
     upload_id: str,
     db: Session = Depends(get_db),
@@ -97,4 +221,6 @@ def delete_upload(
     upload = upload_service.delete_upload(db, upload_id)
     if not upload:
         raise HTTPException(status_code=404, detail="Upload not found")
-    return deserialize_upload(upload)
+    TransformService().invalidate_upload(upload_id)
+    # The row is gone; its deferred raw EXIF can no longer be loaded
+    return deserialize_upload(upload, schemas.UploadSummaryOut)
@@ -1,9 +1,35 @@
 # app/modules/uploads/schemas.py
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+import json
 import uuid
 
+
+def _parse_json(value, default):
+    """Tags/EXIF are stored as JSON strings; accept those as well as parsed values."""
+    if value is None or value == "":
+        return default
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return default
+    return value
+
+
+class ExifSummary(BaseModel):
+    camera_make: Optional[str] = None
+    camera_model: Optional[str] = None
+    lens_model: Optional[str] = None
+    focal_length: Optional[float] = None   # mm
+    aperture: Optional[float] = None       # f-number
+    exposure_time: Optional[float] = None  # seconds
+    iso: Optional[int] = None
+    taken_at: Optional[datetime] = None
+    gps_lat: Optional[float] = None
+    gps_lon: Optional[float] = None
+
 class UploadBase(BaseModel):
     id: uuid.UUID
     filename: str
@@ -14,17 +40,69 @@ class UploadBase(BaseModel):
     width: Optional[int] = None
     height: Optional[int] = None
     size_bytes: Optional[int] = None
+    content_hash: Optional[str] = None
     thumbnail_url: Optional[str] = None
-    exif: Optional[dict] = None
+    processing_status: Optional[str] = None  # processing, ready, failed
+    srcset: Optional[Dict[str, str]] = None  # per format, e.g. {"webp": "url 160w, url 320w"}
+    exif_summary: Optional[ExifSummary] = None  # curated camera/exposure/GPS fields
 
-class UploadOut(UploadBase):
+class UploadSummaryOut(UploadBase):
+    """Upload in list responses: everything but the raw EXIF."""
     uploader_id: Optional[uuid.UUID]
     description: Optional[str]
     tags: Optional[List[str]]
     privacy: Optional[str]
 
+    @validator("tags", pre=True)
+    def parse_tags(cls, v):
+        return _parse_json(v, [])
+
     class Config:
         orm_mode = True
         json_encoders = {
             uuid.UUID: str
         }
+
+class UploadOut(UploadSummaryOut):
+    exif: Optional[dict] = None  # raw EXIF
+
+    @validator("exif", pre=True)
+    def parse_exif(cls, v):
+        return _parse_json(v, {})
+
+
+class UploadSessionCreate(BaseModel):
+    size: int = Field(..., gt=0, description="Total file size in bytes")
+    filename: Optional[str] = None
+    chunk_size: Optional[int] = Field(None, gt=0, description="Defaults to the server chunk size")
+    sha256: Optional[str] = Field(None, min_length=64, max_length=64, description="Hex SHA-256 of the whole file")
+    description: Optional[str] = None
+    tags: Optional[List[str]] = None
+    privacy: Optional[str] = "public"
+
+class UploadSessionOut(BaseModel):
+    id: uuid.UUID
+    filename: Optional[str] = None
+    total_size: int
+    chunk_size: int
+    expires_at: datetime
+    received: List[int]   # offsets of the chunks stored so far
+    missing: List[int]    # offsets still to be sent
+    received_bytes: int
+
+class UploadChunkOut(BaseModel):
+    offset: int
+    size: int
+    sha256: str
+
+class BatchUploadItem(BaseModel):
+    filename: str
+    status: str  # created, duplicate, error
+    upload: Optional[UploadSummaryOut] = None
+    error: Optional[str] = None
+
+class BatchUploadOut(BaseModel):
+    created: int
+    duplicates: int
+    failed: int
+    items: List[BatchUploadItem]
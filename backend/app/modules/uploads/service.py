@@ -1,140 +1,208 @@
 import os
 import uuid
 import json
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app.modules.uploads import models, schemas
-from typing import Optional, List, Dict, Any
-from PIL import Image, ExifTags
-from io import BytesIO
-import shutil
+from typing import Optional, List, Dict, Any, Tuple
 from uuid import UUID
 from fastapi import UploadFile, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from app.modules.images import models as image_models # Import Image model
+from app.modules.uploads.queue import enqueue_derivatives
+from app.modules.uploads.ingest import ingest_fileobj
+from app.modules.tags import service as tag_service  # also registers the upload_tags sync listener
 
 # Configuration via environment variables (fallbacks)
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(os.getcwd(), "uploads"))
-THUMBNAIL_SIZE = (300, 300)  # px
 BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")  # used to build public URLs; override in prod
 
 # ensure upload dir exists
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(os.path.join(UPLOAD_DIR, "thumbs"), exist_ok=True)
+os.makedirs(os.path.join(UPLOAD_DIR, "renditions"), exist_ok=True)
+
+
+def blob_filename(content_hash: str, ext: str) -> str:
+    """
+    File name for a newly stored blob. Unique per generation: if the last
+    upload of some content is deleted while the same bytes are uploaded
+    again, the new file never takes the path the deleter is about to remove.
+    """
+    return f"{content_hash}.{uuid.uuid4().hex[:12]}{ext}"
 
 class UploadService:
     def __init__(self):
         self.upload_dir = UPLOAD_DIR
         self.thumb_dir = os.path.join(self.upload_dir, "thumbs")
+        self.rendition_dir = os.path.join(self.upload_dir, "renditions")
 
-    def _save_file_to_disk(self, upload_file, dest_path: str) -> None:
-        """
-        Save UploadFile-like object to dest_path atomically.
-        """
-        temp_dest_path = dest_path + '.temp'
-        try:
-            with open(temp_dest_path, "wb") as out_f:
-                if hasattr(upload_file, "file"):
-                    shutil.copyfileobj(upload_file.file, out_f)
-                else:
-                    out_f.write(upload_file.read())
-            os.rename(temp_dest_path, dest_path)
-        except Exception as e:
-            if os.path.exists(temp_dest_path):
-                os.remove(temp_dest_path)
-            raise e
+    # Fields a duplicate upload inherits from an existing upload of the same blob
+    DERIVED_FIELDS = ("width", "height", "exif", "thumbnail_url", "renditions", "processing_status", "geohash") + models.EXIF_FIELDS
 
-    def _extract_exif(self, pil_image: Image.Image) -> Dict[str, Any]:
+    def _acquire_blob(self, db: Session, ingested: Dict[str, Any]) -> Tuple[models.UploadBlob, bool]:
         """
-        Extract EXIF from Pillow Image and return dictionary with human keys.
+        Take a reference on the blob for the ingested bytes, storing the file if
+        this content has not been seen before. Returns (blob, created).
+        The blob row stays locked until the caller commits.
         """
-        exif_data = {}
-        try:
-            raw_exif = pil_image._getexif()
-            if not raw_exif:
-                return {}
-            for tag_id, value in raw_exif.items():
-                tag = ExifTags.TAGS.get(tag_id, tag_id)
+        content_hash = ingested["content_hash"]
+        blob = (
+            db.query(models.UploadBlob)
+            .filter(models.UploadBlob.content_hash == content_hash)
+            .with_for_update()
+            .first()
+        )
+        if blob is None:
+            filename = blob_filename(content_hash, ingested["ext"])
+            blob = models.UploadBlob(
+                content_hash=content_hash,
+                filename=filename,
+                storage_path=os.path.join(self.upload_dir, filename),
+                content_type=ingested["content_type"],
+                size_bytes=ingested["size_bytes"],
+                ref_count=1,
+            )
+            try:
+                with db.begin_nested():
+                    db.add(blob)
+            except IntegrityError:
+                # Another request stored the same content first
+                blob = None
+            else:
                 try:
-                    json.dumps(value)
-                    exif_data[tag] = value
-                except Exception:
-                    exif_data[tag] = str(value)
-        except Exception:
-            return {}
-        return exif_data
+                    os.replace(ingested["temp_path"], blob.storage_path)
+                except Exception as e:
+                    db.rollback()
+                    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to save file: {e}")
+                return blob, True
 
-    def _make_thumbnail(self, pil_image: Image.Image, thumb_path: str) -> None:
-        """
-        Create a thumbnail and save to thumb_path.
-        """
-        try:
-            im = pil_image.copy()
-            im.thumbnail(THUMBNAIL_SIZE)
-            im.save(thumb_path, format="JPEG", quality=85)
-        except Exception as e:
-            raise
+            blob = (
+                db.query(models.UploadBlob)
+                .filter(models.UploadBlob.content_hash == content_hash)
+                .with_for_update()
+                .one()
+            )
 
-    def create_upload_from_file(
+        blob.ref_count += 1
+        if os.path.exists(ingested["temp_path"]):
+            os.remove(ingested["temp_path"])
+        return blob, False
+
+    def register_ingested_file(
         self,
         db: Session,
-        file_obj: UploadFile,
+        ingested: Dict[str, Any],
         uploader_id: Optional[str] = None,
         description: Optional[str] = None,
         tags: Optional[List[str]] = None,
         privacy: Optional[str] = "public",
     ) -> models.Upload:
         """
-        Save file, extract metadata, generate thumbnail, and persist Upload records.
-        """
-        upload_id = str(uuid.uuid4())
-        original_filename = getattr(file_obj, "filename", "upload")
-        ext = os.path.splitext(original_filename)[1].lower() or ".jpg"
-        safe_filename = f"{upload_id}{ext}"
-        dest_path = os.path.join(self.upload_dir, safe_filename)
-
-        try:
-            self._save_file_to_disk(file_obj, dest_path)
-            size_bytes = os.path.getsize(dest_path)
-        except Exception as e:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to save file: {e}")
+        Persist an Upload record for an ingested temp file.
 
-        width = height = None
-        exif_data = {}
-        thumbnail_url = None
+        Originals are content-addressed: the file is stored once per content
+        hash and shared by all uploads of the same bytes. New content is saved
+        in the "processing" state and its thumbnail, dimensions and EXIF are
+        generated off the request by the derivatives worker. A duplicate skips
+        both the write and the processing and reuses the existing derivatives.
+        """
         try:
-            with Image.open(dest_path) as im:
-                width, height = im.size
-                exif_data = self._extract_exif(im)
-                thumb_name = f"{upload_id}_thumb.jpg"
-                thumb_path = os.path.join(self.thumb_dir, thumb_name)
-                self._make_thumbnail(im, thumb_path)
-                thumbnail_url = f"{BASE_URL}/static/uploads/thumbs/{thumb_name}"
+            blob, created = self._acquire_blob(db, ingested)
         except Exception:
-            pass
-
-        public_url = f"{BASE_URL}/static/uploads/{safe_filename}"
+            if os.path.exists(ingested["temp_path"]):
+                os.remove(ingested["temp_path"])
+            raise
 
+        upload_id = str(uuid.uuid4())
         db_upload = models.Upload(
             id=upload_id,
-            filename=safe_filename,
-            storage_path=dest_path,
-            url=public_url,
-            thumbnail_url=thumbnail_url,
-            content_type=getattr(file_obj, "content_type", "application/octet-stream"),
-            width=width,
-            height=height,
-            size_bytes=size_bytes,
+            filename=blob.filename,
+            storage_path=blob.storage_path,
+            url=f"{BASE_URL}/static/uploads/{blob.filename}",
+            thumbnail_url=None,
+            content_type=blob.content_type,
+            size_bytes=blob.size_bytes,
+            content_hash=blob.content_hash,
             uploader_id=uploader_id,
             description=description,
             tags=json.dumps(tags or []),
-            exif=json.dumps(exif_data or {}),
+            exif=json.dumps({}),
             privacy=privacy or "public",
+            processing_status=models.PROCESSING_PENDING,
         )
+        if not created:
+            sibling = (
+                db.query(models.Upload)
+                .filter(models.Upload.content_hash == blob.content_hash)
+                .first()
+            )
+            if sibling:
+                for name in self.DERIVED_FIELDS:
+                    setattr(db_upload, name, getattr(sibling, name))
+
         db.add(db_upload)
-        db.commit()
+        try:
+            db.commit()
+        except Exception:
+            db.rollback()
+            if created and os.path.exists(blob.storage_path):
+                os.remove(blob.storage_path)
+            raise
         db.refresh(db_upload)
 
+        if created:
+            enqueue_derivatives(blob.content_hash, blob.storage_path)
+
         return db_upload
 
+    async def create_upload(
+        self,
+        db: Session,
+        ingested: Dict[str, Any],
+        uploader_id: Optional[str] = None,
+        description: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        privacy: Optional[str] = "public",
+    ) -> models.Upload:
+        """
+        Persist the Upload record for a file ingest_multipart() streamed to
+        disk (hash, size limit and format sniffing in the same pass) without
+        blocking the event loop.
+        """
+        return await run_in_threadpool(
+            self.register_ingested_file,
+            db,
+            ingested,
+            uploader_id=uploader_id,
+            description=description,
+            tags=tags,
+            privacy=privacy,
+        )
+
+    def create_upload_from_file(
+        self,
+        db: Session,
+        file_obj: UploadFile,
+        uploader_id: Optional[str] = None,
+        description: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        privacy: Optional[str] = "public",
+    ) -> models.Upload:
+        """
+        Synchronous variant of create_upload for callers outside the event loop.
+        """
+        fileobj = file_obj.file if hasattr(file_obj, "file") else file_obj
+        ingested = ingest_fileobj(fileobj, self.upload_dir)
+        return self.register_ingested_file(
+            db,
+            ingested,
+            uploader_id=uploader_id,
+            description=description,
+            tags=tags,
+            privacy=privacy,
+        )
+
 
     # CRUD helpers
     def get_upload(self, db: Session, upload_id: str) -> Optional[models.Upload]:
@@ -150,9 +218,33 @@ class UploadService:
     def get_upload_by_filename(self, db: Session, filename: str) -> Optional[models.Upload]:
         return db.query(models.Upload).filter(models.Upload.filename == filename).first()
 
-    def list_uploads(self, db: Session, skip: int = 0, limit: int = 100):
+    def list_uploads(self, db: Session, skip: int = 0, limit: int = 100, tags: Optional[List[str]] = None, match: str = "all"):
+        if tags:
+            return tag_service.filter_uploads(db, tags, match=match, skip=skip, limit=limit)
         return db.query(models.Upload).offset(skip).limit(limit).all()
 
+    def _release_blob(self, db: Session, upload: models.Upload) -> bool:
+        """
+        Drop the upload's reference on its blob. Returns True when this was the
+        last reference and the stored files should be removed. Uploads stored
+        before content addressing own their files outright.
+        """
+        if not upload.content_hash:
+            return True
+        blob = (
+            db.query(models.UploadBlob)
+            .filter(models.UploadBlob.content_hash == upload.content_hash)
+            .with_for_update()
+            .first()
+        )
+        if blob is None:
+            return True
+        blob.ref_count -= 1
+        if blob.ref_count > 0:
+            return False
+        db.delete(blob)
+        return True
+
     def delete_upload(self, db: Session, upload_id: str) -> Optional[models.Upload]:
         upload = self.get_upload(db, upload_id)
         if not upload:
@@ -163,17 +255,33 @@ class UploadService:
         if upload.thumbnail_url:
             thumb_filename = os.path.basename(upload.thumbnail_url)
             thumbnail_path = os.path.join(self.thumb_dir, thumb_filename)
+        try:
+            rendition_paths = [
+                os.path.join(self.rendition_dir, r["name"])
+                for r in json.loads(upload.renditions or "[]")
+            ]
+        except (TypeError, ValueError, KeyError):
+            rendition_paths = []
 
         try:
+            remove_files = self._release_blob(db, upload)
             if upload.image:
                 db.delete(upload.image)
             db.delete(upload)
             db.commit()
-            
-            if storage_path and os.path.exists(storage_path):
-                os.remove(storage_path)
-            if thumbnail_path and os.path.exists(thumbnail_path):
-                os.remove(thumbnail_path)
+
+            # Other uploads may still point at the same blob and derivatives.
+            # Blob files are unique per generation, so once the row is gone
+            # nothing can point at them again, even if the same content is
+            # being stored anew concurrently.
+            if remove_files:
+                if storage_path and os.path.exists(storage_path):
+                    os.remove(storage_path)
+                if thumbnail_path and os.path.exists(thumbnail_path):
+                    os.remove(thumbnail_path)
+                for path in rendition_paths:
+                    if os.path.exists(path):
+                        os.remove(path)
 
         except Exception as e:
             db.rollback()
@@ -0,0 +1,89 @@
+# app/modules/uploads/tasks.py
+import json
+import logging
+import os
+from typing import Any, Dict
+
+from app.db.database import SessionLocal
+from app.modules.uploads import models
+from app.modules.geo import geohash
+from app.modules.uploads.derivatives import compute_derivatives
+
+log = logging.getLogger("uploads")
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(os.getcwd(), "uploads"))
+THUMB_DIR = os.path.join(UPLOAD_DIR, "thumbs")
+RENDITION_DIR = os.path.join(UPLOAD_DIR, "renditions")
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
+# Set STORE_RAW_EXIF=0 to keep only the curated EXIF columns
+STORE_RAW_EXIF = os.getenv("STORE_RAW_EXIF", "1") != "0"
+
+
+def derivative_key(storage_path: str) -> str:
+    """
+    Name stem for a blob's derivative files: the stored original's, so a blob
+    stored again after its last upload was deleted never shares files with
+    the previous generation.
+    """
+    return os.path.splitext(os.path.basename(storage_path))[0]
+
+
+def derivative_fields(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Upload column values for a compute_derivatives result.
+    """
+    if "error" in result:
+        return {"processing_status": models.PROCESSING_FAILED}
+    curated = result.get("exif_fields") or {}
+    located = curated.get("gps_lat") is not None and curated.get("gps_lon") is not None
+    return {
+        "width": result["width"],
+        "height": result["height"],
+        "exif": json.dumps(result["exif"] or {}) if STORE_RAW_EXIF else None,
+        **{name: curated.get(name) for name in models.EXIF_FIELDS},
+        "geohash": geohash.encode(curated["gps_lat"], curated["gps_lon"]) if located else None,
+        "thumbnail_url": f"{BASE_URL}/static/uploads/thumbs/{result['thumbnail_name']}",
+        "renditions": json.dumps([
+            {**r, "url": f"{BASE_URL}/static/uploads/renditions/{r['name']}"}
+            for r in result.get("renditions", [])
+        ]),
+        "processing_status": models.PROCESSING_READY,
+    }
+
+
+def apply_derivatives(content_hash: str, result: Dict[str, Any]) -> None:
+    """
+    Store the output of compute_derivatives on every Upload that shares the
+    blob and mark them ready (or failed). Duplicates uploaded while the blob
+    was still processing are filled in here as well.
+    """
+    db = SessionLocal()
+    try:
+        # Serialize with uploads registering a duplicate of this blob, so none
+        # of them copies the "processing" state after this update
+        db.query(models.UploadBlob).filter(models.UploadBlob.content_hash == content_hash).with_for_update().first()
+        uploads = db.query(models.Upload).filter(models.Upload.content_hash == content_hash).all()
+        if not uploads:
+            log.warning("Blob %s lost all its uploads before its derivatives were stored", content_hash)
+            return
+
+        if "error" in result:
+            log.warning("Derivative generation failed for blob %s: %s", content_hash, result["error"])
+        fields = derivative_fields(result)
+        for upload in uploads:
+            for name, value in fields.items():
+                setattr(upload, name, value)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        log.exception("Failed to store derivatives for blob %s: %s", content_hash, e)
+    finally:
+        db.close()
+
+
+def process_upload(content_hash: str, source_path: str) -> None:
+    """
+    RQ worker entry point: generate derivatives for a blob and store them.
+    """
+    result = compute_derivatives(source_path, THUMB_DIR, derivative_key(source_path), RENDITION_DIR)
+    apply_derivatives(content_hash, result)
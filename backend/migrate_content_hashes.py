@@ -0,0 +1,82 @@
+import hashlib
+import os
+from sqlalchemy import inspect, text
+from app.db.database import SessionLocal, engine
+from app.modules.images import models as image_models  # noqa: F401 - register mappers
+from app.modules.uploads import models
+from app.modules.uploads.ingest import INGEST_CHUNK_SIZE
+
+
+def _sha256(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(INGEST_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def add_content_hash_column():
+    """Create upload_blobs and add uploads.content_hash with its index."""
+    models.UploadBlob.__table__.create(bind=engine, checkfirst=True)
+    existing = {c["name"] for c in inspect(engine).get_columns(models.Upload.__tablename__)}
+    if "content_hash" not in existing:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE uploads ADD COLUMN content_hash VARCHAR(64)"))
+    for index in models.Upload.__table__.indexes:
+        if "content_hash" in index.columns:
+            index.create(bind=engine, checkfirst=True)
+
+
+def migrate_content_hashes(db):
+    """
+    Hash uploads stored before content addressing and attach them to blobs.
+    The first upload of each content becomes the blob; later duplicates are
+    pointed at it and their redundant original file is removed. Their own
+    thumbnails/renditions are left in place and keep being served.
+    """
+    uploads = db.query(models.Upload).filter(models.Upload.content_hash.is_(None)).all()
+    migrated = 0
+    redundant = []
+    for upload in uploads:
+        if not upload.storage_path or not os.path.isfile(upload.storage_path):
+            continue
+        content_hash = _sha256(upload.storage_path)
+        blob = db.get(models.UploadBlob, content_hash)
+        if blob is None:
+            blob = models.UploadBlob(
+                content_hash=content_hash,
+                filename=upload.filename,
+                storage_path=upload.storage_path,
+                content_type=upload.content_type,
+                size_bytes=upload.size_bytes,
+                ref_count=0,
+            )
+            db.add(blob)
+        elif blob.storage_path != upload.storage_path:
+            redundant.append(upload.storage_path)
+            upload.filename = blob.filename
+            upload.storage_path = blob.storage_path
+            upload.url = f"{os.path.dirname(upload.url)}/{blob.filename}"
+        blob.ref_count += 1
+        upload.content_hash = content_hash
+        db.flush()
+        migrated += 1
+    db.commit()
+
+    # Only drop duplicate originals once every row points at its blob
+    for path in redundant:
+        if os.path.exists(path):
+            os.remove(path)
+    print(f"Hashed {migrated} uploads, {len(redundant)} duplicates now share a blob")
+
+
+if __name__ == "__main__":
+    add_content_hash_column()
+    db = SessionLocal()
+    try:
+        migrate_content_hashes(db)
+    finally:
+        db.close()
+
+# Usage:
+# python migrate_content_hashes.py
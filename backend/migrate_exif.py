@@ -0,0 +1,78 @@
+import json
+import os
+from PIL import Image
+from sqlalchemy import inspect, text
+from app.db.database import SessionLocal, engine
+from app.modules.images import models as image_models  # noqa: F401 - register mappers
+from app.modules.uploads import models
+from app.modules.uploads.derivatives import curate_exif, read_exif, serializable_exif
+from app.modules.uploads.tasks import STORE_RAW_EXIF
+
+COLUMN_TYPES = {
+    "camera_make": "VARCHAR(64)",
+    "camera_model": "VARCHAR(128)",
+    "lens_model": "VARCHAR(128)",
+    "focal_length": "DOUBLE PRECISION",
+    "aperture": "DOUBLE PRECISION",
+    "exposure_time": "DOUBLE PRECISION",
+    "iso": "INTEGER",
+    "taken_at": "TIMESTAMP",
+    "gps_lat": "DOUBLE PRECISION",
+    "gps_lon": "DOUBLE PRECISION",
+}
+
+
+def add_exif_columns():
+    existing = {c["name"] for c in inspect(engine).get_columns(models.Upload.__tablename__)}
+    with engine.begin() as conn:
+        for name in models.EXIF_FIELDS:
+            if name not in existing:
+                conn.execute(text(f"ALTER TABLE uploads ADD COLUMN {name} {COLUMN_TYPES[name]}"))
+    for index in models.Upload.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+
+def migrate_exif(db):
+    """
+    Read the EXIF of every stored original again and fill the curated EXIF
+    columns; the raw EXIF column is rewritten without MakerNote and other
+    binary blobs (or cleared with STORE_RAW_EXIF=0). Only the EXIF header is
+    read, the pixels are never decoded. Uploads sharing a blob are updated
+    together.
+    """
+    uploads = db.query(models.Upload).filter(models.Upload.taken_at.is_(None), models.Upload.camera_model.is_(None)).all()
+    by_path = {}
+    for upload in uploads:
+        by_path.setdefault(upload.storage_path, []).append(upload)
+
+    migrated = 0
+    for path, group in by_path.items():
+        if not path or not os.path.isfile(path):
+            continue
+        try:
+            with Image.open(path) as im:
+                raw = read_exif(im)
+        except Exception as e:
+            print(f"Skipping {path}: {e}")
+            continue
+        fields = curate_exif(raw)
+        exif = json.dumps(serializable_exif(raw)) if STORE_RAW_EXIF else None
+        for upload in group:
+            for name, value in fields.items():
+                setattr(upload, name, value)
+            upload.exif = exif
+            migrated += 1
+        db.commit()
+    print(f"EXIF migrated for {migrated} uploads")
+
+
+if __name__ == "__main__":
+    add_exif_columns()
+    db = SessionLocal()
+    try:
+        migrate_exif(db)
+    finally:
+        db.close()
+
+# Usage:
+# python migrate_exif.py
@@ -0,0 +1,70 @@
+from sqlalchemy import inspect, text
+from app.db.database import SessionLocal, engine
+from app.modules.geo import geohash
+from app.modules.geo.service import postgis_available
+from app.modules.images import models as image_models  # noqa: F401 - register mappers
+from app.modules.uploads import models
+
+BATCH_SIZE = 1000
+
+# Same expression as geo.service.POINT, so the planner can use the index for it
+GEOGRAPHY_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS ix_uploads_geog ON uploads USING gist "
+    "(geography(ST_SetSRID(ST_MakePoint(gps_lon, gps_lat), 4326))) "
+    "WHERE gps_lat IS NOT NULL AND gps_lon IS NOT NULL"
+)
+
+
+def add_geohash_column():
+    existing = {c["name"] for c in inspect(engine).get_columns(models.Upload.__tablename__)}
+    if "geohash" not in existing:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE uploads ADD COLUMN geohash VARCHAR(12)"))
+    for index in models.Upload.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+
+def create_geography_index(db):
+    """GiST index for bounding box and radius queries, when PostGIS is installed."""
+    if not postgis_available(db):
+        print("PostGIS not installed; geo queries will use the geohash index")
+        return
+    db.execute(text(GEOGRAPHY_INDEX_SQL))
+    db.commit()
+    print("Created ix_uploads_geog")
+
+
+def migrate_geohash(db):
+    """Fill the geohash of every located upload that does not have one yet."""
+    migrated = 0
+    while True:
+        uploads = (
+            db.query(models.Upload)
+            .filter(
+                models.Upload.geohash.is_(None),
+                models.Upload.gps_lat.isnot(None),
+                models.Upload.gps_lon.isnot(None),
+            )
+            .limit(BATCH_SIZE)
+            .all()
+        )
+        if not uploads:
+            break
+        for upload in uploads:
+            upload.geohash = geohash.encode(upload.gps_lat, upload.gps_lon)
+        db.commit()
+        migrated += len(uploads)
+    print(f"Geohash migrated for {migrated} uploads")
+
+
+if __name__ == "__main__":
+    add_geohash_column()
+    db = SessionLocal()
+    try:
+        migrate_geohash(db)
+        create_geography_index(db)
+    finally:
+        db.close()
+
+# Usage:
+# python migrate_geo.py
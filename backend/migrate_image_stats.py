@@ -0,0 +1,23 @@
+from app.db.database import SessionLocal, engine
+from app.modules.images import models as image_models  # noqa: F401 - register mappers
+from app.modules.image_stats.models import ImageStats
+from app.modules.image_stats.service import reconcile_image_stats
+
+
+def create_image_stats():
+    """Create the image_stats counter table if needed."""
+    ImageStats.__table__.create(bind=engine, checkfirst=True)
+
+
+if __name__ == "__main__":
+    create_image_stats()
+    db = SessionLocal()
+    try:
+        # Fill the counters for existing images; later writes keep them current
+        rows = reconcile_image_stats(db)
+        print(f"image_stats ready: {rows} rows")
+    finally:
+        db.close()
+
+# Usage:
+# python migrate_image_stats.py
@@ -0,0 +1,24 @@
+from sqlalchemy import inspect, text
+from app.db.database import engine
+
+
+def allow_anonymous_views():
+    """Make image_views.user_id nullable; the view buffer records anonymous views with no user."""
+    columns = {c["name"]: c for c in inspect(engine).get_columns("image_views")}
+    if columns["user_id"]["nullable"]:
+        print("image_views.user_id is already nullable")
+        return
+    if engine.dialect.name == "sqlite":
+        # SQLite cannot alter a column constraint in place
+        print("SQLite: recreate image_views to drop NOT NULL on user_id")
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE image_views ALTER COLUMN user_id DROP NOT NULL"))
+    print("image_views.user_id is now nullable")
+
+
+if __name__ == "__main__":
+    allow_anonymous_views()
+
+# Usage:
+# python migrate_image_views.py
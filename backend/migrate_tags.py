@@ -0,0 +1,57 @@
+from sqlalchemy import delete, insert
+from app.db.database import SessionLocal, engine
+from app.modules.images import models as image_models  # noqa: F401 - register mappers
+from app.modules.tags.models import Tag, UploadTag
+from app.modules.tags.service import _ensure_tags, reconcile_tag_counts, tag_names
+from app.modules.uploads import models
+
+BATCH_SIZE = 1000
+
+
+def migrate_tags(db):
+    """
+    Create the tags and upload_tags tables if needed and fill them from the
+    JSON Upload.tags column, then recount every tag. Safe to rerun: links are
+    rebuilt from scratch. Afterwards writes keep them in sync.
+    """
+    Tag.__table__.create(bind=engine, checkfirst=True)
+    UploadTag.__table__.create(bind=engine, checkfirst=True)
+    for index in list(Tag.__table__.indexes) + list(UploadTag.__table__.indexes):
+        index.create(bind=engine, checkfirst=True)
+
+    conn = db.connection()
+    conn.execute(delete(UploadTag.__table__))
+    linked = 0
+    batch = []
+
+    def flush_batch():
+        names = list(dict.fromkeys(name for _, tags in batch for name in tags))
+        ids = _ensure_tags(conn, names) if names else {}
+        rows = [{"upload_id": upload_id, "tag_id": ids[name]} for upload_id, tags in batch for name in tags]
+        if rows:
+            conn.execute(insert(UploadTag.__table__), rows)
+        return len(rows)
+
+    for upload_id, raw in db.query(models.Upload.id, models.Upload.tags).yield_per(BATCH_SIZE):
+        names = tag_names(raw)
+        if names:
+            batch.append((upload_id, names))
+        if len(batch) >= BATCH_SIZE:
+            linked += flush_batch()
+            batch = []
+    if batch:
+        linked += flush_batch()
+    db.commit()
+    tags = reconcile_tag_counts(db)
+    print(f"upload_tags rebuilt: {linked} links across {tags} tags")
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        migrate_tags(db)
+    finally:
+        db.close()
+
+# Usage:
+# python migrate_tags.py
@@ -0,0 +1,27 @@
+from sqlalchemy import inspect, text
+from app.db.database import engine
+from app.modules.uploads import models
+
+# Columns added to uploads after it was first created, with their DDL
+UPLOAD_COLUMNS = {
+    # Existing uploads already have their thumbnail and metadata
+    "processing_status": f"VARCHAR NOT NULL DEFAULT '{models.PROCESSING_READY}'",
+    # Uploads from before the rendition ladder have none; they render without srcset
+    "renditions": "TEXT",
+}
+
+
+def add_upload_columns():
+    existing = {c["name"] for c in inspect(engine).get_columns(models.Upload.__tablename__)}
+    added = [name for name in UPLOAD_COLUMNS if name not in existing]
+    with engine.begin() as conn:
+        for name in added:
+            conn.execute(text(f"ALTER TABLE uploads ADD COLUMN {name} {UPLOAD_COLUMNS[name]}"))
+    print(f"Added uploads columns: {', '.join(added) or 'none'}")
+
+
+if __name__ == "__main__":
+    add_upload_columns()
+
+# Usage:
+# python migrate_upload_columns.py
@@ -0,0 +1,18 @@
+from app.db.database import engine
+from app.modules.images import models as image_models  # noqa: F401 - register mappers
+from app.modules.uploads import models
+
+
+def create_upload_sessions():
+    """Create the upload_sessions table used by resumable uploads, with its indexes."""
+    models.UploadSession.__table__.create(bind=engine, checkfirst=True)
+    for index in models.UploadSession.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+
+if __name__ == "__main__":
+    create_upload_sessions()
+    print("upload_sessions ready")
+
+# Usage:
+# python migrate_upload_sessions.py
@@ -0,0 +1,29 @@
+from sqlalchemy import inspect, text
+from app.db.database import engine
+from app.modules.cacher.models import CacheVersion
+from app.modules.images import models as image_models  # noqa: F401 - register mappers
+
+UPDATED_AT_TABLES = ("images", "albums", "comments", "pages")
+
+
+def add_updated_at_columns():
+    """Add updated_at where it is missing (images)."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in UPDATED_AT_TABLES:
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if "updated_at" not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP WITH TIME ZONE"))
+
+
+def create_version_store():
+    CacheVersion.__table__.create(bind=engine, checkfirst=True)
+
+
+if __name__ == "__main__":
+    add_updated_at_columns()
+    create_version_store()
+    print("updated_at columns and cache_versions ready")
+
+# Usage:
+# python migrate_versions.py
@@ -0,0 +1,23 @@
+from app.db.database import SessionLocal
+from app.modules.images import models as image_models  # noqa: F401 - register mappers
+from app.modules.image_stats.service import reconcile_image_stats
+
+
+def main():
+    """
+    Rebuild the image_stats counter table from the source tables.
+    Run periodically (e.g. nightly cron) to repair any counter drift.
+    """
+    db = SessionLocal()
+    try:
+        rows = reconcile_image_stats(db)
+        print(f"image_stats reconciled: {rows} rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
+
+# Usage:
+# python reconcile_image_stats.py
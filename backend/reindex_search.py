@@ -0,0 +1,32 @@
+from sqlalchemy import text
+from app.db.database import SessionLocal, engine
+from app.modules.images import models as image_models  # noqa: F401 - register mappers
+from app.modules.search.models import SearchDocument
+from app.modules.search.documents import reindex_all
+
+
+def main():
+    """
+    Create the search_documents table (generated tsvector, full-text and
+    trigram GIN indexes) if it does not exist and rebuild it from the source
+    tables. Afterwards writes keep it in sync; rerun after bulk imports that
+    bypass the ORM.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    SearchDocument.__table__.create(bind=engine, checkfirst=True)
+    for index in SearchDocument.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        count = reindex_all(db)
+        print(f"search_documents rebuilt: {count} documents")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
+
+# Usage:
+# python reindex_search.py
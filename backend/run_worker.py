@@ -0,0 +1,41 @@
+# backend/run_worker.py
+"""
+RQ worker for upload derivative jobs (thumbnails, EXIF, dimensions).
+Run from the backend folder with REDIS_URL set:
+
+    python run_worker.py
+"""
+import os
+import sys
+import logging
+from redis import Redis
+from rq import Queue
+from rq.worker import SimpleWorker, Worker
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379")
+QUEUE_NAME = os.getenv("DERIVATIVES_QUEUE", "derivatives")
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+log = logging.getLogger("run_worker")
+
+def main():
+    log.info("Connecting to Redis at %s", REDIS_URL)
+    redis_conn = Redis.from_url(REDIS_URL)
+
+    q = Queue(QUEUE_NAME, connection=redis_conn)
+    log.info("Queue '%s' ready (len=%s)", QUEUE_NAME, q.count)
+
+    if sys.platform.startswith("win"):
+        log.info("Platform is Windows; using SimpleWorker (no fork).")
+        worker = SimpleWorker([q], connection=redis_conn)
+    else:
+        worker = Worker([q], connection=redis_conn)
+
+    try:
+        log.info("Starting worker (CTRL-C to quit). Listening on queue: %s", QUEUE_NAME)
+        worker.work()
+    except KeyboardInterrupt:
+        log.info("Worker stopped by user")
+
+if __name__ == "__main__":
+    main()
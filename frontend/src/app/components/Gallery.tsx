@@ -56,6 +56,8 @@ type ViewMode = 'images' | 'albums' | 'uploads' | 'users';
 
 export default function Gallery() {
   const [images, setImages] = useState<Image[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [albums, setAlbums] = useState<Album[]>([]);
   const [selectedAlbum, setSelectedAlbum] = useState<Album | null>(null);
   const [albumImages, setAlbumImages] = useState<Image[]>([]);
@@ -131,7 +133,12 @@ export default function Gallery() {
     setAlbumImages(prev => prev.map(img => img.id === imageId ? { ...img, views: (img.views || 0) + 1 } : img));
     try {
       // Optional backend ping if supported; safe to ignore failures
-      await fetch(`${API}/images/${imageId}/view`, { method: 'POST', cache: 'no-store' });
+      // Signed-in views are deduplicated per user; anonymous ones are all counted
+      await fetch(`${API}/images/${imageId}/view`, {
+        method: 'POST',
+        cache: 'no-store',
+        headers: token ? { Authorization: `Bearer ${token}` } : undefined,
+      });
     } catch {}
   };
 
@@ -180,10 +187,14 @@ export default function Gallery() {
     }
   };
 
-  const fetchGallery = async () => {
+  const fetchGallery = async (cursor?: string) => {
     try {
-      const res = await fetch(`${API}/gallery?ts=${Date.now()}`, { cache: 'no-store' });
+      // The gallery is paginated: each page names the next one in X-Next-Cursor.
+      // 'no-cache' revalidates with the server's ETag instead of refetching.
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const res = await fetch(`${API}/gallery${query}`, { cache: 'no-cache' });
       const data = await res.json();
+      const pageCursor = res.headers.get('X-Next-Cursor');
 
       const imagesWithComments = await Promise.all(
         Array.isArray(data) ? data.map(async (img: any) => {
@@ -244,12 +255,23 @@ export default function Gallery() {
         }) : []
       );
 
-      setImages(imagesWithComments);
+      setImages(prev => cursor ? [...prev, ...imagesWithComments] : imagesWithComments);
+      setNextCursor(pageCursor);
     } catch (err) {
       console.error("Error fetching gallery:", err);
     }
   };
 
+  const loadMoreImages = async () => {
+    if (!nextCursor || isLoadingMore) return;
+    setIsLoadingMore(true);
+    try {
+      await fetchGallery(nextCursor);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const refreshGallery = async () => {
     console.log('Manual gallery refresh triggered');
     await fetchGallery();
@@ -445,7 +467,10 @@ export default function Gallery() {
       const res = await fetch(`${API}/search?q=${encodeURIComponent(searchQuery)}&type=${viewMode}`);
       const data = await res.json();
       
-      if (viewMode === 'images') setImages(data);
+      if (viewMode === 'images') {
+        setImages(data);
+        setNextCursor(null);
+      }
       else if (viewMode === 'albums') setAlbums(data);
       else if (viewMode === 'uploads') setUploads(data);
       else if (viewMode === 'users') setUsers(data);
@@ -1412,6 +1437,18 @@ export default function Gallery() {
             );
           })}
 
+          {viewMode === 'images' && nextCursor && (
+            <div className="col-span-full flex justify-center">
+              <button
+                onClick={loadMoreImages}
+                disabled={isLoadingMore}
+                className="px-6 py-2 bg-[#352828ff] text-white rounded-lg hover:bg-[#352828ff] transition-colors disabled:opacity-50"
+              >
+                {isLoadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
+
           {/* Albums View */}
           {viewMode === 'albums' && !selectedAlbum && albums.length === 0 && (
             <p className="text-center col-span-full text-gray-500">No albums yet.</p>